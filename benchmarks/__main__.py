@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import List
+
+from benchmarks import grammar, inflections, keyboards, timing_wheel
+from benchmarks.corpus import build_corpus
+from benchmarks.runner import BenchmarkResult, format_results
+
+SUITES = {
+    "grammar": grammar.run,
+    "inflections": inflections.run,
+    "keyboards": keyboards.run,
+    "timing_wheel": timing_wheel.run,
+}
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def save_results(path: str, args: argparse.Namespace, results: List[BenchmarkResult]):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+    with open(path, "w") as f:
+        json.dump({
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+            "results": [r._asdict() for r in results],
+        }, f, indent=2)
+
+
+def format_comparison(previous_path: str, results: List[BenchmarkResult]) -> str:
+    with open(previous_path) as f:
+        previous = {r["name"]: r for r in json.load(f)["results"]}
+
+    lines = [f"{'benchmark':<40} {'ops/s before':>14} {'ops/s now':>14} {'change':>8}"]
+
+    for r in results:
+        before = previous.get(r.name)
+
+        if not before or not before["throughput"]:
+            continue
+
+        change = (r.throughput / before["throughput"] - 1) * 100
+        lines.append(f"{r.name:<40} {before['throughput']:>14.0f} {r.throughput:>14.0f} {change:>+7.1f}%")
+
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="tg_dobby performance benchmarks")
+    parser.add_argument("--suite", choices=sorted(SUITES), action="append",
+                        help="Suite to run (may be repeated). All suites are run by default")
+    parser.add_argument("--corpus-size", type=int, default=1000)
+    parser.add_argument("--noise-share", type=float, default=0.5, help="Share of corpus phrases without dates")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=1, help="Number of passes over corpus")
+    parser.add_argument("--output", help="Path to JSON results file. Default: benchmarks/results/<timestamp>.json")
+    parser.add_argument("--compare", help="Path to previous JSON results to compare throughput with")
+
+    args = parser.parse_args()
+
+    corpus = build_corpus(size=args.corpus_size, noise_share=args.noise_share, seed=args.seed)
+
+    results = []
+
+    for suite_name in args.suite or sorted(SUITES):
+        print(f"Running suite '{suite_name}'...", file=sys.stderr)
+        results.extend(SUITES[suite_name](corpus, repeat=args.repeat))
+
+    print(format_results(results))
+
+    if args.compare:
+        print()
+        print(format_comparison(args.compare, results))
+
+    output = args.output or os.path.join(DEFAULT_RESULTS_DIR, time.strftime("%Y%m%d-%H%M%S") + ".json")
+    save_results(output, args, results)
+    print(f"\nResults saved to {output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import random
+from typing import List
+
+from tests.test_nlp_dates import CASES as NATURAL_DATES_CASES
+from tests.test_npl_dates_post_processing import CORRECT_DATE_TIME_CASES, CLARIFICATION_DATE_TIME_CASES
+from tests.test_tokenizer import CASES as TOKENIZER_CASES
+
+NOISE_WORDS = (
+    "позвонить", "маме", "купить", "хлеб", "молоко", "забрать", "посылку", "на", "почте",
+    "встреча", "с", "командой", "обсудить", "отчёт", "оплатить", "счёт", "за", "интернет",
+    "написать", "письмо", "коллегам", "полить", "цветы", "проверить", "почту", "сходить", "в", "магазин",
+    "привет", "как", "жизнь", "что", "нового", "спасибо", "ок", "хорошо", "понял",
+)
+
+NOISE_MESSAGES = (
+    "Привет! Как жизнь?",
+    "Спасибо, всё получилось",
+    "ок",
+    "Скинь, пожалуйста, ссылку на документ",
+    "Hello there",
+    "👍",
+)
+
+
+def date_phrases() -> List[str]:
+    phrases = [case[0] for case in NATURAL_DATES_CASES]
+    phrases.extend(case[0] for case in TOKENIZER_CASES)
+    phrases.extend(case[0] for case in CORRECT_DATE_TIME_CASES)
+    phrases.extend(case.text for case in CLARIFICATION_DATE_TIME_CASES)
+
+    return phrases
+
+
+def noise_text(rnd: random.Random, min_words: int, max_words: int) -> str:
+    return " ".join(rnd.choice(NOISE_WORDS) for _ in range(rnd.randint(min_words, max_words)))
+
+
+def build_corpus(size: int = 1000, noise_share: float = 0.5, seed: int = 0) -> List[str]:
+    """
+    Builds deterministic corpus of phrases.
+    Date phrases from test cases are surrounded with random noise words,
+    noise_share of corpus is phrases without dates at all.
+    """
+    rnd = random.Random(seed)
+    phrases = date_phrases()
+
+    corpus = []
+
+    for _ in range(size):
+        if rnd.random() < noise_share:
+            if rnd.random() < 0.3:
+                corpus.append(rnd.choice(NOISE_MESSAGES))
+            else:
+                corpus.append(noise_text(rnd, 2, 30))
+        else:
+            corpus.append(" ".join(filter(None, [
+                noise_text(rnd, 0, 5),
+                rnd.choice(phrases),
+                noise_text(rnd, 0, 10),
+            ])))
+
+    return corpus
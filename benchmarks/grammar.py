@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import List
+
+from tg_dobby.grammar import extract_first_natural_date
+from tg_dobby.grammar.natural_dates import (
+    extract_first_natural_date_with_parser,
+    RULE_DAY_TIME,
+    RULE_RELATIVE_DAY,
+    RULE_DAY_OF_THE_WEEK,
+    RULE_AFTER,
+    RULE_MOMENT,
+)
+from tg_dobby.grammar.natural_dates_batch import get_absolute_dates
+from tg_dobby.grammar.natural_dates_post_processing import (
+    get_absolute_date,
+    ClarificationRequired,
+    InvalidRelativeDateException,
+)
+from tg_dobby.grammar.parser_registry import PARSER_REGISTRY
+from tg_dobby.grammar.tokenizer import tokenize_phrase
+
+from benchmarks.runner import BenchmarkResult, run_benchmark
+
+RULES = (
+    ("RULE_DAY_TIME", RULE_DAY_TIME),
+    ("RULE_RELATIVE_DAY", RULE_RELATIVE_DAY),
+    ("RULE_DAY_OF_THE_WEEK", RULE_DAY_OF_THE_WEEK),
+    ("RULE_AFTER", RULE_AFTER),
+    ("RULE_MOMENT", RULE_MOMENT),
+)
+
+BASE_TIME = datetime(2018, 9, 2, 13, 45)
+
+BATCH_SIZE = 256
+
+
+def _resolve(moment):
+    try:
+        return get_absolute_date(moment, base=BASE_TIME)
+    except (ClarificationRequired, InvalidRelativeDateException):
+        return None
+
+
+def run(corpus: List[str], repeat: int = 1) -> List[BenchmarkResult]:
+    results = []
+
+    for rule_name, rule in RULES:
+        parser = PARSER_REGISTRY.get_parser((rule,), label=rule_name)
+        results.append(run_benchmark(f"findall[{rule_name}]", lambda txt: list(parser.findall(txt)), corpus, repeat))
+
+    results.append(run_benchmark("extract_first_natural_date", extract_first_natural_date, corpus, repeat))
+    results.append(run_benchmark(
+        "extract_first_natural_date[parser]", extract_first_natural_date_with_parser, corpus, repeat
+    ))
+    results.append(run_benchmark("tokenize_phrase", tokenize_phrase, corpus, repeat))
+
+    moments = [m for m in map(extract_first_natural_date, corpus) if m is not None]
+    results.append(run_benchmark("get_absolute_date", _resolve, moments, repeat))
+
+    # Same moments resolved by batches, single call resolves BATCH_SIZE moments
+    batches = [moments[i:i + BATCH_SIZE] for i in range(0, len(moments), BATCH_SIZE)]
+    results.append(run_benchmark(
+        f"get_absolute_dates[batch={BATCH_SIZE}]", lambda batch: get_absolute_dates(batch, base=BASE_TIME),
+        batches, repeat,
+    ))
+    results.append(run_benchmark(
+        f"get_absolute_date[loop={BATCH_SIZE}]", lambda batch: [_resolve(m) for m in batch], batches, repeat,
+    ))
+
+    return results
@@ -0,0 +1,76 @@
+from typing import List
+
+from yargy.parser import Context
+from yargy.predicates import dictionary
+from yargy.tokenizer import Tokenizer
+
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+from tg_dobby.grammar.natural_dates import (
+    WORDS_RELATIVE_DAY,
+    WORDS_DAY_OF_WEEK,
+    WORDS_HOUR_OF_A_DAY,
+    WORDS_AM_PM,
+    WORDS_DAY_OF_WEEK_DISCRIMINATOR,
+    WORDS_TEMPORAL_UNIT,
+    WORDS_NAMED_INTERVAL,
+)
+from tg_dobby.grammar.parser_registry import PARSER_REGISTRY
+from tg_dobby.grammar.vocabulary import InflectionTables, inflections
+
+from benchmarks.runner import BenchmarkResult, run_benchmark
+
+VOCABULARY = (
+    WORDS_RELATIVE_DAY,
+    WORDS_DAY_OF_WEEK,
+    WORDS_HOUR_OF_A_DAY,
+    WORDS_AM_PM,
+    WORDS_DAY_OF_WEEK_DISCRIMINATOR,
+    WORDS_TEMPORAL_UNIT,
+    WORDS_NAMED_INTERVAL,
+    {"час"},
+    {"через"},
+    {"напомни"},
+    {"мне"},
+)
+
+
+def _build_tables(_):
+    tables = InflectionTables(MORPH_CACHE)
+
+    for words in VOCABULARY:
+        tables.get(words)
+
+
+def run(corpus: List[str], repeat: int = 1) -> List[BenchmarkResult]:
+    morph_tokenizer = PARSER_REGISTRY.tokenizer
+    plain_tokenizer = Tokenizer()
+    context = Context(morph_tokenizer)
+
+    normalized_predicates = [dictionary(words).activate(context) for words in VOCABULARY]
+    inflections_predicates = [inflections(words).activate(context) for words in VOCABULARY]
+
+    def match_all(predicates, tokens):
+        return [p(t) for t in tokens for p in predicates]
+
+    # Predicates only: tokens are analyzed in advance
+    morph_tokens = [list(morph_tokenizer(txt)) for txt in corpus]
+
+    results = [
+        run_benchmark("predicates[normalized]", lambda t: match_all(normalized_predicates, t), morph_tokens, repeat),
+        run_benchmark("predicates[inflections]", lambda t: match_all(inflections_predicates, t), morph_tokens, repeat),
+    ]
+
+    # Tokenization included: lookup by surface form does not need morph analysis
+    results += [
+        run_benchmark(
+            "tokenize+predicates[normalized]",
+            lambda txt: match_all(normalized_predicates, morph_tokenizer(txt)), corpus, repeat,
+        ),
+        run_benchmark(
+            "tokenize+predicates[inflections]",
+            lambda txt: match_all(inflections_predicates, plain_tokenizer(txt)), corpus, repeat,
+        ),
+        run_benchmark("build_inflection_tables", _build_tables, [None], repeat, warm_up=False),
+    ]
+
+    return results
@@ -0,0 +1,64 @@
+from datetime import datetime, timedelta
+from typing import List
+
+from tg_dobby.tg_bot import CANCEL_KEYBOARD
+from tg_dobby.tg_bot_base import InlineKeyboard, InlineKeyboardButtonData, InlineKeyboardMarkupData
+
+from benchmarks.runner import BenchmarkResult, run_benchmark
+
+DATES = 1000
+
+
+def _date_picker_model(dt: datetime) -> str:
+    return InlineKeyboardMarkupData(inline_keyboard=[
+        [
+            InlineKeyboardButtonData(text=dt.strftime("%d %b %Y %H:%M"), callback_data="submit")
+        ],
+        [
+            InlineKeyboardButtonData(text="-", callback_data="d_dec"),
+            InlineKeyboardButtonData(text=f"{dt.day}", callback_data="d_click"),
+            InlineKeyboardButtonData(text="+", callback_data="d_inc"),
+        ],
+        [
+            InlineKeyboardButtonData(text="-", callback_data="m_dec"),
+            InlineKeyboardButtonData(text=f"{dt.month}", callback_data="m_click"),
+            InlineKeyboardButtonData(text="+", callback_data="m_inc"),
+        ],
+    ]).json()
+
+
+def _date_picker_fast(dt: datetime) -> str:
+    return InlineKeyboard([
+        [
+            (dt.strftime("%d %b %Y %H:%M"), "submit"),
+        ],
+        [
+            ("-", "d_dec"),
+            (f"{dt.day}", "d_click"),
+            ("+", "d_inc"),
+        ],
+        [
+            ("-", "m_dec"),
+            (f"{dt.month}", "m_click"),
+            ("+", "m_inc"),
+        ],
+    ]).json()
+
+
+def run(corpus: List[str], repeat: int = 1) -> List[BenchmarkResult]:
+    start = datetime(2018, 9, 2, 13, 45)
+    dates = [start + timedelta(days=i) for i in range(DATES)]
+
+    if _date_picker_model(start) != _date_picker_fast(start):
+        raise AssertionError("Fast keyboard serialization differs from pydantic one")
+
+    cancel_model = InlineKeyboardMarkupData(inline_keyboard=[
+        [InlineKeyboardButtonData(text="Отмена", callback_data="submit")]
+    ])
+
+    return [
+        run_benchmark("keyboard.pydantic[date_picker]", _date_picker_model, dates, repeat),
+        run_benchmark("keyboard.fast[date_picker]", _date_picker_fast, dates, repeat),
+        run_benchmark("keyboard.pydantic[static]", lambda _: cancel_model.json(), dates, repeat),
+        run_benchmark("keyboard.frozen[static]", lambda _: CANCEL_KEYBOARD.json(), dates, repeat),
+    ]
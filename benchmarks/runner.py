@@ -0,0 +1,92 @@
+import gc
+import math
+import time
+import tracemalloc
+from typing import Any, Callable, List, NamedTuple, Sequence
+
+
+class BenchmarkResult(NamedTuple):
+    name: str
+    calls: int
+    total_time: float
+    throughput: float
+    p50: float
+    p95: float
+    p99: float
+    peak_memory: int
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """
+    Nearest-rank percentile of already sorted values
+    """
+    if not sorted_values:
+        return 0.0
+
+    rank = max(math.ceil(pct / 100 * len(sorted_values)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def measure_peak_memory(fn: Callable[[Any], Any], inputs: Sequence) -> int:
+    """
+    Peak memory allocated while processing all inputs once.
+    Measured in separate pass because tracing slows allocations down.
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for item in inputs:
+            fn(item)
+
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak
+
+
+def run_benchmark(name: str, fn: Callable[[Any], Any], inputs: Sequence, repeat: int = 1,
+                  warm_up: bool = True) -> BenchmarkResult:
+    """
+    Calls fn for every input (repeat times) and measures latency of every call
+    """
+    if warm_up:
+        for item in inputs:
+            fn(item)
+
+    latencies = []
+    clock = time.perf_counter
+
+    for _ in range(repeat):
+        for item in inputs:
+            started = clock()
+            fn(item)
+            latencies.append(clock() - started)
+
+    latencies.sort()
+    total_time = sum(latencies)
+
+    return BenchmarkResult(
+        name=name,
+        calls=len(latencies),
+        total_time=total_time,
+        throughput=len(latencies) / total_time if total_time else 0.0,
+        p50=percentile(latencies, 50),
+        p95=percentile(latencies, 95),
+        p99=percentile(latencies, 99),
+        peak_memory=measure_peak_memory(fn, inputs),
+    )
+
+
+def format_results(results: List[BenchmarkResult]) -> str:
+    header = f"{'benchmark':<40} {'calls':>8} {'ops/s':>10} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10} {'peak KiB':>10}"
+
+    lines = [header, "-" * len(header)]
+
+    for r in results:
+        lines.append(
+            f"{r.name:<40} {r.calls:>8} {r.throughput:>10.0f} "
+            f"{r.p50 * 1e6:>10.1f} {r.p95 * 1e6:>10.1f} {r.p99 * 1e6:>10.1f} {r.peak_memory / 1024:>10.1f}"
+        )
+
+    return "\n".join(lines)
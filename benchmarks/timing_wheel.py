@@ -0,0 +1,59 @@
+import asyncio
+import random
+from typing import List
+
+from tests.utils import ManualClock
+from tg_dobby.timing_wheel import TimingWheel
+
+from benchmarks.runner import BenchmarkResult, run_benchmark
+
+TIMERS = 1_000_000
+
+TICK = 0.1
+
+# Short-horizon reminders and command timeouts
+MAX_DELAY = 3600.0
+
+
+def _callback():
+    pass
+
+
+def run(corpus: List[str], repeat: int = 1) -> List[BenchmarkResult]:
+    rnd = random.Random(0)
+    delays = [rnd.uniform(0, MAX_DELAY) for _ in range(TIMERS)]
+
+    clock = ManualClock()
+    wheel = TimingWheel(clock, tick=TICK)
+
+    results = [
+        run_benchmark(
+            f"timing_wheel.call_later[{TIMERS}]", lambda d: wheel.call_later(d, _callback), delays, repeat,
+            warm_up=False,
+        ),
+    ]
+
+    handles = [wheel.call_later(d, _callback) for d in delays]
+    results.append(run_benchmark(f"timing_wheel.cancel[{TIMERS}]", lambda h: h.cancel(), handles, warm_up=False))
+
+    # All remaining timers are fired by ticks of the whole horizon
+    def drain(_):
+        clock.now += MAX_DELAY + TICK
+        wheel.advance()
+
+    results.append(run_benchmark(f"timing_wheel.advance[{MAX_DELAY:.0f}s]", drain, [None], warm_up=False))
+
+    # Baseline: timer per entry in event loop heap
+    loop = asyncio.new_event_loop()
+
+    try:
+        results.append(run_benchmark(
+            f"loop.call_later[{TIMERS}]", lambda d: loop.call_later(d, _callback), delays, repeat, warm_up=False,
+        ))
+
+        handles = [loop.call_later(d, _callback) for d in delays]
+        results.append(run_benchmark(f"loop.cancel[{TIMERS}]", lambda h: h.cancel(), handles, warm_up=False))
+    finally:
+        loop.close()
+
+    return results
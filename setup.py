@@ -30,6 +30,7 @@ setuptools.setup(
         "aiohttp==3.4.4",
         "aiotg==0.9.9",
         "aioredis==1.1.0",
+        "numpy==1.19.5",
         "PyYAML==3.13",
         "pydantic==0.14",
         "yargy==0.11.0",
@@ -39,7 +40,7 @@ setuptools.setup(
         "transliterate==1.10.2",
     ],
 
-    packages=setuptools.find_packages(exclude=("tests",)),
+    packages=setuptools.find_packages(exclude=("tests", "benchmarks", "benchmarks.*")),
 
     classifiers=['Private :: Do Not Upload'],
 
@@ -0,0 +1,52 @@
+import json
+import unittest
+from datetime import datetime
+
+from parameterized import parameterized
+
+from tests.utils import escape_test_suffix
+from tg_dobby.grammar.__main__ import (
+    parse_phrase,
+    _json_default,
+    STATUS_RESOLVED,
+    STATUS_CLARIFICATION,
+    STATUS_INVALID,
+    STATUS_NO_MATCH,
+)
+
+BASE = datetime(2018, 9, 2, 13, 45)
+
+CASES = (
+    ("напомни мне завтра в 14:00 позвонить маме", STATUS_RESOLVED),
+    ("завтра в 4", STATUS_CLARIFICATION),
+    ("в пятницу", STATUS_INVALID),
+    ("привет", STATUS_NO_MATCH),
+)
+
+
+class ParsePhraseTestCase(unittest.TestCase):
+
+    @parameterized.expand([
+        (escape_test_suffix(case[0]), *case) for case in CASES
+    ])
+    def test_status(self, _, text, expected_status):
+        result = parse_phrase(text, BASE)
+
+        self.assertEqual(expected_status, result["status"])
+        # Every result must be serializable
+        json.dumps(result, default=_json_default)
+
+    def test_resolved(self):
+        result = json.loads(json.dumps(parse_phrase("через 2 часа", BASE), default=_json_default))
+
+        self.assertEqual("2018-09-02T15:45:00", result["date"])
+        self.assertEqual({"effective_date": {"unit": "HOUR", "amount": 2}}, result["moment"])
+
+    def test_clarification(self):
+        result = json.loads(json.dumps(parse_phrase("завтра в 4", BASE), default=_json_default))
+
+        self.assertListEqual([{"type": "TimeOfADayClarification", "time_of_a_day": "DAY"}], result["clarifications"])
+
+
+if __name__ == '__main__':
+    unittest.main()
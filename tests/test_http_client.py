@@ -0,0 +1,59 @@
+import asyncio
+import json
+
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
+
+from tg_dobby.http_client import HttpClientMetrics, create_client_session
+
+
+class HttpClientTestCase(AioHTTPTestCase):
+
+    async def get_application(self):
+        async def handler(request):
+            # Keeps connection busy for a while, so concurrent requests have to wait for it
+            await asyncio.sleep(0.01)
+            return web.json_response({"ok": True})
+
+        app = web.Application()
+        app.router.add_get("/", handler)
+
+        return app
+
+    async def _get(self, session):
+        async with session.get(self.server.make_url("/")) as response:
+            return await response.json()
+
+    @unittest_run_loop
+    async def test_connection_reuse(self):
+        metrics = HttpClientMetrics()
+        session = create_client_session(metrics, json.dumps, limit=1, timeout=5.0, connect_timeout=1.0)
+
+        try:
+            for _ in range(3):
+                self.assertEqual({"ok": True}, await self._get(session))
+
+            # Pool holds single connection: the first request takes it, the others wait
+            await asyncio.gather(*[self._get(session) for _ in range(3)])
+        finally:
+            await session.close()
+
+        stats = metrics.stats()
+
+        self.assertEqual(6, stats.requests)
+        self.assertEqual(1, stats.new_connections)
+        self.assertEqual(5, stats.reused_connections)
+        self.assertEqual(2, stats.queued)
+        self.assertGreater(stats.queued_time, 0)
+
+    @unittest_run_loop
+    async def test_pool_limits(self):
+        session = create_client_session(
+            HttpClientMetrics(), json.dumps, limit=10, limit_per_host=5, timeout=30.0, connect_timeout=2.0,
+        )
+
+        try:
+            self.assertEqual(10, session.connector.limit)
+            self.assertEqual(5, session.connector.limit_per_host)
+        finally:
+            await session.close()
@@ -0,0 +1,25 @@
+import unittest
+
+from parameterized import parameterized
+
+from tg_dobby.tg_bot_base import InlineKeyboard, InlineKeyboardButtonData, InlineKeyboardMarkupData
+
+
+class InlineKeyboardTestCase(unittest.TestCase):
+
+    @parameterized.expand([
+        ("empty", []),
+        ("empty_row", [[]]),
+        ("single", [[("Отмена", "submit")]]),
+        ("no_callback_data", [[("text", None)]]),
+        ("escaping", [[('"quoted" \\ back\nslash', "a\tb")], [("😀", "emoji")]]),
+        ("rows", [[("-", "d_dec"), ("2", "d_click"), ("+", "d_inc")], [("-", "m_dec"), ("9", "m_click")]]),
+    ])
+    def test_same_json_as_model(self, _, rows):
+        model = InlineKeyboardMarkupData(inline_keyboard=[
+            [InlineKeyboardButtonData(text=text, callback_data=callback_data) for text, callback_data in row]
+            for row in rows
+        ])
+
+        self.assertEqual(model.json(), InlineKeyboard(rows).json())
+        self.assertEqual(model.json(), InlineKeyboard.from_model(model).json())
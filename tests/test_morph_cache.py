@@ -0,0 +1,55 @@
+import unittest
+
+from parameterized import parameterized
+
+from tg_dobby.grammar.morph_cache import CachingMorphAnalyzer
+from tg_dobby.grammar.natural_dates import RULE_MOMENT
+from tg_dobby.grammar.tokenizer import DEFAULT_TOKENIZER_RULES
+from tg_dobby.grammar.vocabulary import collect_rule_inflections
+
+
+class CachingMorphAnalyzerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.morph = CachingMorphAnalyzer(max_size=2)
+
+    def test_analysis_is_cached(self):
+        first = self.morph("Маме")
+        second = self.morph("маме")
+
+        self.assertIs(first, second)
+        self.assertEqual((1, 1), (self.morph.stats().hits, self.morph.stats().misses))
+
+    def test_preloaded_words_are_not_evicted(self):
+        self.morph.preload(["завтра"])
+
+        for word in ("позвонить", "маме", "папе"):
+            self.morph(word)
+
+        self.morph("завтра")
+
+        stats = self.morph.stats()
+        self.assertEqual(2, stats.size)
+        self.assertEqual(1, stats.preloaded_hits)
+
+
+class GrammarVocabularyTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.forms = collect_rule_inflections(DEFAULT_TOKENIZER_RULES, CachingMorphAnalyzer())
+
+    @parameterized.expand([
+        (word,) for word in ("через", "завтра", "часа", "пятницу", "утра", "полчаса", "напомни", "мне", "минут")
+    ])
+    def test_word_form_collected(self, word):
+        self.assertIn(word, self.forms)
+
+    def test_moment_vocabulary_is_subset(self):
+        moment_forms = collect_rule_inflections([RULE_MOMENT], CachingMorphAnalyzer())
+
+        self.assertTrue(moment_forms < self.forms)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from datetime import datetime, time
+
+from parameterized import parameterized
+
+from tg_dobby.grammar import extract_first_natural_date
+from tg_dobby.grammar.natural_dates import Moment, RelativeInterval, DayOfWeek
+from tg_dobby.grammar.model import TemporalUnit
+from tg_dobby.grammar.natural_dates_batch import get_absolute_dates
+from tg_dobby.grammar.natural_dates_post_processing import (
+    get_absolute_date,
+    ClarificationRequired,
+    DayTimeClarification,
+    InvalidRelativeDateException,
+)
+
+BASE = datetime(2018, 9, 2, 13, 45, 10)
+
+PHRASES = [
+    "через 2 часа",
+    "завтра в 14:00",
+    "в пятницу в 10",
+    "через полчаса",
+    "послезавтра в 3 дня",
+    "сегодня",
+    "через 3 дня",
+    "завтра в 5",
+    "сегодня в 12 ночи",
+]
+
+
+def _outcome(f):
+    try:
+        return f()
+    except (ClarificationRequired, InvalidRelativeDateException) as e:
+        return type(e), e.args
+
+
+def _result_outcome(result):
+    if isinstance(result, Exception):
+        return type(result), result.args
+
+    return result
+
+
+class AbsoluteDatesBatchTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.moments = [extract_first_natural_date(txt) for txt in PHRASES]
+
+    @parameterized.expand([
+        ("no_clarifications", ()),
+        ("day_time_clarified", (DayTimeClarification(time(7, 30)),)),
+    ])
+    def test_same_as_get_absolute_date(self, _, clarifications):
+        results = get_absolute_dates(self.moments, base=BASE, clarifications=clarifications)
+
+        self.assertListEqual(
+            [_outcome(lambda: get_absolute_date(m, base=BASE, clarifications=clarifications)) for m in self.moments],
+            [_result_outcome(r) for r in results],
+        )
+
+    def test_results_in_input_order(self):
+        results = get_absolute_dates(self.moments, base=BASE)
+
+        self.assertEqual(datetime(2018, 9, 2, 15, 45, 10), results[0])
+        self.assertEqual(datetime(2018, 9, 3, 14, 0), results[1])
+        self.assertIsInstance(results[2], InvalidRelativeDateException)
+        self.assertEqual(datetime(2018, 9, 2, 14, 15, 10), results[3])
+        self.assertIsInstance(results[5], ClarificationRequired)
+
+    def test_empty(self):
+        self.assertListEqual([], get_absolute_dates([], base=BASE))
+
+    def test_out_of_range(self):
+        moments = [
+            Moment.Frozen(effective_date=RelativeInterval.Frozen(unit=TemporalUnit.DAY, amount=10 ** 7)),
+            Moment.Frozen(effective_date=RelativeInterval.Frozen(unit=TemporalUnit.HOUR, amount=10 ** 20)),
+            Moment.Frozen(effective_date=RelativeInterval.Frozen(unit=TemporalUnit.DAY, amount=1)),
+            Moment.Frozen(effective_date=DayOfWeek.Frozen(day_of_week="пятница")),
+        ]
+
+        results = get_absolute_dates(moments, base=BASE)
+
+        self.assertIsInstance(results[0], OverflowError)
+        self.assertIsInstance(results[1], OverflowError)
+        self.assertEqual(datetime(2018, 9, 3, 13, 45, 10), results[2])
+        self.assertIsInstance(results[3], InvalidRelativeDateException)
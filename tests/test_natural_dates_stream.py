@@ -0,0 +1,84 @@
+import itertools
+import unittest
+from datetime import datetime
+
+from parameterized import parameterized
+
+from tg_dobby.grammar import iter_natural_dates
+from tg_dobby.grammar.model import RelativeDayOption, TemporalUnit
+from tg_dobby.grammar.natural_dates_stream import iter_sentence_chunks
+
+BASE = datetime(2018, 9, 2, 13, 45)
+
+TEXT = (
+    "Встреча прошла хорошо. Напомни мне завтра в 14:00 позвонить маме!\n"
+    "Отчет нужно отправить через 2 часа, а в пятницу будет ревью.\n"
+    "Послезавтра в 3 забрать посылку"
+)
+
+
+class SentenceChunksTestCase(unittest.TestCase):
+
+    @parameterized.expand([
+        ("whole_text", TEXT, 1000),
+        ("small_chunks", TEXT, 40),
+        ("tiny_chunks", TEXT, 5),
+        ("no_whitespace", "a" * 100, 7),
+    ])
+    def test_chunks_cover_input(self, _, text, max_chunk_size):
+        chunks = list(iter_sentence_chunks(text, max_chunk_size))
+
+        self.assertEqual(text, "".join(chunk for _, chunk in chunks))
+
+        for offset, chunk in chunks:
+            self.assertLessEqual(len(chunk), max_chunk_size)
+            self.assertEqual(text[offset:offset + len(chunk)], chunk)
+
+    def test_cut_at_sentence_end(self):
+        chunks = [chunk for _, chunk in iter_sentence_chunks("Раз два. Три четыре пять", 15)]
+
+        self.assertListEqual(["Раз два. ", "Три четыре пять"], chunks)
+
+    def test_stream_of_pieces(self):
+        lines = TEXT.splitlines(keepends=True)
+
+        self.assertEqual(TEXT, "".join(chunk for _, chunk in iter_sentence_chunks(lines, 30)))
+
+
+class NaturalDatesStreamTestCase(unittest.TestCase):
+
+    def test_all_dates_in_order(self):
+        matches = list(iter_natural_dates(TEXT, base=BASE, max_chunk_size=50))
+
+        self.assertListEqual(
+            ["завтра в 14:00", "через 2 часа", "в пятницу", "Послезавтра в 3"],
+            [TEXT[start:stop] for (start, stop), _, _ in matches],
+        )
+
+        self.assertEqual(RelativeDayOption.TOMORROW, matches[0].moment.effective_date.relative_day)
+        self.assertEqual(datetime(2018, 9, 3, 14, 0), matches[0].date)
+
+        self.assertEqual(TemporalUnit.HOUR, matches[1].moment.effective_date.unit)
+        self.assertEqual(datetime(2018, 9, 2, 15, 45), matches[1].date)
+
+        # Day of week is not supported and hour without time of a day needs clarification
+        self.assertIsNone(matches[2].date)
+        self.assertIsNone(matches[3].date)
+
+    def test_same_for_stream_and_text(self):
+        self.assertListEqual(
+            list(iter_natural_dates(TEXT, base=BASE)),
+            list(iter_natural_dates(TEXT.splitlines(keepends=True), base=BASE, max_chunk_size=80)),
+        )
+
+    def test_infinite_stream(self):
+        lines = itertools.cycle(["Просто текст без дат.\n", "Через полчаса созвон.\n"])
+
+        matches = list(itertools.islice(iter_natural_dates(lines, base=BASE, max_chunk_size=64), 3))
+
+        self.assertListEqual([datetime(2018, 9, 2, 14, 15)] * 3, [m.date for m in matches])
+        self.assertListEqual([22, 66, 110], [m.span[0] for m in matches])
+
+
+if __name__ == '__main__':
+    unittest.main()
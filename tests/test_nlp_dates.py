@@ -7,7 +7,9 @@ from parameterized import parameterized
 from tests.utils import escape_test_suffix
 from tg_dobby.grammar import extract_first_natural_date
 from tg_dobby.grammar.model import TemporalUnit, NamedInterval, RelativeDayOption, UnitRelativePosition, TimesOfADayOption
-from tg_dobby.grammar.natural_dates import Moment, DayOfWeek, DayTime, RelativeDay, RelativeInterval
+from tg_dobby.grammar.natural_dates import (
+    Moment, DayOfWeek, DayTime, RelativeDay, RelativeInterval, extract_time_of_a_day
+)
 
 CASES = (
     (
@@ -140,6 +142,16 @@ class NaturalDatesTestCase(unittest.TestCase):
 
         self.assertEqual(expected_moment, actual_moment)
 
+    @parameterized.expand([
+        ("utrom", "утром", TimesOfADayOption.MORNING),
+        ("vechera", "Вечера", TimesOfADayOption.EVENING),
+        ("dnjom", "днём", TimesOfADayOption.DAY),
+        ("v_12_nochi", "в 12 ночи", TimesOfADayOption.NIGHT),
+        ("no_time_of_a_day", "в 5", None),
+    ])
+    def test_extract_time_of_a_day(self, _, text, expected):
+        self.assertEqual(expected, extract_time_of_a_day(text))
+
 
 if __name__ == '__main__':
     unittest.main()
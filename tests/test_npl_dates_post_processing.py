@@ -13,6 +13,7 @@ from tg_dobby.grammar.natural_dates_post_processing import (
     ALL_CLARIFICATIONS_CLASSES,
     DayTimeClarification,
     ClarificationRequired,
+    ResolutionState,
     TimeOfADayClarification)
 from tg_dobby.grammar.natural_dates import DayTime, RULE_DAY_TIME, Moment, RULE_MOMENT, TimesOfADayOption as ToaD
 
@@ -175,5 +176,68 @@ class NaturalDateFullProcessingTestCase(unittest.TestCase):
         self.assertEqual(case.expected_result, actual_result, f"Wrong interpretation for {case.text}")
 
 
+class ResolutionStateTestCase(unittest.TestCase):
+    BASE = datetime(year=_Y, month=9, day=2, hour=14, minute=45)
+
+    @classmethod
+    def setUpClass(cls):
+        cls.moment_parser = Parser(RULE_MOMENT)
+        cls.day_time_parser = Parser(RULE_DAY_TIME)
+
+    def _resolve(self, state: ResolutionState) -> Tuple[ALL_CLARIFICATIONS_CLASSES, ...]:
+        with self.assertRaises(ClarificationRequired) as ctx:
+            state.resolve()
+
+        return ctx.exception.required_clarifications
+
+    @parameterized.expand([
+        (escape_test_suffix(case[0]), *case) for case in CORRECT_DATE_TIME_CASES if case[0] != "через неделю"
+    ])
+    def test_same_as_get_absolute_date(self, _, text, base_datetime: datetime, expected: datetime):
+        state = ResolutionState(self.moment_parser.match(text).fact, base=base_datetime)
+
+        self.assertEqual(expected, state.resolve())
+        self.assertTupleEqual((), state.pending)
+
+    @parameterized.expand([
+        (escape_test_suffix(case.text), case) for case in CLARIFICATION_DATE_TIME_CASES
+    ])
+    def test_single_clarification(self, _, case: ClarifiedDateTimeCase):
+        state = ResolutionState(self.moment_parser.match(case.text).fact, base=case.base_datetime)
+
+        self.assertListEqual([type(case.clarification)], [type(c) for c in self._resolve(state)])
+
+        state.clarify(case.clarification)
+
+        self.assertEqual(case.expected_result, state.resolve())
+
+    def test_multi_step(self):
+        state = ResolutionState(self.moment_parser.match("завтра").fact, base=self.BASE)
+
+        self.assertTupleEqual((DayTimeClarification(self.BASE.time()),), self._resolve(state))
+
+        # Day time answered in words requires time of a day in turn
+        state.clarify(DayTimeClarification(self.day_time_parser.match("в 5").fact))
+
+        self.assertTupleEqual((TimeOfADayClarification(ToaD.DAY),), self._resolve(state))
+        self.assertIsNone(state.day_time)
+
+        state.clarify(TimeOfADayClarification(ToaD.EVENING))
+
+        self.assertEqual(datetime(year=_Y, month=9, day=3, hour=17), state.resolve())
+        self.assertEqual(time(17, 00), state.day_time)
+
+    def test_pending_not_answered(self):
+        state = ResolutionState(self.moment_parser.match("завтра в два").fact, base=self.BASE)
+
+        self._resolve(state)
+
+        # Resolution does not proceed until pending clarification is answered
+        self.assertTupleEqual((TimeOfADayClarification(ToaD.DAY),), self._resolve(state))
+
+        with self.assertRaises(ValueError):
+            state.clarify(DayTimeClarification(time(15, 00)))
+
+
 if __name__ == '__main__':
     unittest.main()
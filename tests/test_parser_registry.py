@@ -0,0 +1,46 @@
+import unittest
+
+from tg_dobby.grammar.natural_dates import RULE_DAY_TIME, RULE_MOMENT
+from tg_dobby.grammar.parser_registry import ParserRegistry
+from tg_dobby.grammar.tokenizer import compose_token_rule
+
+
+class ParserRegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ParserRegistry()
+
+    def test_same_rules_compiled_once(self):
+        first = self.registry.get_parser((RULE_MOMENT, RULE_DAY_TIME), compose=compose_token_rule)
+        second = self.registry.get_parser([RULE_MOMENT, RULE_DAY_TIME], compose=compose_token_rule)
+
+        self.assertIs(first, second)
+        self.assertEqual(1, len(self.registry.stats()))
+        self.assertEqual(2, self.registry.stats()[0].hits)
+
+    def test_distinct_rule_sets(self):
+        self.registry.get_parser((RULE_MOMENT,), compose=compose_token_rule)
+        self.registry.get_parser((RULE_DAY_TIME,), compose=compose_token_rule)
+        self.registry.get_parser((RULE_DAY_TIME,))
+
+        self.assertEqual(3, len(self.registry.stats()))
+
+    def test_warm_up_is_not_a_hit(self):
+        self.registry.warm_up((RULE_DAY_TIME,), label="day_time")
+        self.registry.warm_up((RULE_DAY_TIME,), label="ignored")
+
+        stats, = self.registry.stats()
+
+        self.assertEqual("day_time", stats.label)
+        self.assertEqual(0, stats.hits)
+        self.assertGreater(stats.compile_time, 0)
+
+    def test_parsers_share_tokenizer(self):
+        first = self.registry.get_parser((RULE_MOMENT,))
+        second = self.registry.get_parser((RULE_DAY_TIME,))
+
+        self.assertIs(first.tokenizer, second.tokenizer)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+import unittest
+
+from tg_dobby.grammar import extract_first_natural_date
+from tg_dobby.grammar.tokenizer import tokenize_phrase
+from tg_dobby.parsing_service import ParsingService, ParsingServiceOverloaded
+
+
+class ParsingServiceTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def _run_with_service(self, service: ParsingService, coro_fn):
+        service.start()
+        try:
+            return self.loop.run_until_complete(coro_fn(service))
+        finally:
+            service.shutdown()
+
+    def test_thread_pool_tokenize(self):
+        text = "Напомни мне завтра в 3 дня позвонить маме"
+
+        tokens = self._run_with_service(ParsingService(), lambda s: s.tokenize_phrase(text))
+
+        self.assertListEqual(
+            [(t.text, t.fact) for t in tokenize_phrase(text)],
+            [(t.text, t.fact) for t in tokens],
+        )
+
+    def test_process_pool_extract(self):
+        text = "Послезавтра в 4 часа дня"
+
+        moment = self._run_with_service(
+            ParsingService(pool=ParsingService.POOL_PROCESS, workers=1),
+            lambda s: s.extract_first_natural_date(text),
+        )
+
+        self.assertEqual(extract_first_natural_date(text), moment)
+
+    def test_overloaded_service_rejects_jobs(self):
+        async def submit_burst(service: ParsingService):
+            return await asyncio.gather(*[
+                service.extract_first_natural_date("завтра в 4")
+                for _ in range(3)
+            ], return_exceptions=True)
+
+        service = ParsingService(queue_size=1)
+        results = self._run_with_service(service, submit_burst)
+
+        self.assertEqual(2, sum(isinstance(r, ParsingServiceOverloaded) for r in results))
+        self.assertEqual(2, service.stats().rejected)
+        self.assertEqual(1, service.stats().completed)
+
+    def test_failed_job_not_completed(self):
+        service = ParsingService()
+
+        with self.assertRaises(ValueError):
+            self._run_with_service(service, lambda s: s._submit(int, "not a number"))
+
+        self.assertEqual((0, 0), (service.stats().pending, service.stats().completed))
+
+    def test_cancelled_caller_keeps_slot(self):
+        started, release = threading.Event(), threading.Event()
+
+        def job():
+            started.set()
+            release.wait(5)
+
+        async def cancel_caller(service: ParsingService):
+            caller = asyncio.ensure_future(service._submit(job))
+            await self.loop.run_in_executor(None, started.wait, 5)
+
+            caller.cancel()
+            await asyncio.sleep(0)
+
+            # Job still occupies worker
+            pending = service.stats().pending
+            rejected = await asyncio.gather(service._submit(job), return_exceptions=True)
+
+            release.set()
+
+            while service.stats().pending:
+                await asyncio.sleep(0.01)
+
+            return pending, rejected
+
+        service = ParsingService(workers=1, queue_size=1)
+        pending, rejected = self._run_with_service(service, cancel_caller)
+
+        self.assertEqual(1, pending)
+        self.assertIsInstance(rejected[0], ParsingServiceOverloaded)
+        self.assertEqual(1, service.stats().completed)
+
+
+if __name__ == '__main__':
+    unittest.main()
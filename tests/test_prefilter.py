@@ -0,0 +1,48 @@
+import unittest
+
+from parameterized import parameterized
+
+from tests.test_nlp_dates import CASES as NATURAL_DATES_CASES
+from tests.test_tokenizer import CASES as TOKENIZER_CASES
+from tests.utils import escape_test_suffix
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+from tg_dobby.grammar.prefilter import TriggerIndex
+from tg_dobby.grammar.tokenizer import DEFAULT_TOKENIZER_RULES, RULE_REMINDER_PREAMBLE
+
+NO_TRIGGER_CASES = (
+    "Привет, как жизнь?",
+    "позвонить маме",
+    "Hello world",
+    "",
+)
+
+
+class TriggerIndexTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.index = TriggerIndex.from_rules(DEFAULT_TOKENIZER_RULES, MORPH_CACHE)
+
+    @parameterized.expand([
+        (escape_test_suffix(text), text) for text in [case[0] for case in NATURAL_DATES_CASES + TOKENIZER_CASES]
+    ])
+    def test_phrase_with_date_passes(self, _, text):
+        self.assertTrue(self.index.may_match(text))
+
+    @parameterized.expand([
+        (escape_test_suffix(text), text) for text in NO_TRIGGER_CASES
+    ])
+    def test_phrase_without_date_rejected(self, _, text):
+        self.assertFalse(self.index.may_match(text))
+
+    def test_digits_trigger_only_numeric_grammar(self):
+        self.assertTrue(self.index.may_match("в 15:30"))
+
+        preamble_index = TriggerIndex.from_rules([RULE_REMINDER_PREAMBLE], MORPH_CACHE)
+
+        self.assertFalse(preamble_index.may_match("в 15:30"))
+        self.assertTrue(preamble_index.may_match("Напомни"))
+
+
+if __name__ == '__main__':
+    unittest.main()
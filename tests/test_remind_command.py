@@ -0,0 +1,118 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from aiotg import Chat
+
+from tg_dobby.date_utils import add_months
+from tg_dobby.tg_bot import NO_KEYBOARD, RemindCommand
+from tg_dobby.tg_bot_base import CallbackQueryData, InlineKeyboard, InlineKeyboardEditor, MessageData
+
+MESSAGE_ID = 7
+
+
+class FakeBot:
+    def __init__(self):
+        self.calls = []
+
+    async def api_call(self, method, **params):
+        self.calls.append((method, params))
+
+        if method == "sendMessage":
+            return {"ok": True, "result": {"message_id": MESSAGE_ID}}
+
+        return {"ok": True}
+
+    def markups(self):
+        return [params.get("reply_markup") for method, params in self.calls if method == "editMessageReplyMarkup"]
+
+    def acks(self):
+        return [params["callback_query_id"] for method, params in self.calls if method == "answerCallbackQuery"]
+
+
+def _shown_date(markup: str) -> datetime:
+    return datetime.strptime(json.loads(markup)["inline_keyboard"][0][0]["text"], "%d %b %Y %H:%M")
+
+
+class RemindCommandRequestDateTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.bot = FakeBot()
+        self.command = RemindCommand(self.loop, Chat(self.bot, 42, "group"), reminder_dispatcher=None)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _callback(self, query_id: str, data: str):
+        self.command._q.put_nowait(CallbackQueryData(
+            id=query_id, message=MessageData(message_id=MESSAGE_ID), data=data,
+        ))
+
+    def _settle(self):
+        for _ in range(10):
+            self.loop.run_until_complete(asyncio.sleep(0, loop=self.loop))
+
+    def _finish(self, task: asyncio.Future) -> datetime:
+        self._callback("submit", "submit")
+        return self.loop.run_until_complete(asyncio.wait_for(task, 5, loop=self.loop))
+
+    def test_queued_callbacks_coalesced(self):
+        task = self.loop.create_task(self.command.request_date())
+        self._settle()
+
+        initial, = self.bot.markups()
+
+        for i, data in enumerate(["d_inc", "d_inc", "m_inc", "d_dec", "d_inc"]):
+            self._callback(str(i), data)
+
+        self._settle()
+
+        # One edit with the final keyboard, every callback is acknowledged
+        self.assertEqual(2, len(self.bot.markups()))
+        self.assertCountEqual(["0", "1", "2", "3", "4"], self.bot.acks())
+
+        expected = add_months(_shown_date(initial) + timedelta(days=2), 1)
+        self.assertEqual(expected, _shown_date(self.bot.markups()[-1]))
+
+        self.assertEqual(expected, self._finish(task))
+
+    def test_unchanged_keyboard_not_edited(self):
+        task = self.loop.create_task(self.command.request_date())
+        self._settle()
+
+        self._callback("0", "d_click")
+        self._callback("1", "m_click")
+        self._settle()
+
+        self.assertEqual(1, len(self.bot.markups()))
+        self.assertCountEqual(["0", "1"], self.bot.acks())
+
+        self._finish(task)
+
+        self.assertEqual(NO_KEYBOARD.json(), self.bot.markups()[-1])
+        self.assertCountEqual(["0", "1", "submit"], self.bot.acks())
+
+
+class InlineKeyboardEditorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.bot = FakeBot()
+        self.command = RemindCommand(self.loop, Chat(self.bot, 42, "group"), reminder_dispatcher=None)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_edit_skipped_for_shown_markup(self):
+        shown = InlineKeyboard([[("a", "a")]])
+        editor = InlineKeyboardEditor(self.command, MESSAGE_ID, shown)
+
+        self.loop.run_until_complete(editor.edit(InlineKeyboard([[("a", "a")]])))
+        self.assertListEqual([], self.bot.calls)
+
+        self.loop.run_until_complete(editor.edit(InlineKeyboard([[("b", "b")]])))
+        self.loop.run_until_complete(editor.edit(InlineKeyboard([[("b", "b")]])))
+
+        self.assertEqual([InlineKeyboard([[("b", "b")]]).json()], self.bot.markups())
@@ -0,0 +1,420 @@
+import asyncio
+import os
+import time
+import unittest
+import uuid
+from typing import Dict, Iterable, List, Optional
+
+import aioredis
+from parameterized import parameterized
+
+from tg_dobby.reminders import AbstractReminderStorage, RedisSortedSetReminderStorage, Reminder, ReminderDispatcher
+from tg_dobby.shard_leases import shard_of
+
+# Integration tests are skipped if Redis is not available
+REDIS_URL = os.environ.get("TEST_REDIS_URL", "redis://localhost:6379")
+
+
+class FakeStorage(AbstractReminderStorage):
+    """
+    In-memory storage with the same lease semantics as Redis one
+    """
+
+    def __init__(self):
+        self.queue = {}  # type: Dict[str, float]
+        self.leases = {}  # type: Dict[str, float]
+        self.info = {}  # type: Dict[str, dict]
+
+    @property
+    def shards(self) -> int:
+        return 1
+
+    async def add(self, reminder: Reminder):
+        self.info[reminder.id] = reminder.dict(exclude={"lease"})
+        self.queue[reminder.id] = reminder.due
+
+    def _lease(self, reminder_id: str, now: float, lease: float) -> Reminder:
+        self.leases[reminder_id] = now + lease
+        self.info[reminder_id]["lease"] = uuid.uuid4().hex
+
+        return Reminder(**self.info[reminder_id])
+
+    async def claim(self, reminder: Reminder, now: float, lease: float) -> Optional[Reminder]:
+        if self.queue.pop(reminder.id, None) is None:
+            return None
+
+        return self._lease(reminder.id, now, lease)
+
+    async def claim_due(self, shard: int, now: float, limit: int, lease: float) -> List[Reminder]:
+        for reminder_id, expires in list(self.leases.items()):
+            if expires <= now:
+                del self.leases[reminder_id]
+                self.queue[reminder_id] = now
+
+        due = sorted((due, reminder_id) for reminder_id, due in self.queue.items() if due <= now)[:limit]
+
+        for _, reminder_id in due:
+            del self.queue[reminder_id]
+
+        return [self._lease(reminder_id, now, lease) for _, reminder_id in due]
+
+    def _holds(self, reminder: Reminder) -> bool:
+        return self.info.get(reminder.id, {}).get("lease") == reminder.lease
+
+    async def extend(self, reminder: Reminder, now: float, lease: float) -> bool:
+        if not self._holds(reminder):
+            return False
+
+        self.queue.pop(reminder.id, None)
+        self.leases[reminder.id] = now + lease
+        return True
+
+    async def ack(self, reminder: Reminder) -> bool:
+        if not self._holds(reminder):
+            return False
+
+        self.queue.pop(reminder.id, None)
+        self.leases.pop(reminder.id, None)
+        del self.info[reminder.id]
+        return True
+
+    async def retry(self, reminder: Reminder, due: float) -> bool:
+        if not self._holds(reminder):
+            return False
+
+        info = self.info[reminder.id]
+        info["attempts"] += 1
+        del info["lease"]
+
+        self.leases.pop(reminder.id, None)
+        self.queue[reminder.id] = due
+        return True
+
+    async def next_due(self, shards: Iterable[int]) -> Optional[float]:
+        return min(self.queue.values(), default=None)
+
+
+class FakeShardLeases:
+    shards = 1
+    owned = frozenset([0])
+
+    def add_listener(self, listener):
+        pass
+
+
+class FakeBot:
+    def __init__(self, failures: int = 0):
+        self.sent = []
+        self.attempts = 0
+        self.failures = failures
+
+    async def send_message(self, chat_id, text):
+        self.attempts += 1
+
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("Bot API is down")
+
+        self.sent.append((chat_id, text))
+
+
+class ReminderDispatcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.storage = FakeStorage()
+        self.bot = FakeBot()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _dispatcher(self, **kwargs) -> ReminderDispatcher:
+        kwargs.setdefault("max_sleep", 0.01)
+        return ReminderDispatcher(self.loop, self.storage, self.bot, FakeShardLeases(), **kwargs)
+
+    def _add(self, chat_id: str = "1", text: str = "text", due: float = None) -> Reminder:
+        reminder = Reminder(id=uuid.uuid4().hex, chat_id=chat_id, text=text, due=due or time.time() - 1)
+        self.loop.run_until_complete(self.storage.add(reminder))
+
+        return reminder
+
+    def _run(self, dispatcher: ReminderDispatcher, until, *coros):
+        """
+        Runs dispatcher until condition holds
+        """
+        async def wait():
+            await asyncio.gather(*coros, loop=self.loop)
+
+            while not until():
+                await asyncio.sleep(0.005, loop=self.loop)
+
+        task = self.loop.create_task(dispatcher.run())
+
+        try:
+            self.loop.run_until_complete(asyncio.wait_for(wait(), 5, loop=self.loop))
+        finally:
+            task.cancel()
+            self.loop.run_until_complete(asyncio.gather(task, return_exceptions=True, loop=self.loop))
+
+    def test_ack_after_success(self):
+        self._add(chat_id="1", text="first")
+        self._add(chat_id="2", text="second")
+
+        self._run(self._dispatcher(), lambda: not self.storage.info)
+
+        self.assertCountEqual([("1", "Напоминаю: first"), ("2", "Напоминаю: second")], self.bot.sent)
+        self.assertDictEqual({}, self.storage.queue)
+        self.assertDictEqual({}, self.storage.leases)
+
+    def test_retry_with_backoff(self):
+        self.bot.failures = 1
+        reminder = self._add()
+        started = time.time()
+
+        self._run(self._dispatcher(retry_delay=10.0), lambda: self.storage.info[reminder.id]["attempts"])
+
+        self.assertListEqual([], self.bot.sent)
+        self.assertDictEqual({}, self.storage.leases)
+        self.assertGreaterEqual(self.storage.queue[reminder.id], started + 10.0)
+
+    @parameterized.expand([
+        (0, 5.0),
+        (1, 10.0),
+        (3, 40.0),
+    ])
+    def test_backoff(self, attempts, delay):
+        self.assertEqual(delay, self._dispatcher(retry_delay=5.0)._backoff(attempts))
+
+    def test_drop_after_max_attempts(self):
+        self.bot.failures = 100
+        self._add()
+
+        self._run(self._dispatcher(retry_delay=0.001, max_attempts=3), lambda: not self.storage.info)
+
+        self.assertEqual(3, self.bot.attempts)
+        self.assertDictEqual({}, self.storage.queue)
+
+    def test_claim_race(self):
+        reminders = [self._add(chat_id=str(i), text=str(i)) for i in range(10)]
+        dispatcher = self._dispatcher()
+
+        # Timing wheel fires while dispatcher claims the same due reminders
+        self._run(
+            dispatcher, lambda: not self.storage.info,
+            *[dispatcher._claim_and_deliver(reminder) for reminder in reminders]
+        )
+
+        self.assertCountEqual([(str(i), f"Напоминаю: {i}") for i in range(10)], self.bot.sent)
+
+    def test_lease_lost_not_sent(self):
+        self._add()
+        dispatcher = self._dispatcher()
+
+        stale, = self.loop.run_until_complete(self.storage.claim_due(0, time.time(), 10, lease=0.0))
+        # Lease expired and reminder is claimed by other worker
+        claimed, = self.loop.run_until_complete(self.storage.claim_due(0, time.time(), 10, lease=60.0))
+
+        self.loop.run_until_complete(dispatcher._deliver(stale))
+
+        self.assertListEqual([], self.bot.sent)
+        self.assertIn(stale.id, self.storage.leases)
+        self.assertEqual(claimed.lease, self.storage.info[stale.id]["lease"])
+
+    def test_lease_extended_while_sending(self):
+        reminder = self._add()
+        sending = asyncio.Event(loop=self.loop)
+        release = asyncio.Event(loop=self.loop)
+
+        async def send_message(chat_id, text):
+            sending.set()
+            await release.wait()
+            self.bot.sent.append((chat_id, text))
+
+        self.bot.send_message = send_message
+        dispatcher = self._dispatcher(lease=0.06)
+
+        async def check():
+            await sending.wait()
+            await asyncio.sleep(0.2, loop=self.loop)
+
+            # Other worker finds nothing to claim: lease is kept alive by the sending one
+            self.assertListEqual([], await self.storage.claim_due(0, time.time(), 10, lease=60.0))
+            release.set()
+
+        self._run(dispatcher, lambda: not self.storage.info, check())
+
+        self.assertListEqual([("1", "Напоминаю: text")], self.bot.sent)
+        self.assertNotIn(reminder.id, self.storage.info)
+
+
+class StubRedis:
+    def __init__(self, reply):
+        self.reply = reply
+        self.removed = []
+
+    async def evalsha(self, digest, keys=(), args=()):
+        return self.reply
+
+    async def zrem(self, key, member):
+        self.removed.append((key, member))
+
+
+class RedisSortedSetReminderStorageTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_claim_due_data_lost(self):
+        redis = StubRedis([
+            b"lost", [],
+            b"kept", [b"id", b"kept", b"chat_id", b"1", b"text", b"t", b"due", b"1.5", b"attempts", b"2",
+                      b"lease", b"token"],
+        ])
+        storage = RedisSortedSetReminderStorage(redis, shards=4)
+
+        claimed = self.loop.run_until_complete(storage.claim_due(3, time.time(), 10, 60.0))
+
+        self.assertListEqual(
+            [Reminder(id="kept", chat_id="1", text="t", due=1.5, attempts=2, lease="token")], claimed
+        )
+        # Lease of reminder without data is dropped, so it is not claimed again
+        self.assertListEqual([("reminders:3:leases", b"lost")], redis.removed)
+
+
+class IsolatedRedisReminderStorage(RedisSortedSetReminderStorage):
+    QUEUE_KEY_TEMPLATE = "test-reminders:{shard}:queue"
+    LEASES_KEY_TEMPLATE = "test-reminders:{shard}:leases"
+
+    INFO_KEY_PREFIX = "test-reminder:"
+
+
+class RedisSortedSetReminderStorageIntegrationTestCase(unittest.TestCase):
+    """
+    Runs storage scripts on real Redis (see TEST_REDIS_URL)
+    """
+    SHARDS = 2
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+
+        try:
+            self.redis = self._run(aioredis.create_redis(REDIS_URL, timeout=1, loop=self.loop))
+        except (OSError, asyncio.TimeoutError) as e:
+            self.loop.close()
+            self.skipTest(f"Redis is not available at {REDIS_URL}: {e}")
+
+        self.storage = IsolatedRedisReminderStorage(self.redis, shards=self.SHARDS)
+        self._clean()
+
+    def tearDown(self):
+        self._clean()
+        self.redis.close()
+        self._run(self.redis.wait_closed())
+        self.loop.close()
+
+    def _run(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def _clean(self):
+        keys = self._run(self.redis.keys("test-reminder*"))
+
+        if keys:
+            self._run(self.redis.delete(*keys))
+
+    def _add(self, chat_id: str = "1", due: float = None) -> Reminder:
+        reminder = Reminder(
+            id=uuid.uuid4().hex, chat_id=chat_id, text="text", due=time.time() - 1 if due is None else due,
+        )
+        self._run(self.storage.add(reminder))
+
+        return reminder
+
+    def _claim_due(self, reminder: Reminder, now: float = None, lease: float = 60.0) -> List[Reminder]:
+        shard = shard_of(reminder.chat_id, self.SHARDS)
+        return self._run(self.storage.claim_due(shard, time.time() if now is None else now, 10, lease))
+
+    def _score(self, template: str, reminder: Reminder) -> Optional[float]:
+        key = template.format(shard=shard_of(reminder.chat_id, self.SHARDS))
+        return self._run(self.redis.zscore(key, reminder.id))
+
+    def test_claim_due_and_ack(self):
+        reminder = self._add()
+
+        claimed, = self._claim_due(reminder)
+
+        self.assertEqual(reminder.dict(exclude={"lease"}), claimed.dict(exclude={"lease"}))
+        self.assertIsNotNone(claimed.lease)
+
+        # Claimed reminder is invisible to other workers and to timer of scheduling process
+        self.assertListEqual([], self._claim_due(reminder))
+        self.assertIsNone(self._run(self.storage.claim(reminder, time.time(), 60.0)))
+
+        self.assertTrue(self._run(self.storage.extend(claimed, time.time(), 60.0)))
+        self.assertTrue(self._run(self.storage.ack(claimed)))
+
+        self.assertFalse(self._run(self.redis.exists(self.storage._info_key(reminder.id))))
+        self.assertIsNone(self._score(IsolatedRedisReminderStorage.LEASES_KEY_TEMPLATE, reminder))
+
+    def test_claim(self):
+        reminder = self._add(due=time.time() + 100)
+
+        claimed = self._run(self.storage.claim(reminder, time.time(), 60.0))
+
+        self.assertEqual(reminder.id, claimed.id)
+        self.assertIsNotNone(claimed.lease)
+        self.assertIsNone(self._run(self.storage.claim(reminder, time.time(), 60.0)))
+        self.assertIsNone(self._score(IsolatedRedisReminderStorage.QUEUE_KEY_TEMPLATE, reminder))
+        self.assertTrue(self._run(self.storage.ack(claimed)))
+
+    def test_expired_lease_claimed_again(self):
+        reminder = self._add()
+        now = time.time()
+
+        stale, = self._claim_due(reminder, now, lease=1.0)
+        claimed, = self._claim_due(reminder, now + 2, lease=60.0)
+
+        self.assertNotEqual(stale.lease, claimed.lease)
+
+        self.assertFalse(self._run(self.storage.extend(stale, now + 2, 60.0)))
+        self.assertFalse(self._run(self.storage.retry(stale, now + 10)))
+        self.assertFalse(self._run(self.storage.ack(stale)))
+
+        self.assertTrue(self._run(self.storage.ack(claimed)))
+
+    def test_retry(self):
+        reminder = self._add()
+        claimed, = self._claim_due(reminder)
+        due = time.time() + 100
+
+        self.assertTrue(self._run(self.storage.retry(claimed, due)))
+        # Lease is released by retry
+        self.assertFalse(self._run(self.storage.ack(claimed)))
+
+        self.assertListEqual([], self._claim_due(reminder))
+        self.assertAlmostEqual(due, self._run(self.storage.next_due(range(self.SHARDS))), places=3)
+
+        retried, = self._claim_due(reminder, due + 1)
+        self.assertEqual(1, retried.attempts)
+
+    def test_next_due(self):
+        now = time.time()
+
+        self.assertIsNone(self._run(self.storage.next_due(range(self.SHARDS))))
+        self.assertIsNone(self._run(self.storage.next_due([])))
+
+        for i, delay in enumerate([30, 10, 20]):
+            self._add(chat_id=str(i), due=now + delay)
+
+        self.assertAlmostEqual(now + 10, self._run(self.storage.next_due(range(self.SHARDS))), places=3)
+
+    def test_claim_due_data_lost(self):
+        reminder = self._add()
+        self._run(self.redis.delete(self.storage._info_key(reminder.id)))
+
+        self.assertListEqual([], self._claim_due(reminder))
+
+        self.assertIsNone(self._score(IsolatedRedisReminderStorage.QUEUE_KEY_TEMPLATE, reminder))
+        self.assertIsNone(self._score(IsolatedRedisReminderStorage.LEASES_KEY_TEMPLATE, reminder))
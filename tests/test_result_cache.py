@@ -0,0 +1,130 @@
+import pickle
+import unittest
+
+from parameterized import parameterized
+
+from tests.test_nlp_dates import CASES as NATURAL_DATES_CASES
+from tests.test_tokenizer import CASES as TOKENIZER_CASES
+from tests.utils import escape_test_suffix
+from tg_dobby.grammar import extract_first_natural_date
+from tg_dobby.grammar.result_cache import LruResultCache, GRAMMAR_RESULT_CACHE, normalize_phrase
+from tg_dobby.grammar.tokenizer import tokenize_phrase
+from tg_dobby.grammar.yargy_utils import fact_as_json
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class LruResultCacheTestCase(unittest.TestCase):
+
+    def test_disabled_cache_does_not_store(self):
+        cache = LruResultCache()
+
+        self.assertEqual(1, cache.get_or_compute("a", lambda: 1))
+        self.assertEqual(2, cache.get_or_compute("a", lambda: 2))
+        self.assertEqual(0, cache.stats().size)
+
+    def test_hits_and_misses(self):
+        cache = LruResultCache(max_size=10)
+
+        cache.get_or_compute("a", lambda: 1)
+        self.assertEqual(1, cache.get_or_compute("a", lambda: 2))
+
+        stats = cache.stats()
+        self.assertEqual((1, 1), (stats.hits, stats.misses))
+
+    def test_least_recently_used_is_evicted(self):
+        cache = LruResultCache(max_size=2)
+
+        cache.get_or_compute("a", lambda: 1)
+        cache.get_or_compute("b", lambda: 2)
+        cache.get_or_compute("a", lambda: None)
+        cache.get_or_compute("c", lambda: 3)
+
+        self.assertEqual(1, cache.get_or_compute("a", lambda: None))
+        self.assertEqual("recomputed", cache.get_or_compute("b", lambda: "recomputed"))
+
+    def test_ttl(self):
+        clock = FakeClock()
+        cache = LruResultCache(max_size=10, ttl=5, clock=clock)
+
+        cache.get_or_compute("a", lambda: 1)
+
+        clock.now = 4
+        self.assertEqual(1, cache.get_or_compute("a", lambda: 2))
+
+        clock.now = 6
+        self.assertEqual(2, cache.get_or_compute("a", lambda: 2))
+        self.assertEqual(1, cache.stats().expirations)
+
+
+class GrammarResultCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        GRAMMAR_RESULT_CACHE.configure(max_size=100)
+        GRAMMAR_RESULT_CACHE.clear()
+
+    def tearDown(self):
+        GRAMMAR_RESULT_CACHE.configure(max_size=0)
+        GRAMMAR_RESULT_CACHE.clear()
+
+    @parameterized.expand([
+        (escape_test_suffix(case[0]), case[0]) for case in NATURAL_DATES_CASES
+    ])
+    def test_normalized_phrase_gives_same_moment(self, _, text):
+        GRAMMAR_RESULT_CACHE.configure(max_size=0)
+
+        self.assertEqual(extract_first_natural_date(text), extract_first_natural_date(normalize_phrase(text)))
+
+    def test_cached_moment_is_immutable(self):
+        first = extract_first_natural_date("завтра  в 4")
+
+        with self.assertRaises(AttributeError):
+            first.effective_date.day_time.hour = 5
+
+        second = extract_first_natural_date("завтра в 4")
+
+        self.assertIs(first, second)
+        self.assertEqual(4, second.effective_date.day_time.hour)
+        self.assertEqual(1, GRAMMAR_RESULT_CACHE.stats().hits)
+
+        # Frozen facts does not reference parser internals
+        self.assertEqual(second, pickle.loads(pickle.dumps(second)))
+        self.assertEqual("TOMORROW", fact_as_json(second)["effective_date"]["relative_day"].value)
+
+    @parameterized.expand([
+        ("lower_first", "завтра в 4", "завтра В 4"),
+        ("upper_first", "завтра В 4", "завтра в 4"),
+        ("capitalized", "Завтра в 4", "завтра в 4"),
+    ])
+    def test_case_variants_not_shared(self, _, cached_text, text):
+        GRAMMAR_RESULT_CACHE.configure(max_size=0)
+        expected = extract_first_natural_date(text)
+
+        GRAMMAR_RESULT_CACHE.configure(max_size=100)
+        extract_first_natural_date(cached_text)
+
+        self.assertEqual(expected, extract_first_natural_date(text))
+
+    @parameterized.expand([
+        (escape_test_suffix(case[0]), case[0]) for case in TOKENIZER_CASES
+    ])
+    def test_cached_tokens(self, _, text):
+        GRAMMAR_RESULT_CACHE.configure(max_size=0)
+        expected = [(token.text, token.fact) for token in tokenize_phrase(text)]
+
+        GRAMMAR_RESULT_CACHE.configure(max_size=100)
+        tokenize_phrase(text)
+        actual = [(token.text, token.fact) for token in tokenize_phrase(text)]
+
+        self.assertListEqual(expected, actual)
+        self.assertEqual(1, GRAMMAR_RESULT_CACHE.stats().hits)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,155 @@
+import asyncio
+import unittest
+
+from tg_dobby.send_queue import Priority, RetryAfter, SendQueue, SendQueueClosed, TransientApiError
+
+
+class FakeTransport:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.sent = []
+        # Exceptions raised instead of sending, by text of message
+        self.failures = {}
+
+    async def __call__(self, method, params):
+        failures = self.failures.get(params.get("text"))
+
+        if failures:
+            raise failures.pop(0)
+
+        self.sent.append((params.get("text"), self.loop.time()))
+        return {"ok": True, "result": params.get("text")}
+
+    @property
+    def texts(self):
+        return [text for text, _ in self.sent]
+
+
+class SendQueueTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.transport = FakeTransport(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _run(self, queue: SendQueue, coro):
+        task = self.loop.create_task(queue.run())
+
+        try:
+            return self.loop.run_until_complete(asyncio.wait_for(coro, 5, loop=self.loop))
+        finally:
+            task.cancel()
+            self.loop.run_until_complete(asyncio.gather(task, return_exceptions=True, loop=self.loop))
+
+    def _queue(self, **kwargs) -> SendQueue:
+        return SendQueue(self.loop, self.transport, **kwargs)
+
+    def _gather(self, futures):
+        return asyncio.gather(*futures, loop=self.loop, return_exceptions=True)
+
+    def test_results(self):
+        queue = self._queue()
+        futures = [queue.submit("sendMessage", {"chat_id": i, "text": f"m{i}"}) for i in range(5)]
+
+        results = self._run(queue, self._gather(futures))
+
+        self.assertListEqual([{"ok": True, "result": f"m{i}"} for i in range(5)], results)
+        self.assertEqual(5, queue.stats().sent)
+
+    def test_interactive_before_bulk(self):
+        queue = self._queue(rate=50, burst=1)
+
+        futures = [queue.submit("sendMessage", {"chat_id": i, "text": f"bulk{i}"}, Priority.BULK) for i in range(3)]
+        futures += [queue.submit("sendMessage", {"chat_id": 10 + i, "text": f"reply{i}"}) for i in range(2)]
+
+        stats = queue.stats()
+        self.assertEqual((3, 2), (stats.depth_bulk, stats.depth_interactive))
+
+        self._run(queue, self._gather(futures))
+
+        self.assertListEqual(["reply0", "reply1", "bulk0", "bulk1", "bulk2"], self.transport.texts)
+
+    def test_chat_rate(self):
+        queue = self._queue(chat_rate=20, chat_burst=1)
+
+        futures = [queue.submit("sendMessage", {"chat_id": 1, "text": f"a{i}"}) for i in range(3)]
+        futures.append(queue.submit("sendMessage", {"chat_id": 2, "text": "b"}))
+
+        self._run(queue, self._gather(futures))
+
+        # Chat waiting for its token does not hold others
+        self.assertListEqual(["a0", "b", "a1", "a2"], self.transport.texts)
+
+        times = [t for text, t in self.transport.sent if text.startswith("a")]
+        self.assertGreaterEqual(times[2] - times[0], 2 / 20 * 0.9)
+
+    def test_retry_after(self):
+        queue = self._queue()
+        self.transport.failures["a"] = [RetryAfter(0.1)]
+
+        futures = [
+            queue.submit("sendMessage", {"chat_id": 1, "text": "a"}),
+            queue.submit("sendMessage", {"chat_id": 1, "text": "a2"}),
+            queue.submit("sendMessage", {"chat_id": 2, "text": "b"}),
+        ]
+        started = self.loop.time()
+
+        self._run(queue, self._gather(futures))
+
+        # Order of chat messages is kept, other chats are not paused
+        self.assertListEqual(["b", "a", "a2"], self.transport.texts)
+        self.assertGreaterEqual(self.transport.sent[1][1] - started, 0.1)
+        self.assertEqual(1, queue.stats().rate_limited)
+
+    def test_transient_errors(self):
+        queue = self._queue(max_retries=2, retry_delay=0.01)
+        self.transport.failures["retried"] = [TransientApiError("502")] * 2
+        self.transport.failures["failed"] = [TransientApiError("502")] * 3
+
+        results = self._run(queue, self._gather([
+            queue.submit("sendMessage", {"chat_id": 1, "text": "retried"}),
+            queue.submit("sendMessage", {"chat_id": 2, "text": "failed"}),
+        ]))
+
+        self.assertEqual({"ok": True, "result": "retried"}, results[0])
+        self.assertIsInstance(results[1], TransientApiError)
+        self.assertEqual(1, queue.stats().failed)
+
+    def test_cancelled_request_not_sent(self):
+        queue = self._queue()
+
+        cancelled = queue.submit("sendMessage", {"chat_id": 1, "text": "cancelled"})
+        cancelled.cancel()
+
+        self._run(queue, queue.submit("sendMessage", {"chat_id": 1, "text": "kept"}))
+
+        self.assertListEqual(["kept"], self.transport.texts)
+
+    def test_stop_fails_pending_requests(self):
+        in_flight = asyncio.Event(loop=self.loop)
+
+        async def transport(method, params):
+            in_flight.set()
+            await asyncio.sleep(10, loop=self.loop)
+
+        queue = SendQueue(self.loop, transport, chat_rate=0.01, chat_burst=1)
+
+        # The first one is sent, the second one waits for chat token
+        futures = [queue.submit("sendMessage", {"chat_id": 1, "text": f"m{i}"}) for i in range(2)]
+        futures.append(queue.submit("sendMessage", {"chat_id": 2, "text": "bulk"}, Priority.BULK))
+
+        task = self.loop.create_task(queue.run())
+        self.loop.run_until_complete(asyncio.wait_for(in_flight.wait(), 5, loop=self.loop))
+
+        task.cancel()
+        results = self.loop.run_until_complete(asyncio.wait_for(self._gather(futures), 5, loop=self.loop))
+
+        for result in results:
+            self.assertIsInstance(result, SendQueueClosed)
+
+        self.assertEqual((0, 0), (queue.stats().depth_interactive, queue.stats().depth_bulk))
+
+        with self.assertRaises(SendQueueClosed):
+            self.loop.run_until_complete(queue.submit("sendMessage", {"chat_id": 1, "text": "late"}))
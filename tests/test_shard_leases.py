@@ -0,0 +1,95 @@
+import unittest
+from collections import Counter
+
+from parameterized import parameterized
+
+from tg_dobby.shard_leases import plan_rebalance, shard_of
+
+SHARDS = 16
+
+
+def _converge(instances, owners=None, rounds=10):
+    """
+    Heartbeats of all instances in turn until nothing changes
+    """
+    owners = list(owners or [""] * SHARDS)
+
+    for _ in range(rounds):
+        changed = False
+
+        for instance_id in instances:
+            release, acquire = plan_rebalance(owners, instance_id, instances)
+
+            for shard in release:
+                owners[shard] = ""
+
+            for shard in acquire:
+                if not owners[shard]:
+                    owners[shard] = instance_id
+
+            changed = changed or bool(release or acquire)
+
+        if not changed:
+            return owners
+
+    raise AssertionError(f"Not converged: {owners}")
+
+
+class ShardOfTestCase(unittest.TestCase):
+
+    def test_stable(self):
+        # Must not depend on hash randomization of process
+        self.assertEqual(8, shard_of("42", SHARDS))
+
+    def test_spread(self):
+        counts = Counter(shard_of(str(chat_id), SHARDS) for chat_id in range(10000))
+
+        self.assertEqual(SHARDS, len(counts))
+        self.assertLess(max(counts.values()) / min(counts.values()), 1.3)
+
+
+class PlanRebalanceTestCase(unittest.TestCase):
+
+    @parameterized.expand([
+        ("single", ["a"], 16),
+        ("even", ["a", "b", "c", "d"], 4),
+        ("uneven", ["a", "b", "c"], 6),
+        ("more_instances_than_shards", [str(i) for i in range(20)], 1),
+    ])
+    def test_all_shards_owned(self, _, instances, max_per_instance):
+        owners = _converge(instances)
+
+        self.assertNotIn("", owners)
+        self.assertLessEqual(max(Counter(owners).values()), max_per_instance)
+
+    def test_instance_joins(self):
+        owners = _converge(["a"])
+        owners = _converge(["a", "b"], owners)
+
+        self.assertEqual({"a": 8, "b": 8}, Counter(owners))
+
+    def test_instance_leaves(self):
+        owners = _converge(["a", "b", "c"])
+
+        # Leases of "c" expire
+        owners = ["" if owner == "c" else owner for owner in owners]
+        owners = _converge(["a", "b"], owners)
+
+        self.assertEqual({"a": 8, "b": 8}, Counter(owners))
+
+    def test_not_live_instance_releases_all(self):
+        owners = ["a"] * 8 + ["b"] * 8
+
+        release, acquire = plan_rebalance(owners, "a", ["b"])
+
+        self.assertListEqual(list(range(8)), release)
+        self.assertListEqual([], acquire)
+
+    def test_preferred_shards_kept(self):
+        owners = ["a"] * SHARDS
+
+        release, acquire = plan_rebalance(owners, "a", ["a", "b"])
+
+        # "a" is the first of live instances, so keeps even shards
+        self.assertListEqual(list(range(1, SHARDS, 2)), release)
+        self.assertListEqual([], acquire)
@@ -0,0 +1,204 @@
+import asyncio
+import unittest
+
+from aiotg import Chat
+
+from tests.utils import ManualClock
+from tg_dobby.settings import AppSettings
+from tg_dobby.tg_bot_base import BotCommand, TgBotBase
+from tg_dobby.timing_wheel import TimingWheel
+
+COMMAND_TIMEOUT = 10.0
+
+
+class FakeSendQueue:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.sent = []
+
+    def submit(self, method, params, priority):
+        self.sent.append((method, params))
+
+        future = self.loop.create_future()
+        future.set_result({"ok": True})
+        return future
+
+    @property
+    def texts(self):
+        return [params["text"] for method, params in self.sent if method == "sendMessage"]
+
+
+class FakeAppWrapper:
+    def __init__(self, loop: asyncio.AbstractEventLoop, clock: ManualClock):
+        self.loop = loop
+        self.settings = AppSettings(bot_api_key="key", redis_url="redis://localhost", command_timeout=COMMAND_TIMEOUT)
+        self.timing_wheel = TimingWheel(clock, tick=1.0)
+        self.send_queue = FakeSendQueue(loop)
+
+
+class CollectingCommand(BotCommand):
+    def __init__(self, loop: asyncio.AbstractEventLoop, initial_chat_obj: Chat, messages: int):
+        super().__init__(loop, initial_chat_obj)
+        self.messages = messages
+        self.received = []
+
+    async def run(self, initial_message: Chat):
+        while len(self.received) < self.messages:
+            self.received.append((await self.next_message()).text)
+
+
+class Bot(TgBotBase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Set to let dispatch finish, like parsing finished in pool
+        self.parsed = asyncio.Event(loop=self.app_wrapper.loop)
+        self.parsed.set()
+        self.dispatched = []
+
+    async def _dispatch_initial_message(self, chat_obj):
+        await self.parsed.wait()
+
+        command = CollectingCommand(self.app_wrapper.loop, chat_obj, messages=10)
+        self.dispatched.append(command)
+        return command
+
+
+class CommandTimeoutTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.clock = ManualClock()
+        self.app_wrapper = FakeAppWrapper(self.loop, self.clock)
+        self.bot = Bot("token", self.app_wrapper)
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _chat(self, text: str = "/start", message_id: int = 1) -> Chat:
+        # Group chats are not stored in user registry
+        return Chat(self.bot, 42, "group", {"message_id": message_id, "text": text})
+
+    def _settle(self):
+        for _ in range(5):
+            self.loop.run_until_complete(asyncio.sleep(0, loop=self.loop))
+
+    def _advance_to(self, now: float):
+        self.clock.now = now
+        self.app_wrapper.timing_wheel.advance()
+        self._settle()
+
+    def _start(self, messages: int = 10):
+        chat = self._chat()
+        command = CollectingCommand(self.loop, chat, messages)
+        running = self.bot._start_command(command, chat)
+        self._settle()
+
+        return command, running
+
+    def _receive(self, text: str):
+        self.loop.run_until_complete(self.bot.handle_inbound_message(self._chat(text)))
+        self._settle()
+
+    def test_timeout_cancels_command(self):
+        command, running = self._start()
+
+        self._advance_to(COMMAND_TIMEOUT - 1)
+        self.assertFalse(running.done())
+
+        self._advance_to(COMMAND_TIMEOUT + 1)
+
+        self.assertTrue(running.done())
+        self.assertIsNone(running.exception())
+        self.assertTrue(command.timed_out)
+        self.assertTrue(command.task.cancelled())
+        self.assertListEqual(["Время ожидания истекло"], self.app_wrapper.send_queue.texts)
+        self.assertDictEqual({}, self.bot.map_chat_id_running_command)
+
+    def test_inbound_update_rearms_timeout(self):
+        command, running = self._start()
+
+        self._advance_to(COMMAND_TIMEOUT - 2)
+        self._receive("first")
+
+        self._advance_to(COMMAND_TIMEOUT + 2)
+        self.assertFalse(running.done())
+        self._receive("second")
+
+        self._advance_to(2 * COMMAND_TIMEOUT + 1)
+        self.assertFalse(running.done())
+
+        self._advance_to(3 * COMMAND_TIMEOUT + 3)
+        self.assertTrue(command.timed_out)
+        self.assertListEqual(["first", "second"], command.received)
+        self.assertDictEqual({}, self.bot.map_chat_id_running_command)
+
+    def test_finished_command_removed(self):
+        command, running = self._start(messages=1)
+        self.assertIs(command, self.bot.map_chat_id_running_command[42])
+
+        self._receive("only")
+
+        self.assertTrue(running.done())
+        self.assertDictEqual({}, self.bot.map_chat_id_running_command)
+
+        # Timer of finished command is cancelled
+        self._advance_to(COMMAND_TIMEOUT * 2)
+        self.assertFalse(command.timed_out)
+        self.assertListEqual([], self.app_wrapper.send_queue.texts)
+
+    def test_cancel_not_by_timeout_propagates(self):
+        command, running = self._start()
+
+        command.task.cancel()
+        self._settle()
+
+        self.assertTrue(running.cancelled())
+        self.assertListEqual([], self.app_wrapper.send_queue.texts)
+        self.assertDictEqual({}, self.bot.map_chat_id_running_command)
+
+    def test_message_during_dispatch_routed_to_command(self):
+        self.bot.parsed.clear()
+
+        first = self.loop.create_task(self.bot.handle_inbound_message(self._chat("напомни завтра")))
+        second = self.loop.create_task(self.bot.handle_inbound_message(self._chat("в 4", message_id=2)))
+        self._settle()
+
+        self.bot.parsed.set()
+        self.loop.run_until_complete(asyncio.gather(first, second, loop=self.loop))
+        self._settle()
+
+        command, = self.bot.dispatched
+        self.assertIs(command, self.bot.map_chat_id_running_command[42])
+        self.assertListEqual(["в 4"], command.received)
+
+        command.task.cancel()
+        self._settle()
+
+    def test_finished_command_keeps_other_command_of_chat(self):
+        old, old_running = self._start()
+        new, new_running = self._start()
+
+        self._advance_to(COMMAND_TIMEOUT + 1)
+
+        # Both time out, the old one finishes after the new one is registered
+        self.assertIsNone(old_running.exception())
+        self.assertIsNone(new_running.exception())
+        self.assertDictEqual({}, self.bot.map_chat_id_running_command)
+
+    def test_replaced_command_does_not_remove_new_one(self):
+        old, old_running = self._start()
+        new, new_running = self._start()
+
+        old.task.cancel()
+        old.timed_out = True
+        self._settle()
+
+        self.assertTrue(old_running.done())
+        self.assertIsNone(old_running.exception())
+        self.assertIs(new, self.bot.map_chat_id_running_command[42])
+
+        self._receive("reply")
+        self.assertListEqual(["reply"], new.received)
+
+        new.task.cancel()
+        self._settle()
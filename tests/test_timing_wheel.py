@@ -0,0 +1,96 @@
+import random
+import unittest
+
+from parameterized import parameterized
+
+from tests.utils import ManualClock
+from tg_dobby.timing_wheel import TimingWheel
+
+
+class TimingWheelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = ManualClock()
+        self.wheel = TimingWheel(self.clock, tick=1.0)
+        self.fired = []
+
+    def _schedule(self, delay: float):
+        return self.wheel.call_later(delay, lambda: self.fired.append((delay, self.clock.now)))
+
+    def _advance_to(self, now: float, step: float = 1.0):
+        while self.clock.now < now:
+            self.clock.now += step
+            self.wheel.advance()
+
+    @parameterized.expand([
+        ("expired", -3, 1),
+        ("same_tick", 0.5, 1),
+        ("level_0", 17, 17),
+        ("level_1", 1000.5, 1001),
+        ("level_2", 100_000, 100_000),
+        ("slot_boundary", 64, 64),
+    ])
+    def test_fires_on_first_tick_after_deadline(self, _, delay, expected_tick):
+        self._schedule(delay)
+
+        self._advance_to(abs(delay) + 100)
+
+        self.assertListEqual([(delay, expected_tick)], self.fired)
+
+    def test_random_deadlines(self):
+        rnd = random.Random(0)
+        delays = [rnd.uniform(0, 5000) for _ in range(2000)]
+
+        for delay in delays:
+            self._schedule(delay)
+
+        self._advance_to(5001)
+
+        self.assertEqual(len(delays), len(self.fired))
+
+        for delay, fired_at in self.fired:
+            self.assertTrue(0 <= fired_at - delay < 1, f"Timer {delay} fired at {fired_at}")
+
+    def test_cancel(self):
+        kept = self._schedule(10)
+        cancelled = self._schedule(10)
+
+        cancelled.cancel()
+        self.assertTrue(cancelled.cancelled)
+        self.assertEqual(1, len(self.wheel))
+
+        self._advance_to(20)
+
+        self.assertEqual([(10, 10.0)], self.fired)
+        self.assertTrue(kept.done)
+        self.assertFalse(kept.cancelled)
+
+        # Fired timer stays not cancelled
+        kept.cancel()
+        self.assertFalse(kept.cancelled)
+        self.assertTrue(cancelled.done)
+
+    def test_cancel_from_callback(self):
+        other = self._schedule(5)
+        self.wheel.call_later(5, other.cancel)
+
+        self._advance_to(10)
+
+        # Order of timers of the same tick is insertion order
+        self.assertEqual([(5, 5.0)], self.fired)
+
+        other = self.wheel.call_later(5, lambda: None)
+        self.wheel.call_later(5, other.cancel)
+        self.wheel.call_later(5, self.fired.append, "third")
+
+        self._advance_to(20)
+
+        self.assertEqual("third", self.fired[-1])
+
+    def test_catch_up(self):
+        for delay in (1, 100, 10000):
+            self._schedule(delay)
+
+        self.clock.now = 20000
+
+        self.assertEqual(3, self.wheel.advance())
@@ -0,0 +1,86 @@
+import unittest
+
+from parameterized import parameterized
+
+from tests.test_nlp_dates import CASES as NATURAL_DATES_CASES
+from tests.test_npl_dates_post_processing import CORRECT_DATE_TIME_CASES, CLARIFICATION_DATE_TIME_CASES
+from tests.test_tokenizer import CASES as TOKENIZER_CASES
+from tests.utils import escape_test_suffix
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+from tg_dobby.grammar.natural_dates import get_moment_automaton, extract_first_natural_date_with_parser
+from tg_dobby.grammar.token_automaton import (
+    TokenAutomaton, UNDECIDED, WordTerm, LiteralTerm, IntTerm, alt, capture, optional, seq
+)
+
+EQUIVALENCE_CASES = (
+    [case[0] for case in NATURAL_DATES_CASES] +
+    [case[0] for case in CORRECT_DATE_TIME_CASES] +
+    [case.text for case in CLARIFICATION_DATE_TIME_CASES] +
+    [case[0] for case in TOKENIZER_CASES] +
+    [
+        "ЗАВТРА В 4 УТРА",
+        "завтра 14:00:15 и послезавтра",
+        "через двенадцать часов",
+        "в следующую среду в 10 утра",
+        "в понедельник в 14:61",
+        "завтра в 25",
+        "через через час",
+        "Привет, как жизнь?",
+        "",
+    ]
+)
+
+UNDECIDED_CASES = (
+    "завтра и сегодня",
+    "в пятницу или в субботу",
+    "через час, через день",
+)
+
+
+class MomentAutomatonTestCase(unittest.TestCase):
+
+    @parameterized.expand([
+        (escape_test_suffix(text), text) for text in EQUIVALENCE_CASES
+    ])
+    def test_same_as_parser(self, _, text):
+        self.assertEqual(extract_first_natural_date_with_parser(text), get_moment_automaton().find(text))
+
+    @parameterized.expand([
+        (escape_test_suffix(text), text) for text in UNDECIDED_CASES
+    ])
+    def test_equal_matches_are_undecided(self, _, text):
+        self.assertIs(UNDECIDED, get_moment_automaton().find(text))
+
+
+class TokenAutomatonTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        number = IntTerm(0, 10)
+
+        cls.automaton = TokenAutomaton([
+            (seq(optional(LiteralTerm("в")), capture("x", number)), lambda c: ("single", c["x"].value)),
+            (seq(capture("x", number), LiteralTerm(":"), capture("y", number)), lambda c: ("pair", c["y"].value)),
+            (capture("w", WordTerm({"кошка"})), lambda c: ("word", c["w"].normalized)),
+            (alt(capture("a", number), seq(number, number)), lambda c: ("ambiguous", "a" in c)),
+        ], MORPH_CACHE)
+
+    def test_longest_match_wins(self):
+        self.assertEqual(("pair", "5"), self.automaton.find("в 1:5"))
+
+    def test_literal_is_case_sensitive(self):
+        self.assertEqual(("word", "кошка"), self.automaton.find("В кошки"))
+
+    def test_no_match(self):
+        self.assertIsNone(self.automaton.find("в 11"))
+
+    def test_different_facts_of_same_match_are_undecided(self):
+        self.assertIs(UNDECIDED, self.automaton.find("1"))
+
+    def test_empty_path_is_not_allowed(self):
+        with self.assertRaises(ValueError):
+            TokenAutomaton([(optional(LiteralTerm("в")), lambda c: None)], MORPH_CACHE)
+
+
+if __name__ == '__main__':
+    unittest.main()
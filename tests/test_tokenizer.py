@@ -1,3 +1,4 @@
+import pickle
 import unittest
 
 from typing import Union, List
@@ -7,6 +8,7 @@ from parameterized import parameterized
 from tests.utils import escape_test_suffix
 from tg_dobby.grammar.natural_dates import Moment
 from tg_dobby.grammar.tokenizer import tokenize_phrase, ReminderPreamble
+from tg_dobby.grammar.yargy_utils import definition_of
 
 CASES = (
     (
@@ -60,12 +62,30 @@ class PhraseTokenizerTestCase(unittest.TestCase):
         token_list = tokenize_phrase(text)
 
         actual_token_list = [
-            type(token.fact) if token.fact else token.text
+            definition_of(token.fact) if token.fact else token.text
             for token in token_list
         ]
 
         self.assertListEqual(actual_token_list, expected_token_types_list)
 
+    def test_token_spans(self):
+        text = "Напомни мне позвонить маме  завтра"
+        tokens = tokenize_phrase(text)
+
+        self.assertListEqual(
+            [(0, 11), (12, 26), (28, 34)],
+            [(token.start, token.stop) for token in tokens],
+        )
+
+        for token in tokens:
+            self.assertIs(text, token.source)
+            self.assertEqual(text[token.start:token.stop], token.text)
+
+    def test_tokens_are_picklable(self):
+        tokens = tokenize_phrase("Напомни мне завтра в 3 дня позвонить маме")
+
+        self.assertListEqual(tokens, pickle.loads(pickle.dumps(tokens)))
+
 
 if __name__ == '__main__':
     unittest.main()
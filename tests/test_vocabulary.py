@@ -0,0 +1,62 @@
+import unittest
+
+from parameterized import parameterized
+from yargy.parser import Context
+from yargy.predicates import dictionary
+
+from tests.test_nlp_dates import CASES as NATURAL_DATES_CASES
+from tests.test_tokenizer import CASES as TOKENIZER_CASES
+from tests.utils import escape_test_suffix
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+from tg_dobby.grammar.natural_dates import WORDS_DAY_OF_WEEK, WORDS_AM_PM, WORDS_TEMPORAL_UNIT
+from tg_dobby.grammar.parser_registry import PARSER_REGISTRY
+from tg_dobby.grammar.vocabulary import InflectionTables, inflections
+
+VOCABULARY = (
+    WORDS_DAY_OF_WEEK,
+    WORDS_AM_PM,
+    WORDS_TEMPORAL_UNIT,
+    {"через"},
+    {"напомни"},
+)
+
+
+class InflectionsTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tokenizer = PARSER_REGISTRY.tokenizer
+        context = Context(cls.tokenizer)
+
+        cls.predicates = [
+            (dictionary(words).activate(context), inflections(words).activate(context))
+            for words in VOCABULARY
+        ]
+
+    @parameterized.expand([
+        (escape_test_suffix(text), text) for text in [case[0] for case in NATURAL_DATES_CASES + TOKENIZER_CASES]
+    ])
+    def test_same_as_dictionary(self, _, text):
+        for token in self.tokenizer(text):
+            for dictionary_predicate, inflections_predicate in self.predicates:
+                self.assertEqual(dictionary_predicate(token), inflections_predicate(token), token.value)
+
+    def test_yo_and_case(self):
+        _, predicate = self.predicates[0]
+        token, = self.tokenizer("ПЯТНИЦУ")
+
+        self.assertTrue(predicate(token))
+
+        table = InflectionTables(MORPH_CACHE).get({"ещё"})
+        self.assertIn("еще", table)
+        self.assertNotIn("ещё", table)
+
+    def test_tables_are_shared(self):
+        tables = InflectionTables(MORPH_CACHE)
+
+        self.assertIs(tables.get(["час", "день"]), tables.get({"день", "час"}))
+        self.assertEqual(1, tables.stats().tables)
+
+
+if __name__ == '__main__':
+    unittest.main()
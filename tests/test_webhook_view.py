@@ -0,0 +1,78 @@
+from aiohttp import web
+from aiohttp.test_utils import AioHTTPTestCase, unittest_run_loop
+
+from tg_dobby import views
+from tg_dobby.app import webhook_path
+from tg_dobby.appw import AppWrapper
+from tg_dobby.settings import AppSettings
+
+SECRET = "secret"
+
+
+class FakeBot:
+    def __init__(self):
+        self.ready = True
+        self.updates = []
+
+    def handle_update(self, update):
+        self.updates.append(update)
+
+
+class WebhookViewTestCase(AioHTTPTestCase):
+
+    async def get_application(self):
+        self.bot = FakeBot()
+
+        app = web.Application()
+        app[AppWrapper.KEY_SETTINGS] = AppSettings(
+            bot_api_key="key", redis_url="redis://localhost",
+            webhook_url="https://bot.example.com", webhook_secret=SECRET,
+        )
+        app[AppWrapper.KEY_BOT] = self.bot
+        app.add_routes([web.view(webhook_path("{secret}"), views.WebhookView)])
+
+        return app
+
+    @unittest_run_loop
+    async def test_update_routed(self):
+        update = {"update_id": 1, "message": {"message_id": 2, "text": "привет"}}
+
+        response = await self.client.post(webhook_path(SECRET), json=update)
+
+        self.assertEqual(200, response.status)
+        self.assertListEqual([update], self.bot.updates)
+
+    @unittest_run_loop
+    async def test_wrong_secret(self):
+        response = await self.client.post(webhook_path("other"), json={"update_id": 1})
+
+        self.assertEqual(404, response.status)
+        self.assertListEqual([], self.bot.updates)
+
+    @unittest_run_loop
+    async def test_not_ready(self):
+        self.bot.ready = False
+
+        response = await self.client.post(webhook_path(SECRET), json={"update_id": 1})
+
+        self.assertEqual(503, response.status)
+        self.assertListEqual([], self.bot.updates)
+
+    @unittest_run_loop
+    async def test_malformed_body(self):
+        bodies = [
+            b"{not json",
+            # Not UTF-8
+            b'{"update_id": 1, "text": "\xff"}',
+            b"[1, 2]",
+            b'{"message": {}}',
+        ]
+
+        for body in bodies:
+            response = await self.client.post(
+                webhook_path(SECRET), data=body, headers={"Content-Type": "application/json"}
+            )
+
+            self.assertEqual(400, response.status, body)
+
+        self.assertListEqual([], self.bot.updates)
@@ -0,0 +1,96 @@
+import pickle
+import unittest
+
+from parameterized import parameterized
+from yargy import Parser
+
+from tests.test_nlp_dates import CASES as NATURAL_DATES_CASES
+from tests.test_npl_dates_post_processing import CORRECT_DATE_TIME_CASES
+from tests.utils import escape_test_suffix
+from tg_dobby.grammar.model import RelativeDayOption
+from tg_dobby.grammar.natural_dates import DayTime, Moment, RelativeDay, RULE_MOMENT
+from tg_dobby.grammar.natural_dates_post_processing import get_absolute_date
+from tg_dobby.grammar.yargy_utils import FrozenFact, definition_of, fact_as_json, freeze_fact
+
+
+class FrozenFactTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.parser = Parser(RULE_MOMENT)
+
+    def _parse(self, txt) -> Moment:
+        m = self.parser.find(txt)
+
+        self.assertIsNotNone(m, f"Moment not found in phrase: {txt}")
+
+        return m.fact
+
+    @parameterized.expand([
+        (escape_test_suffix(case[0]), case[0]) for case in NATURAL_DATES_CASES
+    ])
+    def test_frozen_equals_to_fact(self, _, text):
+        parsed = self._parse(text)
+        frozen = freeze_fact(parsed)
+
+        self.assertIsInstance(frozen, FrozenFact)
+        self.assertIsInstance(frozen, Moment)
+        self.assertIs(Moment, definition_of(frozen))
+
+        self.assertEqual(parsed, frozen)
+        self.assertEqual(frozen, parsed)
+        self.assertEqual(hash(frozen), hash(freeze_fact(self._parse(text))))
+        self.assertEqual(parsed.as_json, fact_as_json(frozen))
+
+    @parameterized.expand([
+        (escape_test_suffix(case[0]), *case) for case in CORRECT_DATE_TIME_CASES
+        # Weeks interval is not supported by post processing yet
+        if case[0] != "через неделю"
+    ])
+    def test_post_processing(self, _, text, base_datetime, expected_time):
+        frozen = freeze_fact(self._parse(text))
+
+        self.assertEqual(expected_time, get_absolute_date(frozen, base=base_datetime))
+
+    def test_mutable_fact_not_hashable(self):
+        parsed = self._parse("завтра в 4")
+
+        # Hash of fact would change on mutation, so only frozen mirror may be used as key
+        with self.assertRaises(TypeError):
+            hash(parsed)
+
+        self.assertIn(freeze_fact(parsed), {freeze_fact(self._parse("завтра в 4")): None})
+
+    def test_immutable(self):
+        frozen = DayTime.Frozen(hour=4)
+
+        with self.assertRaises(AttributeError):
+            frozen.hour = 5
+
+        with self.assertRaises(AttributeError):
+            frozen.extra = 5
+
+        self.assertFalse(hasattr(frozen, "__dict__"))
+
+    def test_freeze_is_idempotent(self):
+        frozen = freeze_fact(self._parse("завтра в 4"))
+
+        self.assertIs(frozen, freeze_fact(frozen))
+        self.assertIs(frozen, Moment.freeze(frozen))
+
+    def test_pickle(self):
+        frozen = freeze_fact(self._parse("завтра в 4"))
+        restored = pickle.loads(pickle.dumps(frozen))
+
+        self.assertEqual(frozen, restored)
+        self.assertIs(type(frozen), type(restored))
+        self.assertEqual(RelativeDayOption.TOMORROW, restored.effective_date.relative_day)
+
+    def test_different_definitions_are_not_equal(self):
+        self.assertNotEqual(RelativeDay.Frozen(), Moment.Frozen())
+        self.assertNotEqual(DayTime.Frozen(hour=4), DayTime(hour=5))
+        self.assertEqual(DayTime.Frozen(hour=4), DayTime(hour=4))
+
+
+if __name__ == '__main__':
+    unittest.main()
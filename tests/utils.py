@@ -5,3 +5,15 @@ from transliterate import translit
 
 def escape_test_suffix(txt):
     return re.sub(r"[\s\-]+", "_", translit(txt.lower(), reversed=True, language_code="ru"))
+
+
+class ManualClock:
+    """
+    Stands for event loop in timing wheel: time is set by test
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def time(self) -> float:
+        return self.now
@@ -1,3 +1,6 @@
+# Imports are timed, so timer must be imported first
+from tg_dobby.startup_timing import STARTUP_TIMER
+
 import logging
 import asyncio
 
@@ -5,9 +8,12 @@ import sys
 from aiohttp import web
 
 from tg_dobby.app import create_application
+from tg_dobby.appw import AppWrapper
 from tg_dobby.logging_config import init_logging
 from tg_dobby.settings import AppSettings
 
+STARTUP_TIMER.record("imports", STARTUP_TIMER.origin)
+
 log = logging.getLogger(__name__)
 
 
@@ -17,10 +23,11 @@ async def init_app(settings: AppSettings) -> web.AppRunner:
     runner = web.AppRunner(app)
 
     try:
-        await runner.setup()
+        with STARTUP_TIMER.phase("http_server"):
+            await runner.setup()
 
-        site = web.TCPSite(runner, settings.http_bind_address, settings.http_bind_port)
-        await site.start()
+            site = web.TCPSite(runner, settings.http_bind_address, settings.http_bind_port)
+            await site.start()
 
         return runner
 
@@ -56,12 +63,18 @@ def main():
         log.info(f"Running main event loop forever")
         loop.run_forever()
     except KeyboardInterrupt:
-        pass
-    finally:
         log.info("Interrupt signal received")
+    finally:
+        bot_task = AppWrapper(runner.app).bot_task
+        # Event loop is stopped by bot task if bot fails to start
+        failed = bot_task.done() and not bot_task.cancelled() and bot_task.exception() is not None
+
         loop.run_until_complete(runner.cleanup())
         loop.close()
 
+    if failed:
+        sys.exit(-1)
+
 
 if __name__ == '__main__':
     main()
@@ -1,4 +1,5 @@
 import logging
+import time
 
 import asyncio
 
@@ -7,20 +8,52 @@ from aiohttp import web
 
 from tg_dobby import views
 from tg_dobby.appw import AppWrapper
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+from tg_dobby.grammar.result_cache import GRAMMAR_RESULT_CACHE
+from tg_dobby.parsing_service import ParsingService
+from tg_dobby.reminders import ReminderDispatcher, RedisSortedSetReminderStorage
+from tg_dobby.send_queue import SendQueue
 from tg_dobby.tg_bot import TgBot
 from tg_dobby.settings import AppSettings
+from tg_dobby.shard_leases import ShardLeases
+from tg_dobby.startup_timing import STARTUP_TIMER
+from tg_dobby.timing_wheel import TimingWheel
 from tg_dobby.user_registry import RedisHashSetUserRegistry
 
 log = logging.getLogger(__name__)
 
+# Seconds to wait before restarting failed bot loop
+BOT_LOOP_RETRY_DELAY = 5.0
+
 
 async def on_shutdown(app: web.Application):
     app_wrapper = AppWrapper(app)
 
+    log.info("Canceling reminder dispatcher task")
+    app_wrapper.reminder_dispatcher_task.cancel()
+
+    log.info("Releasing reminder shards")
+    app_wrapper.reminder_shard_leases_task.cancel()
+    # noinspection PyBroadException
+    try:
+        await app_wrapper.reminder_shard_leases.release_all()
+    except Exception:
+        log.exception("Failed to release reminder shards, they are taken over on lease expiration")
+
+    log.info("Canceling timing wheel task")
+    app_wrapper.timing_wheel_task.cancel()
+
     log.info("Canceling bot task")
     app_wrapper.bot_task.cancel()
     app_wrapper.bot.stop()
-    await app_wrapper.bot.session.close()
+
+    log.info("Canceling send queue task")
+    app_wrapper.send_queue_task.cancel()
+
+    await app_wrapper.bot.close_session()
+
+    log.info("Stopping parsing service")
+    app_wrapper.parsing_service.shutdown()
 
     log.info("Closing Redis pool")
     app_wrapper.redis.close()
@@ -34,37 +67,204 @@ async def on_startup(app: web.Application):
     app_wrapper = AppWrapper(app)
 
     log.info("Creating Redis pool")
-    redis = await aioredis.create_redis(app_wrapper.settings.redis_url)
+    with STARTUP_TIMER.phase("redis_pool"):
+        redis = await aioredis.create_redis(app_wrapper.settings.redis_url)
 
     app_wrapper.redis = redis
     app_wrapper.user_registry = RedisHashSetUserRegistry(redis=redis)
 
+    # All outbound Bot API requests go through single rate limited queue
+    log.info("Creating send queue task")
+    app_wrapper.send_queue = SendQueue(
+        loop=app.loop,
+        transport=app_wrapper.bot.send_api_request,
+        rate=app_wrapper.settings.send_rate,
+        burst=app_wrapper.settings.send_burst,
+        chat_rate=app_wrapper.settings.send_chat_rate,
+        chat_burst=app_wrapper.settings.send_chat_burst,
+        max_in_flight=app_wrapper.settings.send_max_in_flight,
+        max_retries=app_wrapper.settings.send_max_retries,
+    )
+    app_wrapper.send_queue_task = asyncio.ensure_future(
+        app_wrapper.send_queue.run(),
+        loop=app.loop
+    )
+
+    # Single periodic tick drives all in-process timers
+    log.info("Creating timing wheel task")
+    app_wrapper.timing_wheel = TimingWheel(loop=app.loop, tick=app_wrapper.settings.timing_wheel_tick)
+    app_wrapper.timing_wheel_task = asyncio.ensure_future(
+        app_wrapper.timing_wheel.run(),
+        loop=app.loop
+    )
+
+    log.info("Creating reminder shard leases task")
+    app_wrapper.reminder_shard_leases = ShardLeases(
+        loop=app.loop,
+        redis=redis,
+        name="reminders",
+        shards=app_wrapper.settings.reminder_shards,
+        ttl=app_wrapper.settings.reminder_shard_lease,
+    )
+    app_wrapper.reminder_shard_leases_task = asyncio.ensure_future(
+        app_wrapper.reminder_shard_leases.run(),
+        loop=app.loop
+    )
+
+    app_wrapper.reminder_dispatcher = ReminderDispatcher(
+        loop=app.loop,
+        storage=RedisSortedSetReminderStorage(redis=redis, shards=app_wrapper.settings.reminder_shards),
+        bot=app_wrapper.bot,
+        shard_leases=app_wrapper.reminder_shard_leases,
+        batch_size=app_wrapper.settings.reminder_batch_size,
+        max_sleep=app_wrapper.settings.reminder_max_sleep,
+        timing_wheel=app_wrapper.timing_wheel,
+        short_horizon=app_wrapper.settings.reminder_short_horizon,
+        max_concurrency=app_wrapper.settings.reminder_delivery_concurrency,
+        lease=app_wrapper.settings.reminder_lease,
+        retry_delay=app_wrapper.settings.reminder_retry_delay,
+        max_attempts=app_wrapper.settings.reminder_max_attempts,
+    )
+
+    log.info("Creating reminder dispatcher task")
+    app_wrapper.reminder_dispatcher_task = asyncio.ensure_future(
+        app_wrapper.reminder_dispatcher.run(),
+        loop=app.loop
+    )
+
+    MORPH_CACHE.configure(max_size=app_wrapper.settings.morph_cache_size)
+
+    if app_wrapper.settings.grammar_result_cache_size > 0:
+        log.info("Enabling grammar result cache")
+        GRAMMAR_RESULT_CACHE.configure(
+            max_size=app_wrapper.settings.grammar_result_cache_size,
+            ttl=app_wrapper.settings.grammar_result_cache_ttl,
+        )
+
+    # Grammar is built in background, so HTTP API starts serving without waiting for it
     log.info("Creating bot task")
     app_wrapper.bot_task = asyncio.ensure_future(
-        app_wrapper.bot.loop(),
+        run_bot(app),
         loop=app.loop
     )
 
     log.info("Startup procedure finished")
 
 
+async def run_bot(app: web.Application):
+    app_wrapper = AppWrapper(app)
+
+    # noinspection PyBroadException
+    try:
+        await start_bot(app)
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        # Without bot application is useless: event loop is stopped, so application is cleaned up
+        # and process exits with failure status (see __main__)
+        log.exception("Bot failed to start. Shutting application down...")
+        app.loop.stop()
+        raise
+
+    if app_wrapper.settings.webhook_url:
+        return
+
+    while True:
+        # noinspection PyBroadException
+        try:
+            # getUpdates is rejected while webhook is set
+            await app_wrapper.bot.delete_webhook()
+
+            await app_wrapper.bot.loop()
+            return
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception:
+            # Network errors and timeouts of long polling are transient
+            log.exception(f"Exception in bot loop. Restarting in {BOT_LOOP_RETRY_DELAY} seconds")
+            await asyncio.sleep(BOT_LOOP_RETRY_DELAY, loop=app.loop)
+
+
+async def start_bot(app: web.Application):
+    """
+    Warms up bot and sets webhook if webhook mode is on. Bot is ready to handle updates afterwards
+    """
+    app_wrapper = AppWrapper(app)
+
+    log.info("Warming up bot")
+    started = time.perf_counter()
+    await app.loop.run_in_executor(None, app_wrapper.bot.warm_up)
+    STARTUP_TIMER.record("grammar_build", started)
+
+    # Parsing service is started after warm-up: process pool workers inherit warmed up grammar
+    log.info("Starting parsing service")
+    app_wrapper.parsing_service.start()
+
+    app_wrapper.bot.ready = True
+    settings = app_wrapper.settings
+
+    if settings.webhook_url:
+        # Updates are accepted by webhook route from now on. Telegram is told about webhook only after warm-up
+        log.info("Setting webhook")
+        await app_wrapper.bot.set_webhook(
+            f"{settings.webhook_url.rstrip('/')}{webhook_path(settings.webhook_secret)}",
+            max_connections=settings.webhook_max_connections,
+        )
+    else:
+        log.info("Starting bot loop")
+
+    # Time from process start until bot handles updates
+    STARTUP_TIMER.record("bot_loop", STARTUP_TIMER.origin)
+    STARTUP_TIMER.log_report()
+
+
+def webhook_path(secret: str) -> str:
+    return f"/webhook/{secret}/"
+
+
 def create_application(settings: AppSettings):
     log.info("Creating application")
 
+    if settings.webhook_url and not settings.webhook_secret:
+        raise ValueError("Webhook secret is required in webhook mode")
+
     app = web.Application()
     app_wrapper = AppWrapper(app)
     app_wrapper.settings = settings
 
     app_wrapper.bot = TgBot(api_token=settings.bot_api_key, app_wrapper=app_wrapper)
+    app_wrapper.parsing_service = ParsingService(
+        pool=settings.parsing_pool,
+        workers=settings.parsing_workers,
+        queue_size=settings.parsing_queue_size,
+    )
 
     app_wrapper.redis = None
     app_wrapper.user_registry = None
+    app_wrapper.send_queue = None
+    app_wrapper.send_queue_task = None
+    app_wrapper.timing_wheel = None
+    app_wrapper.timing_wheel_task = None
+    app_wrapper.reminder_shard_leases = None
+    app_wrapper.reminder_shard_leases_task = None
+    app_wrapper.reminder_dispatcher = None
+    app_wrapper.reminder_dispatcher_task = None
 
     app.add_routes([
         web.view("/notify/", views.NotifyView),
         web.view("/users/", views.ListUserView),
+        web.view("/grammar/stats/", views.GrammarStatsView),
+        web.view("/send_queue/stats/", views.SendQueueStatsView),
+        web.view("/http_client/stats/", views.HttpClientStatsView),
     ])
 
+    if settings.webhook_url:
+        app.add_routes([
+            web.view(webhook_path("{secret}"), views.WebhookView),
+        ])
+
     app.on_startup.append(on_startup)
     app.on_shutdown.append(on_shutdown)
 
@@ -2,8 +2,13 @@ import asyncio
 from aiohttp import web
 import aioredis
 
+from tg_dobby.parsing_service import ParsingService
+from tg_dobby.reminders import ReminderDispatcher
+from tg_dobby.send_queue import SendQueue
 from tg_dobby.tg_bot_base import TgBotBase
 from tg_dobby.settings import AppSettings
+from tg_dobby.shard_leases import ShardLeases
+from tg_dobby.timing_wheel import TimingWheel
 from tg_dobby.user_registry import AbstractUserRegistry
 
 
@@ -14,6 +19,15 @@ class AppWrapper:
     KEY_REDIS = "redis"
     KEY_USER_REGISTRY = "user_registry"
     KEY_SETTINGS = "settings"
+    KEY_PARSING_SERVICE = "parsing_service"
+    KEY_SEND_QUEUE = "send_queue"
+    KEY_SEND_QUEUE_TASK = "send_queue_task"
+    KEY_TIMING_WHEEL = "timing_wheel"
+    KEY_TIMING_WHEEL_TASK = "timing_wheel_task"
+    KEY_REMINDER_SHARD_LEASES = "reminder_shard_leases"
+    KEY_REMINDER_SHARD_LEASES_TASK = "reminder_shard_leases_task"
+    KEY_REMINDER_DISPATCHER = "reminder_dispatcher"
+    KEY_REMINDER_DISPATCHER_TASK = "reminder_dispatcher_task"
 
     __slots__ = ("_app",)
 
@@ -63,3 +77,75 @@ class AppWrapper:
     @settings.setter
     def settings(self, value: AppSettings):
         self._app[self.KEY_SETTINGS] = value
+
+    @property
+    def parsing_service(self) -> ParsingService:
+        return self._app[self.KEY_PARSING_SERVICE]
+
+    @parsing_service.setter
+    def parsing_service(self, value: ParsingService):
+        self._app[self.KEY_PARSING_SERVICE] = value
+
+    @property
+    def send_queue(self) -> SendQueue:
+        return self._app[self.KEY_SEND_QUEUE]
+
+    @send_queue.setter
+    def send_queue(self, value: SendQueue):
+        self._app[self.KEY_SEND_QUEUE] = value
+
+    @property
+    def send_queue_task(self) -> asyncio.Task:
+        return self._app[self.KEY_SEND_QUEUE_TASK]
+
+    @send_queue_task.setter
+    def send_queue_task(self, value: asyncio.Task):
+        self._app[self.KEY_SEND_QUEUE_TASK] = value
+
+    @property
+    def timing_wheel(self) -> TimingWheel:
+        return self._app[self.KEY_TIMING_WHEEL]
+
+    @timing_wheel.setter
+    def timing_wheel(self, value: TimingWheel):
+        self._app[self.KEY_TIMING_WHEEL] = value
+
+    @property
+    def timing_wheel_task(self) -> asyncio.Task:
+        return self._app[self.KEY_TIMING_WHEEL_TASK]
+
+    @timing_wheel_task.setter
+    def timing_wheel_task(self, value: asyncio.Task):
+        self._app[self.KEY_TIMING_WHEEL_TASK] = value
+
+    @property
+    def reminder_shard_leases(self) -> ShardLeases:
+        return self._app[self.KEY_REMINDER_SHARD_LEASES]
+
+    @reminder_shard_leases.setter
+    def reminder_shard_leases(self, value: ShardLeases):
+        self._app[self.KEY_REMINDER_SHARD_LEASES] = value
+
+    @property
+    def reminder_shard_leases_task(self) -> asyncio.Task:
+        return self._app[self.KEY_REMINDER_SHARD_LEASES_TASK]
+
+    @reminder_shard_leases_task.setter
+    def reminder_shard_leases_task(self, value: asyncio.Task):
+        self._app[self.KEY_REMINDER_SHARD_LEASES_TASK] = value
+
+    @property
+    def reminder_dispatcher(self) -> ReminderDispatcher:
+        return self._app[self.KEY_REMINDER_DISPATCHER]
+
+    @reminder_dispatcher.setter
+    def reminder_dispatcher(self, value: ReminderDispatcher):
+        self._app[self.KEY_REMINDER_DISPATCHER] = value
+
+    @property
+    def reminder_dispatcher_task(self) -> asyncio.Task:
+        return self._app[self.KEY_REMINDER_DISPATCHER_TASK]
+
+    @reminder_dispatcher_task.setter
+    def reminder_dispatcher_task(self, value: asyncio.Task):
+        self._app[self.KEY_REMINDER_DISPATCHER_TASK] = value
@@ -1 +1,2 @@
 from .natural_dates import extract_first_natural_date
+from .natural_dates_stream import iter_natural_dates
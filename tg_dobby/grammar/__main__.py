@@ -0,0 +1,155 @@
+import argparse
+import enum
+import json
+import logging
+import multiprocessing
+import sys
+import time
+from collections import Counter
+from datetime import datetime, date, time as day_time
+from typing import Iterator, Optional, TextIO, Tuple
+
+from tg_dobby.grammar.natural_dates import extract_first_natural_date, warm_up_moment_parser
+from tg_dobby.grammar.natural_dates_post_processing import (
+    get_absolute_date,
+    ClarificationRequired,
+    InvalidRelativeDateException,
+)
+from tg_dobby.grammar.yargy_utils import fact_as_json
+
+STATUS_RESOLVED = "resolved"
+STATUS_CLARIFICATION = "clarification_required"
+STATUS_INVALID = "invalid"
+STATUS_NO_MATCH = "no_match"
+STATUS_ERROR = "error"
+
+# Base time of worker process, set by pool initializer
+_base = None  # type: Optional[datetime]
+
+
+def _json_default(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+
+    if isinstance(value, (datetime, date, day_time)):
+        return value.isoformat()
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _init_worker(base: datetime):
+    global _base
+    _base = base
+
+    # Grammar is built once per worker instead of once per phrase batch
+    warm_up_moment_parser()
+
+
+def parse_phrase(txt: str, base: datetime) -> dict:
+    result = {"text": txt}
+
+    try:
+        moment = extract_first_natural_date(txt)
+
+        if moment is None:
+            result["status"] = STATUS_NO_MATCH
+            return result
+
+        result["moment"] = fact_as_json(moment)
+        result["date"] = get_absolute_date(moment, base=base)
+        result["status"] = STATUS_RESOLVED
+
+    except ClarificationRequired as e:
+        result["status"] = STATUS_CLARIFICATION
+        result["clarifications"] = [
+            dict(type=type(c).__name__, **c._asdict()) for c in e.required_clarifications
+        ]
+
+    except InvalidRelativeDateException as e:
+        result["status"] = STATUS_INVALID
+        result["error"] = str(e)
+
+    except Exception as e:
+        result["status"] = STATUS_ERROR
+        result["error"] = f"{type(e).__name__}: {e}"
+
+    return result
+
+
+def _parse_line(line: str) -> Tuple[str, str]:
+    result = parse_phrase(line, _base)
+    return result["status"], json.dumps(result, default=_json_default, ensure_ascii=False)
+
+
+def _iter_phrases(f: TextIO) -> Iterator[str]:
+    for line in f:
+        line = line.strip()
+
+        if line:
+            yield line
+
+
+def _parse_base(value: str) -> datetime:
+    for fmt in ("%Y-%m-%dT%H:%M:%S", "%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+
+    raise argparse.ArgumentTypeError(f"invalid base time: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m tg_dobby.grammar",
+        description="Extracts and resolves natural dates of phrases (one per line). Results are written as JSONL",
+    )
+    parser.add_argument("input", nargs="?", default="-", help="Path to file with phrases. Default: stdin")
+    parser.add_argument("-o", "--output", default="-", help="Path to JSONL output. Default: stdout")
+    parser.add_argument("--base", type=_parse_base,
+                        help="Base time to resolve dates against, e.g. 2018-09-02T13:45. Default: current time")
+    parser.add_argument("-j", "--workers", type=int, default=multiprocessing.cpu_count(),
+                        help="Number of worker processes. Default: number of CPUs")
+    parser.add_argument("--batch-size", type=int, default=64, help="Number of phrases sent to worker at once")
+
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, stream=sys.stderr)
+
+    base = args.base or datetime.now().replace(microsecond=0)
+
+    input_file = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    output_file = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+
+    statuses = Counter()
+    started = time.perf_counter()
+
+    try:
+        with multiprocessing.Pool(args.workers, initializer=_init_worker, initargs=(base,)) as pool:
+            # Results are streamed in input order
+            for status, line in pool.imap(_parse_line, _iter_phrases(input_file), chunksize=args.batch_size):
+                output_file.write(line)
+                output_file.write("\n")
+
+                statuses[status] += 1
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+
+        if output_file is not sys.stdout:
+            output_file.close()
+
+    elapsed = time.perf_counter() - started
+    total = sum(statuses.values())
+
+    print(f"Base time: {base.isoformat()}", file=sys.stderr)
+    print(f"Parsed {total} phrases in {elapsed:.2f} s ({total / elapsed if elapsed else 0:.0f} phrases/s) "
+          f"using {args.workers} workers", file=sys.stderr)
+
+    for status in (STATUS_RESOLVED, STATUS_CLARIFICATION, STATUS_INVALID, STATUS_NO_MATCH, STATUS_ERROR):
+        share = statuses[status] / total * 100 if total else 0
+        print(f"  {status:<24} {statuses[status]:>8} {share:>6.1f}%", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import threading
+from typing import Dict, Iterable, List, NamedTuple
+
+from pymorphy2 import MorphAnalyzer as PymorphyAnalyzer
+from yargy.morph import MorphAnalyzer, Form
+
+from tg_dobby.grammar.result_cache import LruResultCache
+
+DEFAULT_MORPH_CACHE_SIZE = 100000
+
+
+class MorphCacheStats(NamedTuple):
+    preloaded: int
+    preloaded_hits: int
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+
+
+class CachingMorphAnalyzer(MorphAnalyzer):
+    """
+    yargy morph analyzer with bounded LRU cache of word forms analysis.
+    Preloaded words (grammar vocabulary) are kept separately and are never evicted.
+    pymorphy2 dictionaries are loaded on first use.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_MORPH_CACHE_SIZE):
+        # Base class initializer is not called intentionally: it loads dictionaries
+        self._raw = None
+        self._raw_lock = threading.Lock()
+
+        self._preloaded = {}  # type: Dict[str, List[Form]]
+        self._preloaded_hits = 0
+
+        self._cache = LruResultCache(max_size=max_size)
+
+    @property
+    def raw(self) -> PymorphyAnalyzer:
+        if self._raw is None:
+            with self._raw_lock:
+                if self._raw is None:
+                    self._raw = PymorphyAnalyzer()
+
+        return self._raw
+
+    def configure(self, max_size: int):
+        self._cache.configure(max_size=max_size)
+
+    def _analyze(self, word: str) -> List[Form]:
+        return MorphAnalyzer.__call__(self, word)
+
+    def __call__(self, word: str) -> List[Form]:
+        # pymorphy2 analysis does not depend on case
+        word = word.lower()
+
+        forms = self._preloaded.get(word)
+
+        if forms is not None:
+            self._preloaded_hits += 1
+            return forms
+
+        return self._cache.get_or_compute(word, lambda: self._analyze(word))
+
+    def preload(self, words: Iterable[str]) -> int:
+        preloaded = {
+            word.lower(): self._analyze(word.lower())
+            for word in words
+        }
+
+        self._preloaded.update(preloaded)
+
+        return len(preloaded)
+
+    def stats(self) -> MorphCacheStats:
+        cache_stats = self._cache.stats()
+
+        return MorphCacheStats(
+            preloaded=len(self._preloaded),
+            preloaded_hits=self._preloaded_hits,
+            size=cache_stats.size,
+            max_size=cache_stats.max_size,
+            hits=cache_stats.hits,
+            misses=cache_stats.misses,
+        )
+
+
+MORPH_CACHE = CachingMorphAnalyzer()
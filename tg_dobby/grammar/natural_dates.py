@@ -1,11 +1,18 @@
+import re
 from typing import Optional, Union
 from yargy import Parser, rule, and_, or_
 from yargy.interpretation.attribute import Attribute
-from yargy.interpretation.fact import Fact
-from yargy.predicates import dictionary, gte, lte, normalized, eq
+from yargy.predicates import gte, lte, eq
 
 # WORDS
-from tg_dobby.grammar.yargy_utils import FactDefinition
+from tg_dobby.grammar.parser_registry import PARSER_REGISTRY
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+from tg_dobby.grammar.result_cache import GRAMMAR_RESULT_CACHE, normalize_phrase
+from tg_dobby.grammar.token_automaton import (
+    TokenAutomaton, UNDECIDED, WordTerm, LiteralTerm, IntTerm, alt, capture, optional, seq
+)
+from tg_dobby.grammar.vocabulary import INFLECTION_TABLES, inflections, normalize_surface_form
+from tg_dobby.grammar.yargy_utils import FactDefinition, freeze_fact
 from .model import TemporalUnit, NamedInterval, RelativeDayOption, TimesOfADayOption, UnitRelativePosition
 
 WORDS_RELATIVE_DAY = {
@@ -69,7 +76,7 @@ WORDS_NAMED_INTERVAL = {
 
 # TODO FIX: find adequate way to parse numbers
 GENERIC_NUMBER = or_(
-    dictionary(WORDS_HOUR_OF_A_DAY),
+    inflections(WORDS_HOUR_OF_A_DAY),
     and_(
         gte(0),
         lte(1_000_000_000)
@@ -87,7 +94,11 @@ def normalize_generic_number(val) -> int:
     return int(WORDS_HOUR_OF_A_DAY.get(val, val))
 
 
-RELATIVE_DAY = dictionary(WORDS_RELATIVE_DAY)
+RELATIVE_DAY = inflections(WORDS_RELATIVE_DAY)
+
+
+def normalize_hour_of_a_day(val) -> int:
+    return int(WORDS_HOUR_OF_A_DAY.get(val, val))
 
 
 def normalize_relative_day(val) -> RelativeDayOption:
@@ -95,37 +106,37 @@ def normalize_relative_day(val) -> RelativeDayOption:
 
 
 HOUR_OF_A_DAY = or_(
-    dictionary(WORDS_HOUR_OF_A_DAY),
+    inflections(WORDS_HOUR_OF_A_DAY),
     and_(
         gte(0),
         lte(24)
     )
 )
 
-DAY_OF_WEEK = dictionary(WORDS_DAY_OF_WEEK)
+DAY_OF_WEEK = inflections(WORDS_DAY_OF_WEEK)
 
-DAY_OF_WEEK_DISCRIMINATOR = dictionary(WORDS_DAY_OF_WEEK_DISCRIMINATOR)
+DAY_OF_WEEK_DISCRIMINATOR = inflections(WORDS_DAY_OF_WEEK_DISCRIMINATOR)
 
 
 def normalize_day_of_week_discriminator(val):
     return WORDS_DAY_OF_WEEK_DISCRIMINATOR.get(val, val)
 
 
-AM_PM = dictionary(WORDS_AM_PM)
+AM_PM = inflections(WORDS_AM_PM)
 
 
 def normalize_am_pm(val):
     return WORDS_AM_PM.get(val, val)
 
 
-TEMPORAL_UNIT = dictionary(WORDS_TEMPORAL_UNIT)
+TEMPORAL_UNIT = inflections(WORDS_TEMPORAL_UNIT)
 
 
 def normalize_temporal_unit(val):
     return WORDS_TEMPORAL_UNIT.get(val)
 
 
-NAMED_INTERVAL = dictionary(WORDS_NAMED_INTERVAL)
+NAMED_INTERVAL = inflections(WORDS_NAMED_INTERVAL)
 
 
 def normalize_named_interval(val):
@@ -173,10 +184,10 @@ RULE_DAY_TIME = rule(
     or_(
         rule(
             HOUR_OF_A_DAY.interpretation(
-                DayTime.hour.normalized().custom(lambda val: int(WORDS_HOUR_OF_A_DAY.get(val, val)))
+                DayTime.hour.normalized().custom(normalize_hour_of_a_day)
             ),
 
-            normalized("час").optional(),
+            inflections({"час"}).optional(),
 
             AM_PM.optional().interpretation(
                 DayTime.am_pm.normalized().custom(normalize_am_pm)
@@ -230,7 +241,7 @@ RULE_DAY_OF_THE_WEEK = rule(
 ).interpretation(DayOfWeek)
 
 RULE_AFTER = rule(
-    normalized("через"),
+    inflections({"через"}),
     or_(
         rule(
             GENERIC_NUMBER.optional().interpretation(
@@ -256,9 +267,172 @@ RULE_MOMENT = or_(
     RULE_AFTER.interpretation(Moment.effective_date),
 ).interpretation(Moment)
 
-MOMENT_PARSER = Parser(RULE_MOMENT)
 
+# FAST PATH
+# Token automaton which mirrors RULE_MOMENT. Terms are built from the same vocabulary tables as rules above.
+
+TERM_IN = LiteralTerm("в")
+TERM_COLON = LiteralTerm(":")
+TERM_HOUR_WORD = WordTerm(WORDS_HOUR_OF_A_DAY)
+TERM_HOUR_UNIT = WordTerm({"час"})
+TERM_AFTER = WordTerm({"через"})
+
+PATTERN_DAY_TIME = seq(
+    optional(TERM_IN),
+    alt(
+        seq(
+            alt(capture("hour", TERM_HOUR_WORD), capture("hour", IntTerm(0, 24))),
+            optional(TERM_HOUR_UNIT),
+            optional(capture("am_pm", WordTerm(WORDS_AM_PM))),
+        ),
+        seq(
+            capture("strict_hour", IntTerm(0, 23)),
+            capture("strict_format", TERM_COLON),
+            capture("minute", IntTerm(0, 59)),
+            optional(seq(TERM_COLON, capture("second", IntTerm(0, 59)))),
+        ),
+    ),
+)
+
+PATTERN_RELATIVE_DAY = seq(
+    optional(TERM_IN),
+    capture("relative_day", WordTerm(WORDS_RELATIVE_DAY)),
+    optional(PATTERN_DAY_TIME),
+)
+
+PATTERN_DAY_OF_THE_WEEK = seq(
+    optional(TERM_IN),
+    optional(capture("discriminator", WordTerm(WORDS_DAY_OF_WEEK_DISCRIMINATOR))),
+    capture("day_of_week", WordTerm(WORDS_DAY_OF_WEEK)),
+    optional(PATTERN_DAY_TIME),
+)
+
+PATTERN_AFTER = seq(
+    TERM_AFTER,
+    alt(
+        seq(
+            optional(alt(
+                capture("amount", TERM_HOUR_WORD),
+                capture("amount", IntTerm(0, 1_000_000_000)),
+            )),
+            capture("unit", WordTerm(WORDS_TEMPORAL_UNIT)),
+        ),
+        capture("named_interval", WordTerm(WORDS_NAMED_INTERVAL)),
+    ),
+)
+
+
+def _build_day_time(c) -> Optional["DayTime.Frozen"]:
+    if "hour" in c:
+        return DayTime.Frozen(
+            hour=normalize_hour_of_a_day(c["hour"].normalized),
+            am_pm=normalize_am_pm(c["am_pm"].normalized) if "am_pm" in c else None,
+        )
+
+    if "strict_hour" in c:
+        return DayTime.Frozen(
+            hour=int(c["strict_hour"].value),
+            strict_format=True,
+            minute=int(c["minute"].normalized),
+            second=int(c["second"].value) if "second" in c else None,
+        )
+
+    return None
+
+
+def _build_relative_day(c) -> "Moment.Frozen":
+    return Moment.Frozen(effective_date=RelativeDay.Frozen(
+        relative_day=normalize_relative_day(c["relative_day"].normalized),
+        day_time=_build_day_time(c),
+    ))
+
+
+def _build_day_of_week(c) -> "Moment.Frozen":
+    return Moment.Frozen(effective_date=DayOfWeek.Frozen(
+        discriminator=normalize_day_of_week_discriminator(c["discriminator"].normalized) if "discriminator" in c else None,
+        day_of_week=c["day_of_week"].normalized,
+        day_time=_build_day_time(c),
+    ))
+
+
+def _build_after(c) -> "Moment.Frozen":
+    if "named_interval" in c:
+        interval = RelativeInterval.Frozen(unit=normalize_named_interval(c["named_interval"].normalized))
+    else:
+        interval = RelativeInterval.Frozen(
+            unit=normalize_temporal_unit(c["unit"].normalized),
+            amount=normalize_generic_number(c["amount"].normalized) if "amount" in c else None,
+        )
+
+    return Moment.Frozen(effective_date=interval)
+
+
+MOMENT_PATTERNS = (
+    (PATTERN_RELATIVE_DAY, _build_relative_day),
+    (PATTERN_DAY_OF_THE_WEEK, _build_day_of_week),
+    (PATTERN_AFTER, _build_after),
+)
+
+_moment_automaton = None  # type: Optional[TokenAutomaton]
+
+
+def get_moment_automaton() -> TokenAutomaton:
+    global _moment_automaton
+
+    # Building of terms loads morph dictionaries, so automaton is built on first use as well as parsers
+    if _moment_automaton is None:
+        _moment_automaton = TokenAutomaton(MOMENT_PATTERNS, MORPH_CACHE)
+
+    return _moment_automaton
+
+
+def get_moment_parser() -> Parser:
+    # Parser is compiled on first use: activation of rules loads morph dictionaries
+    return PARSER_REGISTRY.get_parser((RULE_MOMENT,), label="moment")
+
+
+def warm_up_moment_parser():
+    PARSER_REGISTRY.warm_up((RULE_MOMENT,), label="moment")
+    get_moment_automaton()
+
+
+def extract_first_natural_date_with_parser(txt: str) -> Optional["Moment.Frozen"]:
+    match = get_moment_parser().find(txt)
+    return freeze_fact(match.fact) if match else None
+
+
+def extract_first_natural_date(txt: str) -> Optional["Moment.Frozen"]:
+    def compute():
+        moment = get_moment_automaton().find(txt)
+
+        if moment is UNDECIDED:
+            return extract_first_natural_date_with_parser(txt)
+
+        return moment
+
+    if not GRAMMAR_RESULT_CACHE.enabled:
+        return compute()
+
+    # Frozen facts are immutable, so cached instance is safe to share between callers
+    return GRAMMAR_RESULT_CACHE.get_or_compute(("moment", normalize_phrase(txt)), compute)
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def extract_time_of_a_day(txt: str) -> Optional[TimesOfADayOption]:
+    """
+    Finds first time of a day word ("утром", "вечера", ...) in short answer.
+    Words are looked up in inflection table, so no parser is run.
+    """
+    forms = INFLECTION_TABLES.get(WORDS_AM_PM)
+
+    for word in _WORD_RE.findall(txt):
+        if normalize_surface_form(word) not in forms:
+            continue
+
+        for normal_form in MORPH_CACHE.normalized(word):
+            if normal_form in WORDS_AM_PM:
+                return WORDS_AM_PM[normal_form]
 
-def extract_first_natural_date(txt: str) -> Optional[Fact]:
-    match = MOMENT_PARSER.find(txt)
-    return match.fact if match else None
+    return None
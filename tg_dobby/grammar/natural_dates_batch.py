@@ -0,0 +1,194 @@
+from datetime import datetime, timedelta
+from typing import Iterable, List, Sequence, Union
+
+import numpy as np
+
+from tg_dobby.grammar.natural_dates import Moment, RelativeDay, RelativeInterval
+from tg_dobby.grammar.natural_dates_post_processing import (
+    ALL_CLARIFICATIONS_CLASSES,
+    ClarificationRequired,
+    ClarificationsIndex,
+    DayTimeClarification,
+    InvalidRelativeDateException,
+    _INTERVAL_STEPS,
+    _RELATIVE_DAY_OFFSETS,
+    _get_day_time,
+    _index_clarifications,
+)
+from tg_dobby.grammar.yargy_utils import definition_of
+
+# Result of resolution of single moment: date or exception which get_absolute_date raises for it
+BatchResult = Union[datetime, Exception]
+
+_MIN_DATE = np.datetime64(datetime.min, "us")
+_MAX_DATE = np.datetime64(datetime.max, "us")
+
+# Any offset beyond this one moves date out of supported range. Offsets are also guaranteed to fit int64.
+_MAX_OFFSET_US = (datetime.max - datetime.min) // timedelta(microseconds=1)
+
+
+def _timedelta_us(value: timedelta) -> int:
+    return value // timedelta(microseconds=1)
+
+
+# Same tables as used by get_absolute_date, converted to integers once
+_INTERVAL_STEPS_US = {unit: (_timedelta_us(delta), scalable) for unit, (delta, scalable) in _INTERVAL_STEPS.items()}
+_RELATIVE_DAY_OFFSETS_US = {rd: _timedelta_us(offset) for rd, offset in _RELATIVE_DAY_OFFSETS.items()}
+
+
+def _date_out_of_range() -> OverflowError:
+    return OverflowError("date value out of range")
+
+
+def _to_datetimes(base: datetime, dates: np.ndarray) -> List[Union[datetime, OverflowError]]:
+    in_range = (dates >= _MIN_DATE) & (dates <= _MAX_DATE)
+
+    # datetime64 values out of datetime range are converted to int by tolist()
+    results = [
+        d if ok else _date_out_of_range()
+        for d, ok in zip(dates.astype("datetime64[us]").tolist(), in_range.tolist())
+    ]
+
+    if base.tzinfo is not None:
+        results = [r.replace(tzinfo=base.tzinfo) if isinstance(r, datetime) else r for r in results]
+
+    return results
+
+
+def _resolve_relative_intervals(intervals: Sequence[RelativeInterval], base: datetime) -> List[BatchResult]:
+    results = [None] * len(intervals)  # type: List[BatchResult]
+
+    positions = []
+    steps = []
+    amounts = []
+
+    for i, relative_interval in enumerate(intervals):
+        unit = relative_interval.unit
+        step = _INTERVAL_STEPS_US.get(unit)
+
+        if step is None:
+            results[i] = InvalidRelativeDateException(
+                f"Unknown unit/amount combination: {unit}, {relative_interval.amount}"
+            )
+            continue
+
+        step_us, scalable = step
+        amount = relative_interval.amount if scalable and relative_interval.amount else 1
+
+        if abs(amount) > _MAX_OFFSET_US:
+            results[i] = _date_out_of_range()
+            continue
+
+        positions.append(i)
+        steps.append(step_us)
+        amounts.append(amount)
+
+    if positions:
+        steps = np.array(steps, dtype=np.int64)
+        amounts = np.array(amounts, dtype=np.int64)
+
+        # Products are computed only where they can not overflow int64
+        fits = np.abs(amounts) <= _MAX_OFFSET_US // steps
+        offsets = np.where(fits, steps * np.where(fits, amounts, 0), 0).astype("timedelta64[us]")
+
+        dates = np.datetime64(base.replace(tzinfo=None), "us") + offsets
+
+        for i, ok, date in zip(positions, fits.tolist(), _to_datetimes(base, dates)):
+            results[i] = date if ok else _date_out_of_range()
+
+    return results
+
+
+def _resolve_relative_days(days: Sequence[RelativeDay], base: datetime,
+                           clarifications: ClarificationsIndex) -> List[BatchResult]:
+    results = [None] * len(days)  # type: List[BatchResult]
+
+    positions = []
+    offsets = []
+    day_times = []
+
+    day_time_clarification = clarifications.get(DayTimeClarification)
+
+    for i, relative_day in enumerate(days):
+        rd = relative_day.relative_day
+
+        # Day times are resolved one by one: resolution may require clarification or fail
+        try:
+            if day_time_clarification:
+                day_time = day_time_clarification.day_time
+            elif relative_day.day_time:
+                day_time = _get_day_time(relative_day.day_time, base, clarifications)
+            else:
+                day_time = None
+        except (ClarificationRequired, InvalidRelativeDateException, ValueError) as e:
+            results[i] = e
+            continue
+
+        offset = _RELATIVE_DAY_OFFSETS_US.get(rd)
+
+        if offset is None:
+            results[i] = InvalidRelativeDateException(f"Unknown relative day option: {rd}")
+        elif not day_time:
+            results[i] = ClarificationRequired(DayTimeClarification(base.time()))
+        else:
+            positions.append(i)
+            offsets.append(offset)
+            day_times.append((day_time.hour * 60 + day_time.minute) * 60 + day_time.second)
+
+    if positions:
+        # Same as set_day_time(base, day_time) + offset
+        midnight = np.datetime64(base.date(), "us")
+        dates = (
+            midnight
+            + np.array(day_times, dtype=np.int64).astype("timedelta64[s]")
+            + np.array(offsets, dtype=np.int64).astype("timedelta64[us]")
+        )
+
+        for i, date in zip(positions, _to_datetimes(base, dates)):
+            results[i] = date
+
+    return results
+
+
+def get_absolute_dates(
+        moments: Sequence[Moment],
+        base: datetime = None,
+        clarifications: Iterable[ALL_CLARIFICATIONS_CLASSES] = (),
+) -> List[BatchResult]:
+    """
+    Batch version of get_absolute_date. Moments are grouped by type of effective date,
+    date arithmetic of each group is done at once over numpy arrays.
+    Returns results in order of moments: date or exception which get_absolute_date raises for moment.
+    """
+    if base is None:
+        base = datetime.now()
+
+    index = _index_clarifications(clarifications)
+
+    results = [None] * len(moments)  # type: List[BatchResult]
+    groups = {RelativeInterval: [], RelativeDay: []}
+
+    for i, moment in enumerate(moments):
+        distance = moment.effective_date
+        group = groups.get(definition_of(distance))
+
+        if group is None:
+            results[i] = InvalidRelativeDateException(
+                f"This type of relative date is not supported: {definition_of(distance).__name__}"
+            )
+        else:
+            group.append((i, distance))
+
+    resolved = (
+        (groups[RelativeInterval], lambda items: _resolve_relative_intervals(items, base)),
+        (groups[RelativeDay], lambda items: _resolve_relative_days(items, base, index)),
+    )
+
+    for group, resolve in resolved:
+        if group:
+            positions, items = zip(*group)
+
+            for i, result in zip(positions, resolve(items)):
+                results[i] = result
+
+    return results
@@ -1,4 +1,4 @@
-from typing import Tuple, NamedTuple, Union, Iterable
+from typing import Dict, Tuple, NamedTuple, Optional, Union, Iterable
 
 from tg_dobby.grammar.model import (
     TemporalUnit,
@@ -12,10 +12,10 @@ from tg_dobby.grammar.model import (
 from tg_dobby.grammar.natural_dates import (
     Moment,
     RelativeInterval,
-    DayOfWeek,
     RelativeDay,
     DayTime
 )
+from tg_dobby.grammar.yargy_utils import definition_of
 
 from datetime import datetime, timedelta, time
 
@@ -58,98 +58,146 @@ class InvalidRelativeDateException(Exception):
 # Post-processing logic
 ########################
 
-def get_day_time(day_time: DayTime, base: datetime = None,
-                 clarifications: Iterable[ALL_CLARIFICATIONS_CLASSES] = ()) -> time:
+# Clarifications are indexed by type once per resolution. First clarification of each type is used.
+ClarificationsIndex = Dict[type, ALL_CLARIFICATIONS_CLASSES]
+
+_NO_CLARIFICATIONS = {}  # type: ClarificationsIndex
+
+
+def _index_clarifications(clarifications: Iterable[ALL_CLARIFICATIONS_CLASSES]) -> ClarificationsIndex:
+    if not clarifications:
+        return _NO_CLARIFICATIONS
+
+    index = {}
+
+    for c in clarifications:
+        index.setdefault(type(c), c)
+
+    return index
+
+
+# (hour, time of a day) -> resolved time for hours which are ambiguous without time of a day
+_AM_PM_HOURS = {
+    **{(hour, toad): hour for hour in range(0, 12) for toad in (ToaD.MORNING, ToaD.NIGHT)},
+    **{(hour, toad): hour + 12 for hour in range(0, 12) for toad in (ToaD.DAY, ToaD.EVENING)},
+    (12, ToaD.NIGHT): 0,
+    (12, ToaD.EVENING): 0,
+    (12, ToaD.MORNING): 12,
+    (12, ToaD.DAY): 12,
+}
+
+_AM_PM_TIMES = {key: time(hour=hour) for key, hour in _AM_PM_HOURS.items()}
+
+
+def _assume_am_pm(base: Optional[datetime]) -> ToaD:
+    if base:
+        return ToaD.DAY if base.hour >= 12 else ToaD.NIGHT
+    else:
+        return ToaD.DAY
+
+
+def _get_day_time(day_time: DayTime, base: Optional[datetime], clarifications: ClarificationsIndex) -> time:
     hour = day_time.hour
     minute = day_time.minute if day_time.minute else 0
     second = day_time.second if day_time.second else 0
 
-    am_pm_clarification = next((c for c in clarifications if isinstance(c, TimeOfADayClarification)), None)
+    am_pm_clarification = clarifications.get(TimeOfADayClarification)
 
     am_pm = am_pm_clarification.time_of_a_day if am_pm_clarification else day_time.am_pm
 
-    UNK_TIME_OF_A_DAY = f"Unknown time of a day: {am_pm}"
-
-    def assume_am_pm():
-        if base:
-            return ToaD.DAY if base.hour >= 12 else ToaD.NIGHT
-        else:
-            return ToaD.DAY
-
     # If format is HH:MM -> interpret as 24H format
-    if day_time.strict_format:
-        return time(hour=hour, minute=minute, second=second)
-
-    elif day_time.hour > 12:
+    if day_time.strict_format or hour > 12:
         return time(hour=hour, minute=minute, second=second)
 
-    elif day_time.hour == 12:
-        if am_pm in (ToaD.NIGHT, ToaD.EVENING):
-            return time(hour=0, minute=minute, second=second)
+    if minute or second:
+        resolved_hour = _AM_PM_HOURS.get((hour, am_pm))
 
-        elif am_pm in (ToaD.MORNING, ToaD.DAY):
-            return time(12, minute, second=second)
+        if resolved_hour is not None:
+            return time(hour=resolved_hour, minute=minute, second=second)
+    else:
+        resolved = _AM_PM_TIMES.get((hour, am_pm))
 
-        if not am_pm:
-            raise ClarificationRequired(TimeOfADayClarification(assume_am_pm()))
+        if resolved is not None:
+            return resolved
 
-        else:
-            raise InvalidRelativeDateException(UNK_TIME_OF_A_DAY)
+    if not am_pm:
+        raise ClarificationRequired(TimeOfADayClarification(_assume_am_pm(base)))
 
-    else:
-        if am_pm in (ToaD.MORNING, ToaD.NIGHT):
-            return time(hour=hour, minute=minute, second=second)
+    raise InvalidRelativeDateException(f"Unknown time of a day: {am_pm}")
 
-        elif am_pm in (ToaD.DAY, ToaD.EVENING):
-            return time(hour=hour + 12, minute=minute, second=second)
 
-        elif not am_pm:
-            raise ClarificationRequired(TimeOfADayClarification(assume_am_pm()))
-
-        else:
-            raise InvalidRelativeDateException(UNK_TIME_OF_A_DAY)
+def get_day_time(day_time: DayTime, base: datetime = None,
+                 clarifications: Iterable[ALL_CLARIFICATIONS_CLASSES] = ()) -> time:
+    return _get_day_time(day_time, base, _index_clarifications(clarifications))
 
 
 def set_day_time(base: datetime, day_time: time) -> datetime:
     return base.replace(hour=day_time.hour, minute=day_time.minute, second=day_time.second, microsecond=0)
 
 
-# TODO FIX: request date clarification in 23:00 - 04:00 time range
-def natural_relative_day_to_absolute_date(
-        relative_day: RelativeDay, base: datetime,
-        clarifications: Iterable[ALL_CLARIFICATIONS_CLASSES] = (),
-) -> datetime:
+_RELATIVE_DAY_OFFSETS = {
+    RelativeDayOption.TODAY: timedelta(days=0),
+    RelativeDayOption.TOMORROW: timedelta(days=1),
+    RelativeDayOption.THE_DAY_AFTER_TOMORROW: timedelta(days=2),
+}
+
+
+def _relative_day_to_absolute_date(relative_day: RelativeDay, base: datetime,
+                                   clarifications: ClarificationsIndex) -> datetime:
     rd = relative_day.relative_day
 
-    day_time_clarification = next((c for c in clarifications if isinstance(c, DayTimeClarification)), None)
+    day_time_clarification = clarifications.get(DayTimeClarification)
 
     day_time = None  # type: time
 
     if day_time_clarification:
         day_time = day_time_clarification.day_time
     elif relative_day.day_time:
-        day_time = get_day_time(relative_day.day_time, base=base, clarifications=clarifications)
+        day_time = _get_day_time(relative_day.day_time, base, clarifications)
 
-    if rd == RelativeDayOption.TODAY:
-        if day_time:
-            return set_day_time(base, day_time)
+    offset = _RELATIVE_DAY_OFFSETS.get(rd)
 
-        raise ClarificationRequired(DayTimeClarification(base.time()))
+    if offset is None:
+        raise InvalidRelativeDateException(f"Unknown relative day option: {rd}")
 
-    elif rd == RelativeDayOption.TOMORROW:
-        if day_time:
-            return set_day_time(base, day_time) + timedelta(days=1)
+    if day_time:
+        return set_day_time(base, day_time) + offset
 
-        raise ClarificationRequired(DayTimeClarification(base.time()))
+    raise ClarificationRequired(DayTimeClarification(base.time()))
 
-    elif rd == RelativeDayOption.THE_DAY_AFTER_TOMORROW:
-        if day_time:
-            return set_day_time(base, day_time) + timedelta(days=2)
 
-        raise ClarificationRequired(DayTimeClarification(base.time()))
+# TODO FIX: request date clarification in 23:00 - 04:00 time range
+def natural_relative_day_to_absolute_date(
+        relative_day: RelativeDay, base: datetime,
+        clarifications: Iterable[ALL_CLARIFICATIONS_CLASSES] = (),
+) -> datetime:
+    return _relative_day_to_absolute_date(relative_day, base, _index_clarifications(clarifications))
 
-    else:
-        raise InvalidRelativeDateException(f"Unknown relative day option: {rd}")
+
+# unit -> (step, whether step is multiplied by amount)
+# TODO FIX: minutes are interpreted as hours
+_INTERVAL_STEPS = {
+    TemporalUnit.HOUR: (timedelta(hours=1), True),
+    TemporalUnit.MINUTE: (timedelta(hours=1), True),
+    TemporalUnit.DAY: (timedelta(days=1), True),
+    NamedInterval.HALF_AN_HOUR: (timedelta(minutes=30), False),
+}
+
+
+def _relative_interval_to_absolute_date(relative_interval: RelativeInterval, base: datetime,
+                                        clarifications: ClarificationsIndex) -> datetime:
+    unit = relative_interval.unit
+    step = _INTERVAL_STEPS.get(unit)
+
+    if step is None:
+        raise InvalidRelativeDateException(f"Unknown unit/amount combination: {unit}, {relative_interval.amount}")
+
+    delta, scalable = step
+
+    if scalable and relative_interval.amount:
+        delta = delta * relative_interval.amount
+
+    return base + delta
 
 
 def natural_relative_interval_to_absolute_date(
@@ -157,22 +205,13 @@ def natural_relative_interval_to_absolute_date(
         base: datetime,
         clarifications: Iterable[ALL_CLARIFICATIONS_CLASSES] = (),
 ) -> datetime:
-    unit = relative_interval.unit
-
-    simple_units = {
-        TemporalUnit.HOUR: lambda: base + timedelta(hours=relative_interval.amount if relative_interval.amount else 1),
-        TemporalUnit.MINUTE: lambda: base + timedelta(
-            hours=relative_interval.amount if relative_interval.amount else 1),
-        NamedInterval.HALF_AN_HOUR: lambda: base + timedelta(minutes=30),
-    }
+    return _relative_interval_to_absolute_date(relative_interval, base, _index_clarifications(clarifications))
 
-    if unit in simple_units:
-        return simple_units[unit]()
 
-    elif unit == TemporalUnit.DAY:
-        return base + timedelta(days=relative_interval.amount if relative_interval.amount else 1)
-    else:
-        raise InvalidRelativeDateException(f"Unknown unit/amount combination: {unit}, {relative_interval.amount}")
+_RESOLVERS = {
+    RelativeInterval: _relative_interval_to_absolute_date,
+    RelativeDay: _relative_day_to_absolute_date,
+}
 
 
 def get_absolute_date(
@@ -184,21 +223,97 @@ def get_absolute_date(
         base = datetime.now()
 
     distance = moment.effective_date
+    resolver = _RESOLVERS.get(definition_of(distance))
 
-    if isinstance(distance, RelativeInterval):
-        return natural_relative_interval_to_absolute_date(
-            relative_interval=distance,
-            base=base,
-            clarifications=clarifications,
-        )
-    if isinstance(distance, RelativeDay):
-        return natural_relative_day_to_absolute_date(
-            relative_day=distance,
-            base=base,
-            clarifications=clarifications,
-        )
-    if isinstance(distance, DayOfWeek):
-        raise InvalidRelativeDateException(f"This type of relative date is not supported: {type(distance).__name__}")
+    if resolver is None:
+        raise InvalidRelativeDateException(f"This type of relative date is not supported: {definition_of(distance).__name__}")
 
-    else:
-        raise InvalidRelativeDateException(f"This type of relative date is not supported: {type(distance).__name__}")
+    return resolver(distance, base, _index_clarifications(clarifications))
+
+
+class ResolutionState:
+    """
+    Resumable resolution of moment into absolute date for multi-step clarification dialogs.
+    Parts of moment resolved so far are kept, so each clarification answer only resumes resolution from the step
+    which required it instead of resolving whole moment again.
+    """
+
+    def __init__(self, moment: Moment, base: datetime = None):
+        self.moment = moment
+        self.base = base if base is not None else datetime.now()
+
+        # Resolved parts of moment
+        self.day_time = None  # type: Optional[time]
+        self.date = None  # type: Optional[datetime]
+
+        # Clarifications which must be answered before resolution can proceed
+        self.pending = ()  # type: Tuple[ALL_CLARIFICATIONS_CLASSES, ...]
+
+        self._answers = {}  # type: ClarificationsIndex
+        self._day_time_fact = None  # type: Optional[DayTime]
+
+        distance = moment.effective_date
+
+        if isinstance(distance, RelativeDay):
+            self._day_time_fact = distance.day_time
+
+    def clarify(self, clarification: ALL_CLARIFICATIONS_CLASSES):
+        """
+        Accepts answer to one of pending clarifications
+        """
+        if not any(isinstance(clarification, type(p)) for p in self.pending):
+            raise ValueError(f"Clarification was not requested: {type(clarification).__name__}")
+
+        self.pending = tuple(p for p in self.pending if not isinstance(clarification, type(p)))
+
+        if isinstance(clarification, DayTimeClarification):
+            if isinstance(clarification.day_time, time):
+                self.day_time = clarification.day_time
+            else:
+                # Day time answered in words may still require time of a day
+                self._day_time_fact = clarification.day_time
+                self._answers.pop(TimeOfADayClarification, None)
+        else:
+            self._answers[type(clarification)] = clarification
+
+    def resolve(self) -> datetime:
+        """
+        Continues resolution. Raises ClarificationRequired until all pending clarifications are answered.
+        """
+        if self.date is not None:
+            return self.date
+
+        if self.pending:
+            raise ClarificationRequired(*self.pending)
+
+        try:
+            self.date = self._resolve()
+        except ClarificationRequired as e:
+            self.pending = e.required_clarifications
+            raise
+
+        return self.date
+
+    def _resolve(self) -> datetime:
+        distance = self.moment.effective_date
+
+        if isinstance(distance, RelativeInterval):
+            return _relative_interval_to_absolute_date(distance, self.base, _NO_CLARIFICATIONS)
+
+        if not isinstance(distance, RelativeDay):
+            raise InvalidRelativeDateException(
+                f"This type of relative date is not supported: {definition_of(distance).__name__}"
+            )
+
+        if self.day_time is None and self._day_time_fact:
+            self.day_time = _get_day_time(self._day_time_fact, self.base, self._answers)
+
+        offset = _RELATIVE_DAY_OFFSETS.get(distance.relative_day)
+
+        if offset is None:
+            raise InvalidRelativeDateException(f"Unknown relative day option: {distance.relative_day}")
+
+        if self.day_time is None:
+            raise ClarificationRequired(DayTimeClarification(self.base.time()))
+
+        return set_day_time(self.base, self.day_time) + offset
@@ -0,0 +1,118 @@
+import re
+from datetime import datetime
+from typing import Iterable, Iterator, NamedTuple, Optional, Tuple, Union
+
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+from tg_dobby.grammar.natural_dates import Moment, RULE_MOMENT, get_moment_parser
+from tg_dobby.grammar.natural_dates_post_processing import (
+    get_absolute_date,
+    ClarificationRequired,
+    InvalidRelativeDateException,
+)
+from tg_dobby.grammar.prefilter import TriggerIndex
+from tg_dobby.grammar.yargy_utils import freeze_fact
+
+DEFAULT_MAX_CHUNK_SIZE = 1024
+
+# Sentence ends with punctuation followed by whitespace or with line break
+_SENTENCE_END_RE = re.compile(r"[.!?…]+\s+|\n\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+class NaturalDateMatch(NamedTuple):
+    # Offsets of moment phrase in the whole input
+    span: Tuple[int, int]
+    moment: "Moment.Frozen"
+    # None if moment can not be resolved without clarification
+    date: Optional[datetime]
+
+
+def _find_cut(text: str, start: int, stop: int) -> int:
+    for pattern in (_SENTENCE_END_RE, _WHITESPACE_RE):
+        cut = None
+
+        for match in pattern.finditer(text, start, stop):
+            cut = match.end()
+
+        if cut is not None and cut > start:
+            return cut
+
+    # No whitespace at all, cutting as is
+    return stop
+
+
+def iter_sentence_chunks(source: Union[str, Iterable[str]],
+                         max_chunk_size: int = DEFAULT_MAX_CHUNK_SIZE) -> Iterator[Tuple[int, str]]:
+    """
+    Splits text (or stream of text pieces, like lines of file) into chunks not longer than max_chunk_size.
+    Chunks are cut at sentence ends if possible, at whitespace otherwise.
+    Yields (offset of chunk in the whole input, chunk).
+    """
+    if max_chunk_size <= 0:
+        raise ValueError("Max chunk size must be positive")
+
+    if isinstance(source, str):
+        source = (source,)
+
+    offset = 0
+    pending = ""
+
+    for piece in source:
+        text = pending + piece
+        start = 0
+
+        while len(text) - start > max_chunk_size:
+            cut = _find_cut(text, start, start + max_chunk_size)
+
+            yield offset, text[start:cut]
+
+            offset += cut - start
+            start = cut
+
+        pending = text[start:]
+
+    if pending:
+        yield offset, pending
+
+
+_moment_trigger_index = None  # type: Optional[TriggerIndex]
+
+
+def _get_moment_trigger_index() -> TriggerIndex:
+    global _moment_trigger_index
+
+    if _moment_trigger_index is None:
+        _moment_trigger_index = TriggerIndex.from_rules((RULE_MOMENT,), MORPH_CACHE)
+
+    return _moment_trigger_index
+
+
+def iter_natural_dates(source: Union[str, Iterable[str]], base: datetime = None,
+                       max_chunk_size: int = DEFAULT_MAX_CHUNK_SIZE) -> Iterator[NaturalDateMatch]:
+    """
+    Lazily extracts all moments from text (or stream of text pieces) in order of appearance.
+    Only one chunk is processed at a time, so memory usage does not depend on input length.
+    """
+    if base is None:
+        base = datetime.now()
+
+    parser = get_moment_parser()
+    trigger_index = _get_moment_trigger_index()
+
+    for offset, chunk in iter_sentence_chunks(source, max_chunk_size):
+        if not trigger_index.may_match(chunk):
+            continue
+
+        for match in sorted(parser.findall(chunk), key=lambda m: m.span.start):
+            moment = freeze_fact(match.fact)
+
+            try:
+                date = get_absolute_date(moment, base=base)
+            except (ClarificationRequired, InvalidRelativeDateException):
+                date = None
+
+            yield NaturalDateMatch(
+                span=(offset + match.span.start, offset + match.span.stop),
+                moment=moment,
+                date=date,
+            )
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Sequence, Tuple
+
+from yargy import Parser, or_
+from yargy.morph import MorphAnalyzer
+from yargy.tokenizer import MorphTokenizer
+
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+
+log = logging.getLogger(__name__)
+
+
+class ParserStats(NamedTuple):
+    label: str
+    rules_count: int
+    compile_time: float
+    hits: int
+
+
+class _RegistryEntry:
+    __slots__ = ("label", "rules", "parser", "compile_time", "hits")
+
+    def __init__(self, label: str, rules: Tuple, parser: Parser, compile_time: float):
+        # Rules are kept referenced to guarantee that ids used in registry key will not be reused
+        self.label = label
+        self.rules = rules
+        self.parser = parser
+        self.compile_time = compile_time
+        self.hits = 0
+
+
+def compose_or(*rules):
+    if len(rules) == 1:
+        return rules[0]
+
+    return or_(*rules)
+
+
+class ParserRegistry:
+    """
+    Process-wide storage of compiled yargy parsers.
+    Each distinct rules tuple (combined with composition function) is compiled only once.
+    All parsers share single morph tokenizer, so pymorphy2 dictionaries are loaded only once too.
+    """
+
+    def __init__(self, morph: MorphAnalyzer = MORPH_CACHE):
+        self._lock = threading.Lock()
+        self._entries = {}  # type: Dict[Hashable, _RegistryEntry]
+        self._morph = morph
+        self._tokenizer = None  # type: Optional[MorphTokenizer]
+
+    @property
+    def tokenizer(self) -> MorphTokenizer:
+        if self._tokenizer is None:
+            with self._lock:
+                if self._tokenizer is None:
+                    self._tokenizer = MorphTokenizer(morph=self._morph)
+
+        return self._tokenizer
+
+    @staticmethod
+    def _make_key(rules: Tuple, compose: Callable) -> Hashable:
+        return (compose,) + tuple(id(r) for r in rules)
+
+    def get_parser(self, rules: Sequence, compose: Callable = compose_or, label: str = None) -> Parser:
+        rules = tuple(rules)
+        key = self._make_key(rules, compose)
+
+        entry = self._entries.get(key)
+
+        if entry is None:
+            entry = self._compile(key, rules, compose, label)
+
+        entry.hits += 1
+        return entry.parser
+
+    def warm_up(self, rules: Sequence, compose: Callable = compose_or, label: str = None):
+        """
+        Compiles parser in advance without counting a hit
+        """
+        rules = tuple(rules)
+        key = self._make_key(rules, compose)
+
+        if key not in self._entries:
+            self._compile(key, rules, compose, label)
+
+    def _compile(self, key: Hashable, rules: Tuple, compose: Callable, label: Optional[str]) -> _RegistryEntry:
+        tokenizer = self.tokenizer
+
+        with self._lock:
+            # Parser might be compiled by another thread while waiting for lock
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry
+
+            started = time.perf_counter()
+            parser = Parser(compose(*rules), tokenizer=tokenizer)
+            compile_time = time.perf_counter() - started
+
+            entry = _RegistryEntry(
+                label=label or f"parser#{len(self._entries)}",
+                rules=rules,
+                parser=parser,
+                compile_time=compile_time,
+            )
+            self._entries[key] = entry
+
+        log.info(f"Parser '{entry.label}' compiled in {compile_time * 1000:.1f} ms")
+
+        return entry
+
+    def stats(self) -> List[ParserStats]:
+        return [
+            ParserStats(
+                label=entry.label,
+                rules_count=len(entry.rules),
+                compile_time=entry.compile_time,
+                hits=entry.hits,
+            )
+            for entry in list(self._entries.values())
+        ]
+
+    def log_stats(self):
+        for s in self.stats():
+            log.info(f"Parser '{s.label}': rules={s.rules_count} compile_time={s.compile_time * 1000:.1f}ms hits={s.hits}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+PARSER_REGISTRY = ParserRegistry()
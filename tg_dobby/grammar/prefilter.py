@@ -0,0 +1,44 @@
+import re
+from typing import FrozenSet, Iterable
+
+from yargy.morph import MorphAnalyzer
+from yargy.predicates import gte, lte
+
+from tg_dobby.grammar.vocabulary import collect_rule_inflections, iter_rule_predicates, normalize_surface_form
+
+# Same as word and integer token rules of yargy tokenizer
+_WORD_RE = re.compile(r"[а-яё]+", re.IGNORECASE)
+_DIGIT_RE = re.compile(r"\d")
+
+
+class TriggerIndex:
+    """
+    Cheap check whether phrase may contain anything that rules can match.
+    Grammar matches whole tokens, so index is a hash set of all inflected forms of the grammar vocabulary.
+    If rules use numeric predicates, any digit is a trigger too.
+    """
+
+    def __init__(self, words: Iterable[str], digits: bool):
+        self.words = frozenset(normalize_surface_form(w) for w in words)  # type: FrozenSet[str]
+        self.digits = digits
+
+    @classmethod
+    def from_rules(cls, rules: Iterable, morph: MorphAnalyzer) -> "TriggerIndex":
+        rules = list(rules)
+
+        return cls(
+            words=collect_rule_inflections(rules, morph),
+            digits=any(isinstance(p, (gte, lte)) for p in iter_rule_predicates(rules)),
+        )
+
+    def may_match(self, txt: str) -> bool:
+        if self.digits and _DIGIT_RE.search(txt):
+            return True
+
+        words = self.words
+
+        for word in _WORD_RE.findall(txt):
+            if normalize_surface_form(word) in words:
+                return True
+
+        return False
@@ -0,0 +1,114 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+_HORIZONTAL_WHITESPACE_RE = re.compile(r"[^\S\r\n]+")
+
+
+def normalize_phrase(txt: str) -> str:
+    """
+    Normalizes phrase for using as cache key.
+    Line breaks are kept as is because they are separate tokens for grammar.
+    Case is kept too: grammar rules match words case-sensitively.
+    """
+    return _HORIZONTAL_WHITESPACE_RE.sub(" ", txt.strip())
+
+
+class CacheStats(NamedTuple):
+    size: int
+    max_size: int
+    ttl: Optional[float]
+    hits: int
+    misses: int
+    expirations: int
+
+
+class LruResultCache:
+    """
+    Thread-safe LRU cache with size cap and optional TTL (in seconds).
+    Cache with max_size == 0 is disabled: every lookup is a miss and nothing is stored.
+    """
+
+    def __init__(self, max_size: int = 0, ttl: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self._lock = threading.Lock()
+        self._clock = clock
+        self._data = OrderedDict()  # type: OrderedDict
+
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_size > 0
+
+    def configure(self, max_size: int, ttl: Optional[float] = None):
+        with self._lock:
+            self.max_size = max_size
+            self.ttl = ttl
+
+            while len(self._data) > max(max_size, 0):
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        Returns cached value for key or computes and stores new one.
+        Value is computed outside of lock, so concurrent misses for the same key may compute value twice.
+        """
+        if not self.enabled:
+            return compute()
+
+        now = self._clock()
+
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is not None:
+                expires_at, value = item
+
+                if expires_at is None or expires_at > now:
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                del self._data[key]
+                self.expirations += 1
+
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._data[key] = (None if self.ttl is None else now + self.ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+        return value
+
+    def stats(self) -> CacheStats:
+        return CacheStats(
+            size=len(self._data),
+            max_size=self.max_size,
+            ttl=self.ttl,
+            hits=self.hits,
+            misses=self.misses,
+            expirations=self.expirations,
+        )
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.expirations = 0
+
+
+# Disabled by default. Use GRAMMAR_RESULT_CACHE.configure() to enable
+GRAMMAR_RESULT_CACHE = LruResultCache()
@@ -0,0 +1,251 @@
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from yargy.morph import MorphAnalyzer
+from yargy.tokenizer import Tokenizer, RUSSIAN, INT
+
+from tg_dobby.grammar.vocabulary import INFLECTION_TABLES, InflectionTables, normalize_surface_form
+
+# Result of automaton which can not decide on phrase, caller should run general parser
+UNDECIDED = object()
+
+
+class Term:
+    """
+    Token-level terminal of automaton. Semantics are the same as of corresponding yargy predicate.
+    """
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.__dict__!r})"
+
+
+class WordTerm(Term):
+    """
+    Same as inflections(words): token is one of surface forms of words lexemes
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words = frozenset(words)
+
+
+class LiteralTerm(Term):
+    """
+    Same as eq(value)
+    """
+
+    def __init__(self, value: str):
+        self.value = value
+
+
+class IntTerm(Term):
+    """
+    Same as and_(gte(min_value), lte(max_value))
+    """
+
+    def __init__(self, min_value: int, max_value: int):
+        self.min_value = min_value
+        self.max_value = max_value
+
+
+# Pattern is list of alternative paths. Path is tuple of (term, capture key) steps.
+Step = Tuple[Term, Optional[str]]
+Pattern = List[Tuple[Step, ...]]
+
+
+def _as_pattern(item) -> Pattern:
+    if isinstance(item, Term):
+        return [((item, None),)]
+
+    return item
+
+
+def capture(key: str, term: Term) -> Pattern:
+    return [((term, key),)]
+
+
+def seq(*items) -> Pattern:
+    paths = [()]
+
+    for item in items:
+        paths = [head + tail for head in paths for tail in _as_pattern(item)]
+
+    return paths
+
+
+def optional(item) -> Pattern:
+    return [()] + _as_pattern(item)
+
+
+def alt(*items) -> Pattern:
+    return [path for item in items for path in _as_pattern(item)]
+
+
+class AutomatonToken(NamedTuple):
+    value: str
+    # Same as normalized value of yargy token: first normal form for words, lower-cased value otherwise
+    normalized: str
+
+
+Builder = Callable[[Dict[str, AutomatonToken]], Any]
+
+
+class _Node:
+    __slots__ = ("edges", "accepts")
+
+    def __init__(self):
+        self.edges = {}  # type: Dict[int, _Node]
+        self.accepts = []  # type: List[Tuple[Tuple[Optional[str], ...], Builder]]
+
+
+class _Candidate(NamedTuple):
+    start: int
+    stop: int
+    keys: Tuple[Optional[str], ...]
+    builder: Builder
+
+
+class TokenAutomaton:
+    """
+    Trie of all token paths of finite grammar, each path is bound to builder of resulting fact.
+    Simulation from every token gives all matches of grammar, like yargy chart does.
+    Only phrases with the single longest match are decided, for others yargy ordering rules are too subtle to mirror.
+    """
+
+    def __init__(self, patterns: Sequence[Tuple[Pattern, Builder]], morph: MorphAnalyzer,
+                 tables: InflectionTables = INFLECTION_TABLES):
+        self._morph = morph
+        self._tables = tables
+
+        tokenizer = Tokenizer()
+        self._regexp = tokenizer.regexp
+        self._types = tokenizer.mapping  # type: Dict[str, str]
+
+        self._term_bits = {}  # type: Dict[int, int]
+        self._form_masks = {}  # type: Dict[str, int]
+        self._literal_masks = {}  # type: Dict[str, int]
+        self._int_terms = []  # type: List[Tuple[int, int, int]]
+
+        self._root = _Node()
+
+        for pattern, builder in patterns:
+            for path in pattern:
+                self._add_path(path, builder)
+
+    def _term_bit(self, term: Term) -> int:
+        bit = self._term_bits.get(id(term))
+
+        if bit is not None:
+            return bit
+
+        bit = 1 << len(self._term_bits)
+        self._term_bits[id(term)] = bit
+
+        if isinstance(term, WordTerm):
+            for form in self._tables.get(term.words):
+                self._form_masks[form] = self._form_masks.get(form, 0) | bit
+        elif isinstance(term, LiteralTerm):
+            self._literal_masks[term.value] = self._literal_masks.get(term.value, 0) | bit
+        elif isinstance(term, IntTerm):
+            self._int_terms.append((term.min_value, term.max_value, bit))
+        else:
+            raise TypeError(f"Unsupported term: {term!r}")
+
+        return bit
+
+    def _add_path(self, path: Tuple[Step, ...], builder: Builder):
+        if not path:
+            raise ValueError("Pattern path can not be empty")
+
+        node = self._root
+
+        for term, _ in path:
+            bit = self._term_bit(term)
+            node = node.edges.setdefault(bit, _Node())
+
+        node.accepts.append((tuple(key for _, key in path), builder))
+
+    def _classify(self, value: str, token_type: str) -> int:
+        mask = self._literal_masks.get(value, 0)
+
+        if token_type == RUSSIAN:
+            mask |= self._form_masks.get(normalize_surface_form(value), 0)
+        elif token_type == INT:
+            number = int(value)
+
+            for min_value, max_value, bit in self._int_terms:
+                if min_value <= number <= max_value:
+                    mask |= bit
+
+        return mask
+
+    def _normalize(self, value: str, token_type: str) -> str:
+        # Morph analysis is required only for tokens captured into facts
+        if token_type == RUSSIAN:
+            return self._morph(value)[0].normalized
+
+        return value.lower()
+
+    def _candidates(self, masks: List[int]) -> List[_Candidate]:
+        candidates = []
+        root = self._root
+
+        for start, mask in enumerate(masks):
+            if not mask:
+                continue
+
+            active = [root]
+            position = start
+
+            while active and position < len(masks):
+                mask = masks[position]
+                position += 1
+
+                active = [child for node in active for bit, child in node.edges.items() if mask & bit]
+
+                for node in active:
+                    for keys, builder in node.accepts:
+                        candidates.append(_Candidate(start, position, keys, builder))
+
+        return candidates
+
+    def find(self, txt: str) -> Any:
+        """
+        Returns fact built for the longest match, None if there are no matches or UNDECIDED
+        """
+        tokens = []
+        masks = []
+
+        for match in self._regexp.finditer(txt):
+            token = (match.group(0), self._types[match.lastgroup])
+            tokens.append(token)
+            masks.append(self._classify(*token))
+
+        candidates = self._candidates(masks)
+
+        if not candidates:
+            return None
+
+        cover = max(c.stop - c.start for c in candidates)
+        longest = [c for c in candidates if c.stop - c.start == cover]
+
+        if any(c.start != longest[0].start for c in longest):
+            return UNDECIDED
+
+        results = []
+
+        for c in longest:
+            captures = {
+                key: AutomatonToken(tokens[position][0], self._normalize(*tokens[position]))
+                for key, position in zip(c.keys, range(c.start, c.stop))
+                if key is not None
+            }
+
+            try:
+                results.append(c.builder(captures))
+            except (ValueError, TypeError):
+                # Parser fails the same way or interprets phrase differently, anyway it is up to parser
+                return UNDECIDED
+
+        if any(r != results[0] for r in results):
+            return UNDECIDED
+
+        return results[0]
@@ -1,11 +1,12 @@
-from typing import Union, List, NamedTuple, Optional
+from typing import Union, List, NamedTuple, Optional, Tuple
 
-import yargy
 from yargy import rule, Parser, or_
-from yargy.predicates import normalized
 
-from tg_dobby.grammar.natural_dates import RULE_MOMENT
-from tg_dobby.grammar.yargy_utils import FactDefinition
+from tg_dobby.grammar.natural_dates import RULE_MOMENT, RULE_DAY_TIME
+from tg_dobby.grammar.parser_registry import PARSER_REGISTRY
+from tg_dobby.grammar.result_cache import GRAMMAR_RESULT_CACHE
+from tg_dobby.grammar.vocabulary import inflections
+from tg_dobby.grammar.yargy_utils import FactDefinition, freeze_fact
 
 
 class ReminderPreamble(FactDefinition):
@@ -13,8 +14,8 @@ class ReminderPreamble(FactDefinition):
 
 
 RULE_REMINDER_PREAMBLE = rule(
-    normalized("напомни"),
-    normalized("мне").optional().interpretation(ReminderPreamble.target),
+    inflections({"напомни"}),
+    inflections({"мне"}).optional().interpretation(ReminderPreamble.target),
 ).interpretation(ReminderPreamble)
 
 
@@ -22,60 +23,100 @@ class TokenFact(FactDefinition):
     nested_fact: FactDefinition
 
 
-class PhraseToken:
-
-    def __init__(self, text, match=None):
-        self._match = match  # type: yargy.parser.Match
-        self._text = text
+class PhraseToken(NamedTuple):
+    """
+    Span of source phrase with optional fact extracted from it.
+    Text is not copied until requested. Fact is frozen, so token does not reference parser internals.
+    """
+    source: str
+    start: int
+    stop: int
+    fact: Optional[FactDefinition] = None
 
     @property
     def text(self) -> str:
-        return self._text
-
-    @property
-    def fact(self) -> Optional[FactDefinition]:
-        if self._match and self._match.fact and hasattr(self._match.fact, 'nested_fact'):
-            return self._match.fact.nested_fact
-
-        return None
+        return self.source[self.start:self.stop]
 
     def __repr__(self):
         return f"{self.text} > {self.fact}"
 
 
-def tokenize_phrase(txt: str, rules=(RULE_MOMENT, RULE_REMINDER_PREAMBLE,)) -> List[PhraseToken]:
-    parser = Parser(
-        or_(*[
-            r.interpretation(TokenFact.nested_fact) for r in rules
-        ]).interpretation(TokenFact)
-    )
+DEFAULT_TOKENIZER_RULES = (RULE_MOMENT, RULE_REMINDER_PREAMBLE,)
+
+DAY_TIME_TOKENIZER_RULES = (RULE_DAY_TIME,)
+
+# Named rule sets, names are used to refer rule sets across process boundaries
+TOKENIZER_RULE_SETS = {
+    "default": DEFAULT_TOKENIZER_RULES,
+    "day_time": DAY_TIME_TOKENIZER_RULES,
+}
+
+
+def compose_token_rule(*rules):
+    return or_(*[
+        r.interpretation(TokenFact.nested_fact) for r in rules
+    ]).interpretation(TokenFact)
+
+
+def get_tokenizer_parser(rules=DEFAULT_TOKENIZER_RULES, label: str = None) -> Parser:
+    return PARSER_REGISTRY.get_parser(rules, compose=compose_token_rule, label=label)
+
+
+def warm_up_tokenizer(rules=DEFAULT_TOKENIZER_RULES, label: str = None):
+    PARSER_REGISTRY.warm_up(rules, compose=compose_token_rule, label=label)
+
+
+def tokenize_phrase(txt: str, rules=DEFAULT_TOKENIZER_RULES) -> List[PhraseToken]:
+    if not GRAMMAR_RESULT_CACHE.enabled:
+        return _tokenize_phrase(txt, rules)
 
-    matches = parser.findall(txt)
-    matches = sorted(matches, key=lambda m: m.span.start)
+    # Tokens are immutable, so cached ones are safe to share between callers
+    return list(GRAMMAR_RESULT_CACHE.get_or_compute(
+        ("tokens", tuple(id(r) for r in rules), txt),
+        lambda: tuple(_tokenize_phrase(txt, rules)),
+    ))
+
+
+def _strip_span(txt: str, start: int, stop: int) -> Tuple[int, int]:
+    while start < stop and txt[start].isspace():
+        start += 1
+
+    while stop > start and txt[stop - 1].isspace():
+        stop -= 1
+
+    return start, stop
+
+
+def _match_token(txt: str, match) -> PhraseToken:
+    token_fact = match.fact
+
+    # Match tree is not referenced by token, so it is released as soon as fact is extracted
+    return PhraseToken(txt, match.span.start, match.span.stop, freeze_fact(token_fact.nested_fact))
+
+
+def _tokenize_phrase(txt: str, rules) -> List[PhraseToken]:
+    parser = get_tokenizer_parser(rules)
+
+    matches = sorted(parser.findall(txt), key=lambda m: m.span.start)
 
     expected_span_start = 0
 
     result = []
 
-    for match in sorted(matches, key=lambda m: m.span.start):
-        if match.span.start == expected_span_start:
-            result.append(PhraseToken(
-                txt[match.span.start:match.span.stop], match=match
-            ))
-        else:
-            result.append(
-                PhraseToken(txt[expected_span_start:match.span.start].strip())
-            )
-            result.append(PhraseToken(
-                txt[match.span.start:match.span.stop], match=match
-            ))
-
-        expected_span_start = match.span.stop + 1
+    for match in matches:
+        span_start, span_stop = match.span
+
+        if span_start != expected_span_start:
+            result.append(PhraseToken(txt, *_strip_span(txt, expected_span_start, span_start)))
+
+        result.append(_match_token(txt, match))
+
+        expected_span_start = span_stop + 1
 
     if expected_span_start < len(txt):
-        tail_text = txt[expected_span_start:].strip()
+        tail_start, tail_stop = _strip_span(txt, expected_span_start, len(txt))
 
-        if tail_text:
-            result.append(PhraseToken(tail_text))
+        if tail_start < tail_stop:
+            result.append(PhraseToken(txt, tail_start, tail_stop))
 
     return result
@@ -0,0 +1,172 @@
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, Iterator, NamedTuple
+
+from yargy.morph import MorphAnalyzer
+from yargy.predicates import normalized, dictionary
+from yargy.predicates.bank import DictionaryPredicate
+from yargy.predicates.constructors import Predicate, PredicateScheme, AndPredicate, OrPredicate
+
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+
+log = logging.getLogger(__name__)
+
+
+def normalize_surface_form(word: str) -> str:
+    # pymorphy2 treats "е" and "ё" as the same letter
+    return word.lower().replace("ё", "е")
+
+
+def iter_rule_predicates(rules: Iterable) -> Iterator[Predicate]:
+    """
+    Yields all predicates of rules including ones nested into and_(...)/or_(...) compositions.
+    Predicates nested into not_(...) are not inspected.
+    """
+    for r in rules:
+        stack = list(r.walk(types=Predicate))
+
+        while stack:
+            predicate = stack.pop()
+
+            if isinstance(predicate, (AndPredicate, OrPredicate)):
+                stack.extend(predicate.predicates)
+            else:
+                yield predicate
+
+
+def collect_rule_lemmas(rules: Iterable, morph: MorphAnalyzer) -> FrozenSet[str]:
+    """
+    Collects normal forms which are looked up by normalized(...), dictionary(...) and inflections(...) predicates.
+    yargy activates predicates in place, so both not yet activated schemes and activated predicates are handled.
+    """
+    words = set()
+
+    for predicate in iter_rule_predicates(rules):
+        if isinstance(predicate, normalized):
+            words.add(predicate.value)
+        elif isinstance(predicate, (dictionary, DictionaryPredicate)):
+            words.update(predicate.value)
+        elif isinstance(predicate, (inflections, InflectionsPredicate)):
+            words.update(predicate.words)
+
+    lemmas = set()
+
+    for word in words:
+        lemmas.update(morph.normalized(word))
+
+    return frozenset(lemmas)
+
+
+def expand_inflections(lemmas: Iterable[str], morph: MorphAnalyzer) -> FrozenSet[str]:
+    """
+    Expands normal forms into all surface forms of their lexemes
+    """
+    forms = set()
+
+    for lemma in lemmas:
+        forms.add(lemma)
+
+        for parse in morph.raw.parse(lemma):
+            if parse.normal_form == lemma:
+                forms.update(form.word for form in parse.lexeme)
+
+    return frozenset(forms)
+
+
+def collect_rule_inflections(rules: Iterable, morph: MorphAnalyzer) -> FrozenSet[str]:
+    return expand_inflections(collect_rule_lemmas(rules, morph), morph)
+
+
+class InflectionTablesStats(NamedTuple):
+    tables: int
+    forms: int
+    build_time: float
+
+
+class InflectionTables:
+    """
+    Process-wide storage of inflection tables: all surface forms of lexemes of grammar words.
+    Each distinct set of words is expanded only once, on first use.
+    """
+
+    def __init__(self, morph: MorphAnalyzer = MORPH_CACHE):
+        self._morph = morph
+        self._lock = threading.Lock()
+        self._tables = {}  # type: Dict[FrozenSet[str], FrozenSet[str]]
+        self._build_time = 0.0
+
+    def get(self, words: Iterable[str]) -> FrozenSet[str]:
+        words = frozenset(words)
+        table = self._tables.get(words)
+
+        if table is not None:
+            return table
+
+        with self._lock:
+            table = self._tables.get(words)
+
+            if table is None:
+                started = time.perf_counter()
+
+                lemmas = set()
+
+                for word in words:
+                    lemmas.update(self._morph.normalized(word))
+
+                table = frozenset(normalize_surface_form(form) for form in expand_inflections(lemmas, self._morph))
+
+                self._tables[words] = table
+                self._build_time += time.perf_counter() - started
+
+        return table
+
+    def stats(self) -> InflectionTablesStats:
+        tables = list(self._tables.values())
+
+        return InflectionTablesStats(
+            tables=len(tables),
+            forms=sum(len(t) for t in tables),
+            build_time=self._build_time,
+        )
+
+    def log_stats(self):
+        s = self.stats()
+        log.info(f"Inflection tables: tables={s.tables} forms={s.forms} build_time={s.build_time * 1000:.1f}ms")
+
+
+INFLECTION_TABLES = InflectionTables()
+
+
+class InflectionsPredicate(Predicate):
+    __attributes__ = ['words', 'forms']
+
+    def __init__(self, words: FrozenSet[str], forms: FrozenSet[str]):
+        self.words = words
+        self.forms = forms
+
+    def __call__(self, token):
+        return normalize_surface_form(token.value) in self.forms
+
+    @property
+    def label(self):
+        return 'inflections(...)'
+
+
+class inflections(PredicateScheme):
+    """
+    Same as dictionary(words), but token is looked up by surface form in precomputed inflection table,
+    so matching does not depend on morph analysis of token
+    """
+    __attributes__ = ['words']
+
+    def __init__(self, words: Iterable[str]):
+        self.words = frozenset(words)
+
+    def activate(self, context):
+        # Tables depend on pymorphy2 dictionaries only, so are shared by all parsers
+        return InflectionsPredicate(self.words, INFLECTION_TABLES.get(self.words))
+
+    @property
+    def label(self):
+        return 'inflections(...)'
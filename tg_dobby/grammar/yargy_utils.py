@@ -1,7 +1,125 @@
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Optional
+
 from yargy.interpretation import fact
 from yargy.interpretation.fact import Fact
 
 
+class FrozenFact:
+    """
+    Base class of compact immutable mirrors of fact definitions.
+    Mirrors do not reference parser internals, so are cheap to keep, cache and pickle.
+    Mirror classes are generated by FactDefinitionMeta and available as `<FactDefinition>.Frozen`.
+    """
+    __slots__ = ()
+
+    __attributes__ = ()
+    __definition__ = None  # type: FactDefinitionMeta
+
+    def __init__(self, **kwargs):
+        for key in kwargs:
+            if key not in self.__attributes__:
+                raise KeyError(key)
+
+        for key in self.__attributes__:
+            object.__setattr__(self, key, kwargs.get(key))
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"Can not set attribute '{key}': {type(self).__name__} is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"Can not delete attribute '{key}': {type(self).__name__} is immutable")
+
+    def __iter__(self):
+        return (getattr(self, key) for key in self.__attributes__)
+
+    def __eq__(self, other):
+        return _facts_equal(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __reduce__(self):
+        return _restore_frozen_fact, (self.__definition__, tuple(self))
+
+    def __repr__(self):
+        args = ", ".join(f"{key}={getattr(self, key)!r}" for key in self.__attributes__)
+        return f"{self.__definition__.__name__}({args})"
+
+
+def _restore_frozen_fact(definition, values):
+    frozen = object.__new__(definition.Frozen)
+
+    for key, value in zip(definition.Frozen.__attributes__, values):
+        object.__setattr__(frozen, key, value)
+
+    return frozen
+
+
+def definition_of(value) -> Optional[type]:
+    """
+    Returns fact definition class for both yargy facts and frozen mirrors, type of value otherwise
+    """
+    return getattr(type(value), "__definition__", None) or type(value)
+
+
+def _facts_equal(a, b) -> bool:
+    if definition_of(a) is not definition_of(b):
+        return False
+
+    return all(getattr(a, key) == getattr(b, key) for key in a.__attributes__)
+
+
+def freeze_fact(value):
+    """
+    Converts fact (and nested facts) into frozen mirror. Lists are converted to tuples, other values are kept
+    """
+    freeze = getattr(type(value), "freeze", None)
+
+    if freeze is not None:
+        return freeze(value)
+
+    if isinstance(value, list):
+        return tuple(freeze_fact(item) for item in value)
+
+    return value
+
+
+def _make_frozen_fact_cls(typename: str, attributes: list) -> type:
+    return type(f"{typename}Frozen", (FrozenFact,), {
+        "__slots__": tuple(attributes),
+        "__attributes__": tuple(attributes),
+    })
+
+
+def _make_freeze(frozen_cls: type):
+    attributes = frozen_cls.__attributes__
+    get_values = attrgetter(*attributes)
+    single_attribute = len(attributes) == 1
+
+    def freeze(value):
+        if isinstance(value, FrozenFact):
+            return value
+
+        values = get_values(value)
+
+        if single_attribute:
+            values = (values,)
+
+        frozen = object.__new__(frozen_cls)
+
+        for key, item in zip(attributes, values):
+            object.__setattr__(frozen, key, item if item is None else freeze_fact(item))
+
+        return frozen
+
+    return freeze
+
+
 # TODO CONSIDER: research ability to use directly with Fact class with backward compatibility saving
 class FactDefinitionMeta(type):
     BASE_FACT_DEFINITION_CLS = None
@@ -32,8 +150,45 @@ class FactDefinitionMeta(type):
 
         new_base_classes = (generated_fact_cls,)
 
-        return super().__new__(mcs, typename, new_base_classes, class_attr)
+        # Facts are equal to their frozen mirrors. Facts are mutable, so are not hashable: only frozen mirrors are
+        class_attr.setdefault("__eq__", _facts_equal)
+        class_attr.setdefault("__hash__", None)
+
+        frozen_cls = _make_frozen_fact_cls(typename, list(annotations))
+
+        class_attr["Frozen"] = frozen_cls
+        class_attr["freeze"] = staticmethod(_make_freeze(frozen_cls))
+
+        definition_cls = super().__new__(mcs, typename, new_base_classes, class_attr)
+        frozen_cls.__definition__ = definition_cls
+        frozen_cls.freeze = staticmethod(class_attr["freeze"].__func__)
+
+        return definition_cls
+
+    def __instancecheck__(cls, instance):
+        # Frozen mirrors are treated as instances of their definitions
+        return super().__instancecheck__(instance) or getattr(type(instance), "__definition__", None) is cls
 
 
 class FactDefinition(Fact, metaclass=FactDefinitionMeta):
     _ROOT_FACT_DEFINITION = True
+
+
+def fact_as_json(fact) -> OrderedDict:
+    """
+    Same as Fact.as_json, but does not require parser internals, so works for frozen facts too
+    """
+    data = OrderedDict()
+
+    for key in fact.__attributes__:
+        value = getattr(fact, key)
+
+        if isinstance(value, (Fact, FrozenFact)):
+            value = fact_as_json(value)
+        elif isinstance(value, (list, tuple)):
+            value = [fact_as_json(item) if isinstance(item, (Fact, FrozenFact)) else item for item in value]
+
+        if value is not None:
+            data[key] = value
+
+    return data
@@ -0,0 +1,109 @@
+import ssl
+import time
+from typing import Callable, NamedTuple, Optional
+
+import aiohttp
+
+try:
+    import certifi
+except ImportError:
+    certifi = None
+
+
+class HttpClientStats(NamedTuple):
+    requests: int
+    new_connections: int
+    reused_connections: int
+    # Requests which waited for free connection because of pool limits, and total time (seconds) of waiting
+    queued: int
+    queued_time: float
+    dns_cache_hits: int
+    dns_cache_misses: int
+
+
+class HttpClientMetrics:
+    """
+    Counts connection pool events of client sessions it is traced into
+    """
+
+    def __init__(self):
+        self._requests = 0
+        self._new_connections = 0
+        self._reused_connections = 0
+        self._queued = 0
+        self._queued_time = 0.0
+        self._dns_cache_hits = 0
+        self._dns_cache_misses = 0
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(self._on_connection_reuseconn)
+        trace_config.on_connection_queued_start.append(self._on_connection_queued_start)
+        trace_config.on_connection_queued_end.append(self._on_connection_queued_end)
+        trace_config.on_dns_cache_hit.append(self._on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(self._on_dns_cache_miss)
+
+        return trace_config
+
+    async def _on_request_start(self, session, ctx, params):
+        self._requests += 1
+
+    async def _on_connection_create_end(self, session, ctx, params):
+        self._new_connections += 1
+
+    async def _on_connection_reuseconn(self, session, ctx, params):
+        self._reused_connections += 1
+
+    async def _on_connection_queued_start(self, session, ctx, params):
+        self._queued += 1
+        ctx.queued_started = time.perf_counter()
+
+    async def _on_connection_queued_end(self, session, ctx, params):
+        self._queued_time += time.perf_counter() - ctx.queued_started
+
+    async def _on_dns_cache_hit(self, session, ctx, params):
+        self._dns_cache_hits += 1
+
+    async def _on_dns_cache_miss(self, session, ctx, params):
+        self._dns_cache_misses += 1
+
+    def stats(self) -> HttpClientStats:
+        return HttpClientStats(
+            requests=self._requests,
+            new_connections=self._new_connections,
+            reused_connections=self._reused_connections,
+            queued=self._queued,
+            queued_time=self._queued_time,
+            dns_cache_hits=self._dns_cache_hits,
+            dns_cache_misses=self._dns_cache_misses,
+        )
+
+
+def create_client_session(metrics: HttpClientMetrics, json_serialize: Callable,
+                          limit: int = 100, limit_per_host: int = 0, keepalive_timeout: float = 15.0,
+                          dns_cache_ttl: Optional[int] = 10, connect_timeout: float = None,
+                          timeout: float = None) -> aiohttp.ClientSession:
+    """
+    Pooled client session. Timeout is default one of requests, may be overridden per request.
+    dns_cache_ttl: None - cache forever, 0 - no cache
+    """
+    ssl_context = ssl.create_default_context(cafile=certifi.where()) if certifi else None
+
+    connector = aiohttp.TCPConnector(
+        ssl=ssl_context,
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=keepalive_timeout,
+        use_dns_cache=dns_cache_ttl != 0,
+        ttl_dns_cache=dns_cache_ttl,
+    )
+
+    return aiohttp.ClientSession(
+        connector=connector,
+        json_serialize=json_serialize,
+        timeout=aiohttp.ClientTimeout(total=timeout, connect=connect_timeout),
+        trace_configs=[metrics.trace_config()],
+    )
@@ -0,0 +1,4 @@
+class ParsingServiceOverloaded(Exception):
+    """
+    Parsing job is rejected because too many jobs are pending
+    """
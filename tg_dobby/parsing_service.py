@@ -0,0 +1,111 @@
+import asyncio
+import logging
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from typing import List, NamedTuple, Optional
+
+from tg_dobby.grammar import extract_first_natural_date
+from tg_dobby.grammar.natural_dates import Moment
+from tg_dobby.grammar.tokenizer import tokenize_phrase, PhraseToken, TOKENIZER_RULE_SETS
+# Defined apart, so bot does not depend on grammar to handle it
+from tg_dobby.parsing_errors import ParsingServiceOverloaded
+
+log = logging.getLogger(__name__)
+
+
+class ParsingServiceStats(NamedTuple):
+    pool: str
+    workers: Optional[int]
+    queue_size: int
+    pending: int
+    completed: int
+    rejected: int
+
+
+# Worker functions are executed in pool. Results do not reference parser internals, so are picklable
+
+def _tokenize_phrase_job(txt: str, rule_set: str) -> List[PhraseToken]:
+    return tokenize_phrase(txt, rules=TOKENIZER_RULE_SETS[rule_set])
+
+
+def _extract_first_natural_date_job(txt: str) -> Optional[Moment]:
+    return extract_first_natural_date(txt)
+
+
+class ParsingService:
+    """
+    Runs CPU-heavy grammar parsing outside of event loop.
+    Number of submitted but not finished jobs is limited by queue_size.
+    When limit is reached new jobs are rejected with ParsingServiceOverloaded.
+    """
+
+    POOL_THREAD = "thread"
+    POOL_PROCESS = "process"
+
+    def __init__(self, pool: str = POOL_THREAD, workers: Optional[int] = None, queue_size: int = 64):
+        if pool not in (self.POOL_THREAD, self.POOL_PROCESS):
+            raise ValueError(f"Unknown parsing pool type: {pool}")
+
+        self.pool = pool
+        self.workers = workers
+        self.queue_size = queue_size
+
+        self._executor = None  # type: Optional[Executor]
+
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+
+    def start(self):
+        if self.pool == self.POOL_PROCESS:
+            # Workers are forked lazily, so grammar warmed up in parent process is inherited by workers
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers)
+
+        log.info(f"Parsing service started: pool={self.pool} workers={self.workers} queue_size={self.queue_size}")
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    async def _submit(self, fn, *args):
+        if self._executor is None:
+            raise RuntimeError("Parsing service is not started")
+
+        if self._pending >= self.queue_size:
+            self._rejected += 1
+            raise ParsingServiceOverloaded(f"Parsing queue is full ({self.queue_size} jobs pending)")
+
+        future = asyncio.get_event_loop().run_in_executor(self._executor, fn, *args)
+
+        self._pending += 1
+        future.add_done_callback(self._on_job_done)
+
+        # Job keeps its slot until it is finished by worker, even if caller is cancelled
+        return await asyncio.shield(future)
+
+    def _on_job_done(self, future: asyncio.Future):
+        self._pending -= 1
+
+        if not future.cancelled() and future.exception() is None:
+            self._completed += 1
+
+    async def tokenize_phrase(self, txt: str, rule_set: str = "default") -> List[PhraseToken]:
+        if rule_set not in TOKENIZER_RULE_SETS:
+            raise ValueError(f"Unknown tokenizer rule set: {rule_set}")
+
+        return await self._submit(_tokenize_phrase_job, txt, rule_set)
+
+    async def extract_first_natural_date(self, txt: str) -> Optional[Moment]:
+        return await self._submit(_extract_first_natural_date_job, txt)
+
+    def stats(self) -> ParsingServiceStats:
+        return ParsingServiceStats(
+            pool=self.pool,
+            workers=self.workers,
+            queue_size=self.queue_size,
+            pending=self._pending,
+            completed=self._completed,
+            rejected=self._rejected,
+        )
@@ -0,0 +1,26 @@
+import hashlib
+from typing import TYPE_CHECKING, List
+
+from aioredis import ReplyError
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+
+class RedisScript:
+    """
+    Lua script executed by digest, script is sent to server only if it is not cached there yet
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.digest = hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    async def __call__(self, redis: "Redis", keys: List[str], args: List):
+        try:
+            return await redis.evalsha(self.digest, keys=keys, args=args)
+        except ReplyError as e:
+            if not str(e).startswith("NOSCRIPT"):
+                raise
+
+            return await redis.eval(self.source, keys=keys, args=args)
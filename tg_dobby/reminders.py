@@ -0,0 +1,475 @@
+import asyncio
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional
+
+import pydantic
+from aiotg import Bot
+
+from tg_dobby.redis_script import RedisScript
+from tg_dobby.shard_leases import ShardLeases, shard_of
+from tg_dobby.timing_wheel import TimingWheel
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+log = logging.getLogger(__name__)
+
+
+class Reminder(pydantic.BaseModel):
+    id: str
+    chat_id: str
+    text: str
+    # Unix timestamp
+    due: float
+    # Number of failed delivery attempts
+    attempts: int = 0
+    # Token of claim which holds reminder, set on claimed reminders only
+    lease: Optional[str] = None
+
+
+class AbstractReminderStorage(ABC):
+    """
+    Reminders are partitioned into shards by chat id.
+    Due reminders are claimed under lease: claimed reminder is invisible to other workers until lease expires.
+    Worker must either ack delivered reminder or retry it, otherwise reminder is returned to queue on lease expiration.
+    Lease is identified by token of claim: extend, ack and retry are no-ops (return False) once reminder
+    is claimed by other worker. Delivery is at-least-once: reminder is delivered again if its lease expires
+    before it is acked.
+    """
+
+    @property
+    @abstractmethod
+    def shards(self) -> int:
+        pass
+
+    @abstractmethod
+    async def add(self, reminder: Reminder):
+        pass
+
+    @abstractmethod
+    async def claim(self, reminder: Reminder, now: float, lease: float) -> Optional[Reminder]:
+        """
+        Claims single reminder. None if reminder is already claimed
+        """
+
+    @abstractmethod
+    async def claim_due(self, shard: int, now: float, limit: int, lease: float) -> List[Reminder]:
+        """
+        Claims reminders of shard which are due at the moment, earliest first
+        """
+
+    @abstractmethod
+    async def extend(self, reminder: Reminder, now: float, lease: float) -> bool:
+        """
+        Prolongs lease of claimed reminder. False if lease is lost
+        """
+
+    @abstractmethod
+    async def ack(self, reminder: Reminder) -> bool:
+        """
+        Removes delivered reminder. False if lease is lost
+        """
+
+    @abstractmethod
+    async def retry(self, reminder: Reminder, due: float) -> bool:
+        """
+        Returns claimed reminder to queue with incremented number of attempts. False if lease is lost
+        """
+
+    @abstractmethod
+    async def next_due(self, shards: Iterable[int]) -> Optional[float]:
+        """
+        Due timestamp of the earliest pending reminder of shards
+        """
+
+
+# KEYS: queue, leases. ARGV: now, limit, lease expiration, info key prefix, info key suffix, lease token
+# Reminders of expired leases are returned to queue first and are claimed again with new lease token, so previous
+# owner can not ack them anymore: reminder whose delivery outlived its lease may be delivered twice (at-least-once).
+# Info keys are built from claimed ids, not passed in KEYS, so script requires standalone Redis (not Redis Cluster).
+# Returns flat list of claimed ids and their data
+_CLAIM_DUE_SCRIPT = RedisScript("""
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], id)
+    redis.call('ZADD', KEYS[1], ARGV[1], id)
+end
+
+local claimed = {}
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, ARGV[2])
+for _, id in ipairs(ids) do
+    local info = ARGV[4] .. id .. ARGV[5]
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], ARGV[3], id)
+    if redis.call('EXISTS', info) == 1 then
+        redis.call('HSET', info, 'lease', ARGV[6])
+    end
+    claimed[#claimed + 1] = id
+    claimed[#claimed + 1] = redis.call('HGETALL', info)
+end
+return claimed
+""")
+
+# KEYS: queue, leases, info. ARGV: reminder id, lease expiration, lease token
+_CLAIM_SCRIPT = RedisScript("""
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return nil
+end
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+if redis.call('EXISTS', KEYS[3]) == 1 then
+    redis.call('HSET', KEYS[3], 'lease', ARGV[3])
+end
+return redis.call('HGETALL', KEYS[3])
+""")
+
+# KEYS: queue, leases, info. ARGV: reminder id, lease expiration, lease token
+# Reminder returned to queue on lease expiration, but not claimed by other worker yet, is taken back
+_EXTEND_SCRIPT = RedisScript("""
+if redis.call('HGET', KEYS[3], 'lease') ~= ARGV[3] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[2], ARGV[1])
+return 1
+""")
+
+# KEYS: queue, leases, info. ARGV: reminder id, lease token
+_ACK_SCRIPT = RedisScript("""
+if redis.call('HGET', KEYS[3], 'lease') ~= ARGV[2] then
+    return 0
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('DEL', KEYS[3])
+return 1
+""")
+
+# KEYS: queue, leases, info. ARGV: reminder id, due, lease token
+_RETRY_SCRIPT = RedisScript("""
+if redis.call('HGET', KEYS[3], 'lease') ~= ARGV[3] then
+    return 0
+end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HINCRBY', KEYS[3], 'attempts', 1)
+redis.call('HDEL', KEYS[3], 'lease')
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+return 1
+""")
+
+
+def _decode_hash(flat: List[bytes]) -> Dict[str, str]:
+    return {
+        flat[i].decode("utf-8"): flat[i + 1].decode("utf-8")
+        for i in range(0, len(flat), 2)
+    }
+
+
+class RedisSortedSetReminderStorage(AbstractReminderStorage):
+    """
+    Reminder ids are kept in per shard sorted set scored by due timestamp, reminders data - in per reminder hashes.
+    Claimed reminders are moved to per shard leases sorted set scored by lease expiration.
+    Claims are done by Lua scripts in single round trip, so any number of workers may claim reminders concurrently.
+    Scripts access keys of claimed reminders which are not known in advance, so standalone Redis is required.
+    """
+    QUEUE_KEY_TEMPLATE = "reminders:{shard}:queue"
+    LEASES_KEY_TEMPLATE = "reminders:{shard}:leases"
+
+    INFO_KEY_PREFIX = "reminder:"
+    INFO_KEY_SUFFIX = ":info"
+
+    def __init__(self, redis: "Redis", shards: int = 1):
+        if shards < 1:
+            raise ValueError("Number of shards must be positive")
+
+        self._redis = redis
+        self._shards = shards
+
+    @property
+    def shards(self) -> int:
+        return self._shards
+
+    @classmethod
+    def _info_key(cls, reminder_id: str) -> str:
+        return f"{cls.INFO_KEY_PREFIX}{reminder_id}{cls.INFO_KEY_SUFFIX}"
+
+    def _queue_key(self, shard: int) -> str:
+        return self.QUEUE_KEY_TEMPLATE.format(shard=shard)
+
+    def _leases_key(self, shard: int) -> str:
+        return self.LEASES_KEY_TEMPLATE.format(shard=shard)
+
+    def _keys(self, reminder: Reminder) -> List[str]:
+        shard = shard_of(reminder.chat_id, self._shards)
+        return [self._queue_key(shard), self._leases_key(shard), self._info_key(reminder.id)]
+
+    async def add(self, reminder: Reminder):
+        tr = self._redis.multi_exec()
+        tr.hmset_dict(self._info_key(reminder.id), reminder.dict(exclude={"lease"}))
+        tr.zadd(self._queue_key(shard_of(reminder.chat_id, self._shards)), reminder.due, reminder.id)
+        await tr.execute()
+
+    async def claim(self, reminder: Reminder, now: float, lease: float) -> Optional[Reminder]:
+        reminder_data = await _CLAIM_SCRIPT(
+            self._redis, keys=self._keys(reminder), args=[reminder.id, now + lease, uuid.uuid4().hex]
+        )
+
+        if not reminder_data:
+            return None
+
+        return Reminder(**_decode_hash(reminder_data))
+
+    async def claim_due(self, shard: int, now: float, limit: int, lease: float) -> List[Reminder]:
+        leases_key = self._leases_key(shard)
+
+        claimed = await _CLAIM_DUE_SCRIPT(
+            self._redis,
+            keys=[self._queue_key(shard), leases_key],
+            args=[now, limit, now + lease, self.INFO_KEY_PREFIX, self.INFO_KEY_SUFFIX, uuid.uuid4().hex],
+        )
+
+        reminders = []
+
+        for i in range(0, len(claimed), 2):
+            reminder_data = claimed[i + 1]
+
+            if reminder_data:
+                reminders.append(Reminder(**_decode_hash(reminder_data)))
+            else:
+                # Data of reminder is lost, nothing to deliver
+                await self._redis.zrem(leases_key, claimed[i])
+
+        return reminders
+
+    async def extend(self, reminder: Reminder, now: float, lease: float) -> bool:
+        return bool(await _EXTEND_SCRIPT(
+            self._redis, keys=self._keys(reminder), args=[reminder.id, now + lease, reminder.lease]
+        ))
+
+    async def ack(self, reminder: Reminder) -> bool:
+        return bool(await _ACK_SCRIPT(self._redis, keys=self._keys(reminder), args=[reminder.id, reminder.lease]))
+
+    async def retry(self, reminder: Reminder, due: float) -> bool:
+        return bool(await _RETRY_SCRIPT(
+            self._redis, keys=self._keys(reminder), args=[reminder.id, due, reminder.lease]
+        ))
+
+    async def next_due(self, shards: Iterable[int]) -> Optional[float]:
+        shards = list(shards)
+
+        if not shards:
+            return None
+
+        tr = self._redis.multi_exec()
+        replies = [tr.zrange(self._queue_key(shard), 0, 0, withscores=True) for shard in shards]
+        await tr.execute()
+
+        dues = []
+
+        for reply in replies:
+            earliest = await reply
+
+            if earliest:
+                _, due = earliest[0]
+                dues.append(due)
+
+        return min(dues, default=None)
+
+
+class _LeaseLost(Exception):
+    pass
+
+
+class ReminderDispatcher:
+    """
+    Delivers stored reminders when they are due.
+    Single coroutine sleeps until the earliest due reminder, so pending reminders cost no event loop timers.
+    It is woken up earlier if reminder which is due sooner is scheduled by this process.
+    Reminders scheduled by other processes are noticed at least every max_sleep seconds.
+
+    Due reminders are claimed in batches under lease and delivered concurrently, at most max_concurrency at once.
+    Lease is extended right before sending and while message is sent, reminder whose lease was lost
+    (e.g. claimed by other process after rebalance) is skipped.
+    Failed deliveries are retried with exponential backoff.
+
+    Dispatcher looks only at shards leased by this process, so dispatchers of several processes
+    share the load without contending for the same reminders.
+
+    Reminders due within short_horizon are additionally registered in timing wheel and delivered right on time.
+    They are still stored, so are delivered by dispatcher after restart. Such reminders are delivered
+    by the process which scheduled them, whichever process owns their shard: claim decides who delivers.
+    """
+    ERROR_RETRY_DELAY = 5.0
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, storage: AbstractReminderStorage, bot: Bot,
+                 shard_leases: ShardLeases, batch_size: int = 100, max_sleep: float = 60.0,
+                 timing_wheel: TimingWheel = None, short_horizon: float = 0.0,
+                 max_concurrency: int = 16, lease: float = 60.0,
+                 retry_delay: float = 5.0, max_attempts: int = 5):
+        self._loop = loop
+        self._storage = storage
+        self._bot = bot
+        self._shard_leases = shard_leases
+        self._batch_size = batch_size
+        self._max_sleep = max_sleep
+        self._timing_wheel = timing_wheel
+        self._short_horizon = short_horizon
+        self._lease = lease
+        self._retry_delay = retry_delay
+        self._max_attempts = max_attempts
+
+        self._semaphore = asyncio.Semaphore(max_concurrency, loop=loop)
+
+        self._wake_up = asyncio.Event(loop=loop)
+        self._next_due = None  # type: Optional[float]
+
+        if shard_leases.shards != storage.shards:
+            raise ValueError("Number of leased shards differs from number of shards of storage")
+
+        # Newly acquired shards may have due reminders
+        shard_leases.add_listener(self._wake_up.set)
+
+    async def schedule(self, chat_id: str, text: str, due: datetime) -> Reminder:
+        reminder = Reminder(id=uuid.uuid4().hex, chat_id=chat_id, text=text, due=due.timestamp())
+
+        await self._storage.add(reminder)
+
+        delay = reminder.due - time.time()
+
+        if self._timing_wheel and delay <= self._short_horizon:
+            self._timing_wheel.call_later(delay, self._on_reminder_timer, reminder)
+        else:
+            self._wake_up_before(reminder.due)
+
+        return reminder
+
+    def _wake_up_before(self, due: float):
+        if self._next_due is None or due < self._next_due:
+            self._wake_up.set()
+
+    def _on_reminder_timer(self, reminder: Reminder):
+        asyncio.ensure_future(self._claim_and_deliver(reminder), loop=self._loop)
+
+    async def _claim_and_deliver(self, scheduled: Reminder):
+        # noinspection PyBroadException
+        try:
+            reminder = await self._storage.claim(scheduled, time.time(), self._lease)
+        except Exception:
+            log.exception(f"Failed to claim reminder {scheduled.id}")
+            return
+
+        # Reminder may be already claimed by dispatcher
+        if reminder:
+            await self._deliver(reminder)
+
+    def _backoff(self, attempts: int) -> float:
+        return self._retry_delay * 2 ** attempts
+
+    async def _extend(self, reminder: Reminder):
+        if not await self._storage.extend(reminder, time.time(), self._lease):
+            raise _LeaseLost()
+
+    async def _send(self, reminder: Reminder):
+        """
+        Sends reminder, lease is extended while message waits in send queue
+        """
+        await self._extend(reminder)
+
+        send = asyncio.ensure_future(
+            self._bot.send_message(reminder.chat_id, f"Напоминаю: {reminder.text}"), loop=self._loop
+        )
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({send}, timeout=self._lease / 3, loop=self._loop)
+
+                if done:
+                    return send.result()
+
+                await self._extend(reminder)
+        finally:
+            if not send.done():
+                send.cancel()
+
+    async def _deliver(self, reminder: Reminder):
+        # noinspection PyBroadException
+        try:
+            # Batch may wait for free slot longer than lease, so lease is checked right before sending
+            async with self._semaphore:
+                try:
+                    await self._send(reminder)
+                except (_LeaseLost, asyncio.CancelledError):
+                    raise
+                except Exception:
+                    log.exception(f"Failed to deliver reminder {reminder.id} to chat {reminder.chat_id}")
+
+                    if reminder.attempts + 1 < self._max_attempts:
+                        due = time.time() + self._backoff(reminder.attempts)
+
+                        if not await self._storage.retry(reminder, due):
+                            raise _LeaseLost()
+
+                        self._wake_up_before(due)
+                        return
+
+                    log.error(f"Reminder {reminder.id} is dropped after {reminder.attempts + 1} attempts")
+
+                if not await self._storage.ack(reminder):
+                    raise _LeaseLost()
+
+        except _LeaseLost:
+            log.warning(f"Lease of reminder {reminder.id} is lost, it is delivered by other worker")
+
+        except asyncio.CancelledError:
+            raise
+
+        except Exception:
+            # Reminder is returned to queue on lease expiration
+            log.exception(f"Failed to complete delivery of reminder {reminder.id}")
+
+    async def _sleep(self):
+        # Event is cleared before looking at the queue: reminder scheduled meanwhile wakes dispatcher up
+        self._wake_up.clear()
+
+        self._next_due = await self._storage.next_due(self._shard_leases.owned)
+
+        timeout = self._max_sleep
+
+        if self._next_due is not None:
+            timeout = min(max(self._next_due - time.time(), 0), timeout)
+
+        try:
+            await asyncio.wait_for(self._wake_up.wait(), timeout, loop=self._loop)
+        except asyncio.TimeoutError:
+            pass
+
+    async def run(self):
+        log.info("Reminder dispatcher started")
+
+        while True:
+            # noinspection PyBroadException
+            try:
+                now = time.time()
+
+                batches = await asyncio.gather(*[
+                    self._storage.claim_due(shard, now, self._batch_size, self._lease)
+                    for shard in self._shard_leases.owned
+                ], loop=self._loop)
+
+                await asyncio.gather(*[
+                    self._deliver(reminder) for batch in batches for reminder in batch
+                ], loop=self._loop)
+
+                # Full batch means there may be more due reminders
+                if all(len(batch) < self._batch_size for batch in batches):
+                    await self._sleep()
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception:
+                log.exception("Exception in reminder dispatcher")
+                await asyncio.sleep(self.ERROR_RETRY_DELAY, loop=self._loop)
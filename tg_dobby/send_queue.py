@@ -0,0 +1,466 @@
+import asyncio
+import heapq
+import logging
+from collections import OrderedDict, deque
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Deque, Dict, List, NamedTuple, Optional, Set, Tuple
+
+log = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    # Replies to users in commands
+    INTERACTIVE = 0
+    # /notify/ and other bulk messages
+    BULK = 1
+
+
+class RetryAfter(Exception):
+    """
+    Raised by transport when Bot API responds 429 Too Many Requests
+    """
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Too Many Requests: retry after {retry_after}")
+        self.retry_after = retry_after
+
+
+class TransientApiError(Exception):
+    """
+    Raised by transport when request may succeed if repeated (5xx, connection errors)
+    """
+
+
+class SendQueueClosed(Exception):
+    """
+    Request is not sent because send queue is stopped
+    """
+
+
+Transport = Callable[[str, Dict[str, Any]], Awaitable[Any]]
+
+
+def _chat_key(params: Dict[str, Any]) -> Optional[str]:
+    chat_id = params.get("chat_id")
+    return None if chat_id is None else str(chat_id)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """
+        Time until token is available
+        """
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        if self.tokens >= 1:
+            return 0.0
+
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+
+class _Request:
+    __slots__ = ("method", "params", "priority", "future", "enqueued", "attempts")
+
+    def __init__(self, method: str, params: Dict[str, Any], priority: Priority, future: asyncio.Future,
+                 enqueued: float):
+        self.method = method
+        self.params = params
+        self.priority = priority
+        self.future = future
+        self.enqueued = enqueued
+        self.attempts = 0
+
+
+class _Chat:
+    __slots__ = ("bucket", "lanes", "resume_at", "busy")
+
+    def __init__(self, bucket: Optional[TokenBucket]):
+        self.bucket = bucket
+        self.lanes = [deque() for _ in Priority]  # type: List[Deque[_Request]]
+        # Set while chat waits for its token or for retry_after
+        self.resume_at = None  # type: Optional[float]
+        # Set while request of chat is in flight: messages of chat are sent one by one, so keep their order
+        self.busy = False
+
+    def __bool__(self):
+        return any(self.lanes)
+
+
+class SendQueueStats(NamedTuple):
+    depth_interactive: int
+    depth_bulk: int
+    in_flight: int
+    sent: int
+    failed: int
+    rate_limited: int
+    # Seconds from enqueue to start of the last successful request, over recent requests
+    wait_avg: float
+    wait_p95: float
+    # Seconds from enqueue to response
+    latency_avg: float
+    latency_p95: float
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+class SendQueue:
+    """
+    Single outbound queue for Bot API requests.
+    Requests are sent no faster than global rate and per chat rate (token buckets with burst capacity).
+    Interactive requests go ahead of bulk ones, chats of the same priority are served round-robin,
+    so chat waiting for its token does not hold others. Requests of chat are sent one at a time in order.
+    On 429 chat (or whole queue for requests without chat) is paused for retry_after and request is repeated.
+    Transient errors are retried with backoff.
+    When queue is stopped, queued and in-flight requests fail with SendQueueClosed.
+    """
+    LATENCY_WINDOW = 1024
+    # Idle chats with full buckets are forgotten this often (seconds)
+    PRUNE_INTERVAL = 60.0
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, transport: Transport,
+                 rate: float = 30.0, burst: float = 30.0,
+                 chat_rate: float = 1.0, chat_burst: float = 3.0,
+                 max_in_flight: int = 32, max_retries: int = 3, retry_delay: float = 1.0):
+        self._loop = loop
+        self._transport = transport
+        self._chat_rate = chat_rate
+        self._chat_burst = chat_burst
+        self._max_retries = max_retries
+        self._retry_delay = retry_delay
+
+        now = loop.time()
+        self._bucket = TokenBucket(rate, burst, now)
+        self._paused_until = now
+        self._next_prune = now + self.PRUNE_INTERVAL
+
+        # Requests without chat are limited by global rate only
+        self._chats = {None: _Chat(None)}  # type: Dict[Any, _Chat]
+
+        # Chats which have requests of priority and may send now
+        self._ready = [OrderedDict() for _ in Priority]  # type: List[OrderedDict]
+        # Chats waiting for token or retry_after: (resume time, sequence number, chat id)
+        self._waiting = []  # type: List[Tuple[float, int, Any]]
+        self._waiting_seq = 0
+
+        self._semaphore = asyncio.Semaphore(max_in_flight, loop=loop)
+        self._wake_up = asyncio.Event(loop=loop)
+
+        self._sending = set()  # type: Set[asyncio.Future]
+        self._closed = False
+
+        self._depth = [0 for _ in Priority]
+        self._in_flight = 0
+        self._sent = 0
+        self._failed = 0
+        self._rate_limited = 0
+        self._waits = deque(maxlen=self.LATENCY_WINDOW)  # type: Deque[float]
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)  # type: Deque[float]
+
+    def submit(self, method: str, params: Dict[str, Any], priority: Priority = Priority.INTERACTIVE) -> asyncio.Future:
+        """
+        Enqueues request. Future is resolved with API response
+        """
+        future = self._loop.create_future()
+
+        if self._closed:
+            future.set_exception(SendQueueClosed())
+            return future
+
+        self._push(_Request(method, params, priority, future, self._loop.time()))
+        self._wake_up.set()
+
+        return future
+
+    def _chat(self, chat_id: Any) -> _Chat:
+        chat = self._chats.get(chat_id)
+
+        if chat is None:
+            chat = self._chats[chat_id] = _Chat(TokenBucket(self._chat_rate, self._chat_burst, self._loop.time()))
+
+        return chat
+
+    def _push(self, request: _Request, first: bool = False):
+        if self._closed:
+            self._fail(request, SendQueueClosed())
+            return
+
+        chat_id = _chat_key(request.params)
+        chat = self._chat(chat_id)
+        lane = chat.lanes[request.priority]
+
+        if first:
+            lane.appendleft(request)
+        else:
+            lane.append(request)
+
+        self._depth[request.priority] += 1
+
+        if chat.resume_at is None and not chat.busy:
+            self._ready[request.priority][chat_id] = None
+
+    def _make_ready(self, chat_id: Optional[str], chat: _Chat):
+        if chat.resume_at is not None or chat.busy:
+            return
+
+        for priority, lane in enumerate(chat.lanes):
+            if lane:
+                self._ready[priority][chat_id] = None
+
+    def _defer(self, chat_id: Any, chat: _Chat, resume_at: float):
+        # Chat waits until the latest of resume times, heap entries of earlier ones are skipped
+        if chat.resume_at is not None and resume_at <= chat.resume_at:
+            return
+
+        chat.resume_at = resume_at
+
+        for ready in self._ready:
+            ready.pop(chat_id, None)
+
+        self._waiting_seq += 1
+        heapq.heappush(self._waiting, (resume_at, self._waiting_seq, chat_id))
+
+    def _resume_waiting(self, now: float):
+        while self._waiting and self._waiting[0][0] <= now:
+            resume_at, _, chat_id = heapq.heappop(self._waiting)
+            chat = self._chats.get(chat_id)
+
+            # Stale entry: chat was deferred again later
+            if chat is None or chat.resume_at != resume_at:
+                continue
+
+            chat.resume_at = None
+            self._make_ready(chat_id, chat)
+
+    def _pop(self, now: float) -> Optional[_Request]:
+        for priority, ready in enumerate(self._ready):
+            while ready:
+                chat_id = next(iter(ready))
+                chat = self._chats[chat_id]
+
+                delay = chat.bucket.delay(now) if chat.bucket else 0.0
+
+                if delay > 0:
+                    self._defer(chat_id, chat, now + delay)
+                    continue
+
+                lane = chat.lanes[priority]
+                request = lane.popleft()
+                self._depth[priority] -= 1
+
+                # Chat goes to the end of the line
+                del ready[chat_id]
+
+                if request.future.done():
+                    # Cancelled by caller
+                    if lane:
+                        ready[chat_id] = None
+                    continue
+
+                if chat_id is None:
+                    if lane:
+                        ready[chat_id] = None
+                else:
+                    chat.bucket.take()
+                    chat.busy = True
+
+                    for other in self._ready:
+                        other.pop(chat_id, None)
+
+                return request
+
+        return None
+
+    def _prune(self, now: float):
+        """
+        Chat state is kept while its bucket refills, otherwise chat would bypass its rate
+        """
+        idle = [
+            chat_id
+            for chat_id, chat in self._chats.items()
+            if chat_id is not None and not chat and chat.resume_at is None and not chat.busy
+            and chat.bucket.delay(now) == 0 and chat.bucket.tokens >= chat.bucket.capacity
+        ]
+
+        for chat_id in idle:
+            del self._chats[chat_id]
+
+    def _next_resume(self, now: float) -> Optional[float]:
+        resume_at = max(self._paused_until, now + self._bucket.delay(now))
+
+        if resume_at > now:
+            return resume_at - now
+
+        if any(self._ready):
+            return 0.0
+
+        if self._waiting:
+            return max(self._waiting[0][0] - now, 0.0)
+
+        return None
+
+    async def _send(self, request: _Request):
+        chat_id = _chat_key(request.params)
+        started = self._loop.time()
+
+        try:
+            result = await self._transport(request.method, request.params)
+
+        except RetryAfter as e:
+            self._rate_limited += 1
+            log.warning(f"Rate limited on {request.method}, retrying after {e.retry_after} seconds")
+
+            resume_at = self._loop.time() + e.retry_after
+
+            if chat_id is None:
+                self._paused_until = max(self._paused_until, resume_at)
+            else:
+                self._defer(chat_id, self._chat(chat_id), resume_at)
+
+            self._push(request, first=True)
+
+        except TransientApiError as e:
+            request.attempts += 1
+
+            if request.attempts > self._max_retries:
+                self._fail(request, e)
+            else:
+                log.warning(f"Transient error on {request.method}, retry {request.attempts}: {e}")
+
+                resume_at = self._loop.time() + self._retry_delay * 2 ** (request.attempts - 1)
+
+                self._defer(chat_id, self._chat(chat_id), resume_at)
+                self._push(request, first=True)
+
+        except asyncio.CancelledError:
+            # Send is cancelled only when queue is stopped
+            self._fail(request, SendQueueClosed())
+            raise
+
+        except Exception as e:
+            self._fail(request, e)
+
+        else:
+            self._sent += 1
+            self._waits.append(started - request.enqueued)
+            self._latencies.append(self._loop.time() - request.enqueued)
+
+            if not request.future.done():
+                request.future.set_result(result)
+
+        finally:
+            if chat_id is not None:
+                chat = self._chat(chat_id)
+                chat.busy = False
+                self._make_ready(chat_id, chat)
+
+            self._in_flight -= 1
+            self._semaphore.release()
+            self._wake_up.set()
+
+    def _fail(self, request: _Request, e: BaseException):
+        self._failed += 1
+
+        if not request.future.done():
+            request.future.set_exception(e)
+
+    def _close(self):
+        self._closed = True
+
+        for chat in self._chats.values():
+            for lane in chat.lanes:
+                while lane:
+                    self._fail(lane.popleft(), SendQueueClosed())
+
+        for ready in self._ready:
+            ready.clear()
+
+        self._waiting.clear()
+        self._depth = [0 for _ in Priority]
+
+        for send in self._sending:
+            send.cancel()
+
+    async def run(self):
+        log.info("Send queue started")
+
+        try:
+            await self._run()
+        finally:
+            self._close()
+
+    async def _run(self):
+        while True:
+            # Slot is taken before choosing request: request is chosen at the moment it can be sent
+            await self._semaphore.acquire()
+
+            try:
+                while True:
+                    now = self._loop.time()
+                    self._resume_waiting(now)
+
+                    if now >= self._next_prune:
+                        self._prune(now)
+                        self._next_prune = now + self.PRUNE_INTERVAL
+
+                    timeout = self._next_resume(now)
+
+                    if timeout == 0.0:
+                        request = self._pop(now)
+
+                        if request:
+                            break
+
+                        # All ready chats were deferred or requests were cancelled
+                        continue
+
+                    self._wake_up.clear()
+
+                    try:
+                        await asyncio.wait_for(self._wake_up.wait(), timeout, loop=self._loop)
+                    except asyncio.TimeoutError:
+                        pass
+
+            except BaseException:
+                self._semaphore.release()
+                raise
+
+            self._bucket.take()
+            self._in_flight += 1
+
+            send = asyncio.ensure_future(self._send(request), loop=self._loop)
+            self._sending.add(send)
+            send.add_done_callback(self._sending.discard)
+
+    def stats(self) -> SendQueueStats:
+        waits, latencies = list(self._waits), list(self._latencies)
+
+        return SendQueueStats(
+            depth_interactive=self._depth[Priority.INTERACTIVE],
+            depth_bulk=self._depth[Priority.BULK],
+            in_flight=self._in_flight,
+            sent=self._sent,
+            failed=self._failed,
+            rate_limited=self._rate_limited,
+            wait_avg=sum(waits) / len(waits) if waits else 0.0,
+            wait_p95=_percentile(waits, 0.95),
+            latency_avg=sum(latencies) / len(latencies) if latencies else 0.0,
+            latency_p95=_percentile(latencies, 0.95),
+        )
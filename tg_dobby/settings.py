@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseSettings
 
 
@@ -7,5 +9,71 @@ class AppSettings(BaseSettings):
     http_bind_port: int = 8094
     redis_url: str
 
+    # Public base URL of this application (e.g. https://bot.example.com). If set, updates are received by webhook
+    # instead of getUpdates long polling. Webhook path contains secret, so only Telegram knows it
+    webhook_url: Optional[str] = None
+    webhook_secret: Optional[str] = None
+    # Max number of simultaneous update requests Telegram makes to webhook
+    webhook_max_connections: int = 40
+
+    # Natural language parsing results cache. 0 - disabled
+    grammar_result_cache_size: int = 0
+    grammar_result_cache_ttl: Optional[float] = None
+
+    # Max number of cached word forms analysis (grammar vocabulary is cached in addition to this limit)
+    morph_cache_size: int = 100000
+
+    # Natural language parsing pool: "thread" keeps event loop responsive, "process" also scales across cores
+    parsing_pool: str = "thread"
+    parsing_workers: Optional[int] = None
+    parsing_queue_size: int = 64
+
+    # Resolution (seconds) of in-process timers: command timeouts and short-horizon reminders
+    timing_wheel_tick: float = 0.1
+    # Running command is cancelled if user does not respond for this time (seconds). 0 - disabled
+    command_timeout: float = 600.0
+
+    # Max number of due reminders taken from storage at once
+    reminder_batch_size: int = 100
+    # Max time (seconds) dispatcher sleeps without looking at storage: reminders may be scheduled by other processes
+    reminder_max_sleep: float = 60.0
+    # Reminders due within this time (seconds) are also delivered by in-process timer, right on time
+    reminder_short_horizon: float = 3600.0
+    # Max number of reminders being sent at once
+    reminder_delivery_concurrency: int = 16
+    # Claimed reminder is returned to queue if it was neither delivered nor retried within this time (seconds)
+    reminder_lease: float = 60.0
+    # Failed delivery is retried after reminder_retry_delay * 2 ** attempts seconds
+    reminder_retry_delay: float = 5.0
+    reminder_max_attempts: int = 5
+    # Reminders are partitioned by chat id, shards are spread between running instances.
+    # Must be the same for all instances sharing Redis
+    reminder_shards: int = 16
+    # Shards of instance which stopped heartbeating are taken over by others after this time (seconds)
+    reminder_shard_lease: float = 10.0
+
+    # Pooled HTTP client of Bot API calls: total and per host (i.e. to Bot API) connection limits, 0 - no limit
+    http_pool_limit: int = 100
+    http_pool_limit_per_host: int = 40
+    # Idle connections are kept open for reuse this time (seconds)
+    http_keepalive_timeout: float = 30.0
+    # Resolved addresses are cached this time (seconds). 0 - disabled
+    http_dns_cache_ttl: int = 300
+    http_connect_timeout: float = 10.0
+    # Total time (seconds) of regular Bot API call
+    http_request_timeout: float = 30.0
+    # Total time (seconds) of getUpdates long polling call, must exceed its server side timeout (60 seconds)
+    http_long_poll_timeout: float = 90.0
+
+    # Outbound Bot API requests: global and per chat rate (requests per second) and burst
+    send_rate: float = 30.0
+    send_burst: float = 30.0
+    send_chat_rate: float = 1.0
+    send_chat_burst: float = 3.0
+    # Max number of requests awaiting response at once
+    send_max_in_flight: int = 32
+    # Requests failed with 5xx or connection errors are retried this number of times
+    send_max_retries: int = 3
+
     class Config:
         env_prefix = 'TG_BOT_'
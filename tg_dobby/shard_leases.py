@@ -0,0 +1,200 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+import zlib
+from typing import TYPE_CHECKING, Callable, FrozenSet, List, Sequence, Tuple
+
+from tg_dobby.redis_script import RedisScript
+
+if TYPE_CHECKING:
+    from aioredis import Redis
+
+log = logging.getLogger(__name__)
+
+
+def shard_of(key: str, shards: int) -> int:
+    """
+    Shard of key, same in all processes (unlike builtin hash of str)
+    """
+    return zlib.crc32(key.encode("utf-8")) % shards
+
+
+# KEYS: owner key per shard. ARGV: instance id, lease ttl (ms)
+# Renews leases held by instance. Returns owner of every shard, empty string for free shard
+_RENEW_SCRIPT = RedisScript("""
+local owners = {}
+for i, key in ipairs(KEYS) do
+    local owner = redis.call('GET', key)
+    if owner == ARGV[1] then
+        redis.call('PEXPIRE', key, ARGV[2])
+    end
+    owners[i] = owner or ''
+end
+return owners
+""")
+
+# KEYS: owner keys of shards to release. ARGV: instance id
+_RELEASE_SCRIPT = RedisScript("""
+for _, key in ipairs(KEYS) do
+    if redis.call('GET', key) == ARGV[1] then
+        redis.call('DEL', key)
+    end
+end
+return 0
+""")
+
+
+def plan_rebalance(owners: Sequence[str], instance_id: str, live: Sequence[str]) -> Tuple[List[int], List[int]]:
+    """
+    Decides which shards instance should release and which free shards it should try to acquire.
+    Each live instance holds at most ceil(shards / live) shards, so all shards are held once every instance
+    has seen the same set of live instances. Instance prefers shards with number equal to its position
+    in live instances modulo number of live instances: assignment converges instead of shards moving back and forth.
+    """
+    live = sorted(live)
+
+    if instance_id not in live:
+        return [i for i, owner in enumerate(owners) if owner == instance_id], []
+
+    quota = int(math.ceil(len(owners) / len(live)))
+    position = live.index(instance_id)
+
+    def preference(shard: int) -> Tuple[bool, int]:
+        return shard % len(live) != position, shard
+
+    owned = sorted((i for i, owner in enumerate(owners) if owner == instance_id), key=preference)
+    free = sorted((i for i, owner in enumerate(owners) if not owner), key=preference)
+
+    return owned[quota:], free[:max(quota - len(owned), 0)]
+
+
+class ShardLeases:
+    """
+    Keeps leases on subset of shards for this instance.
+    Instances announce themselves by heartbeat, each heartbeat renews held leases and rebalances shards
+    between live instances: shards of instance which stopped heartbeating are free after lease ttl,
+    instance which joined gets shards released by others.
+    Instance considers its shards lost if leases were not renewed within ttl.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, redis: "Redis", name: str,
+                 shards: int, ttl: float = 10.0, instance_id: str = None):
+        if shards < 1:
+            raise ValueError("Number of shards must be positive")
+
+        self._loop = loop
+        self._redis = redis
+        self._shards = shards
+        self._ttl = ttl
+        self._instance_id = instance_id or uuid.uuid4().hex
+
+        self._key_instances = f"{name}:instances"
+        self._owner_keys = [f"{name}:{shard}:owner" for shard in range(shards)]
+
+        self._owned = frozenset()  # type: FrozenSet[int]
+        self._valid_until = 0.0
+        self._listeners = []  # type: List[Callable[[], None]]
+
+    @property
+    def instance_id(self) -> str:
+        return self._instance_id
+
+    @property
+    def shards(self) -> int:
+        return self._shards
+
+    @property
+    def owned(self) -> FrozenSet[int]:
+        if time.time() > self._valid_until:
+            return frozenset()
+
+        return self._owned
+
+    def add_listener(self, listener: Callable[[], None]):
+        """
+        Listener is called when set of owned shards changes
+        """
+        self._listeners.append(listener)
+
+    def _set_owned(self, owned: FrozenSet[int]):
+        if owned == self._owned:
+            return
+
+        log.info(f"Instance {self._instance_id} owns shards {sorted(owned)} of {self._shards}")
+        self._owned = owned
+
+        for listener in self._listeners:
+            listener()
+
+    async def heartbeat(self):
+        started = time.time()
+        ttl_ms = int(self._ttl * 1000)
+
+        tr = self._redis.multi_exec()
+        tr.zadd(self._key_instances, started + self._ttl, self._instance_id)
+        tr.zremrangebyscore(self._key_instances, max=started)
+        live = tr.zrange(self._key_instances, 0, -1, encoding="utf-8")
+        await tr.execute()
+        live = await live
+
+        owners = await _RENEW_SCRIPT(self._redis, keys=self._owner_keys, args=[self._instance_id, ttl_ms])
+        owners = [owner.decode("utf-8") for owner in owners]
+
+        release, acquire = plan_rebalance(owners, self._instance_id, live)
+
+        if release:
+            await _RELEASE_SCRIPT(
+                self._redis, keys=[self._owner_keys[shard] for shard in release], args=[self._instance_id]
+            )
+
+        acquired = []
+
+        if acquire:
+            tr = self._redis.multi_exec()
+            replies = [
+                tr.set(
+                    self._owner_keys[shard], self._instance_id,
+                    pexpire=ttl_ms, exist=self._redis.SET_IF_NOT_EXIST,
+                )
+                for shard in acquire
+            ]
+            await tr.execute()
+            acquired = [shard for shard, reply in zip(acquire, replies) if await reply]
+
+        owned = {i for i, owner in enumerate(owners) if owner == self._instance_id}
+        owned.difference_update(release)
+        owned.update(acquired)
+
+        self._valid_until = started + self._ttl
+        self._set_owned(frozenset(owned))
+
+    async def release_all(self):
+        """
+        Leaves group: shards are taken by other instances on their next heartbeat
+        """
+        owned, self._owned = self._owned, frozenset()
+
+        tr = self._redis.multi_exec()
+        tr.zrem(self._key_instances, self._instance_id)
+        await tr.execute()
+
+        if owned:
+            await _RELEASE_SCRIPT(
+                self._redis, keys=[self._owner_keys[shard] for shard in owned], args=[self._instance_id]
+            )
+
+    async def run(self):
+        log.info(f"Shard leases of instance {self._instance_id} started")
+
+        while True:
+            # noinspection PyBroadException
+            try:
+                await self.heartbeat()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Exception in shard leases heartbeat")
+
+            await asyncio.sleep(self._ttl / 3, loop=self._loop)
@@ -0,0 +1,48 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import List, NamedTuple
+
+log = logging.getLogger(__name__)
+
+
+class StartupPhase(NamedTuple):
+    name: str
+    started_at: float
+    duration: float
+
+
+class StartupTimer:
+    """
+    Collects durations of application start-up phases.
+    Phase start is reported relative to timer creation (i.e. to process start for global timer).
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.phases = []  # type: List[StartupPhase]
+
+    def record(self, name: str, started: float, finished: float = None):
+        if finished is None:
+            finished = time.perf_counter()
+
+        self.phases.append(StartupPhase(name=name, started_at=started - self.origin, duration=finished - started))
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, started)
+
+    def log_report(self):
+        log.info("Start-up timing report:")
+
+        for p in self.phases:
+            log.info(f"  {p.name:<16} started at {p.started_at * 1000:8.1f} ms, took {p.duration * 1000:8.1f} ms")
+
+        log.info(f"  Total: {(time.perf_counter() - self.origin) * 1000:.1f} ms")
+
+
+STARTUP_TIMER = StartupTimer()
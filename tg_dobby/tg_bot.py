@@ -1,4 +1,4 @@
-from typing import Optional, Iterable, List
+from typing import Optional, Iterable
 
 from datetime import datetime, timedelta
 import logging
@@ -8,25 +8,42 @@ import yaml
 from aiotg import Chat, asyncio
 
 from tg_dobby.date_utils import add_months
-from tg_dobby.grammar import extract_first_natural_date
-from tg_dobby.grammar.natural_dates import Moment, RULE_DAY_TIME, DayTime
+from tg_dobby.grammar.natural_dates import Moment, DayTime, warm_up_moment_parser, extract_time_of_a_day
 from tg_dobby.grammar.natural_dates_post_processing import (
-    get_absolute_date,
     ClarificationRequired,
     InvalidRelativeDateException,
-    ALL_CLARIFICATIONS_CLASSES, DayTimeClarification)
-from tg_dobby.grammar.tokenizer import tokenize_phrase, PhraseToken, ReminderPreamble
+    ResolutionState,
+    DayTimeClarification,
+    TimeOfADayClarification,
+)
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+from tg_dobby.grammar.parser_registry import PARSER_REGISTRY
+from tg_dobby.grammar.prefilter import TriggerIndex
+from tg_dobby.grammar.vocabulary import collect_rule_inflections, INFLECTION_TABLES
+from tg_dobby.grammar.yargy_utils import fact_as_json, definition_of
+from tg_dobby.grammar.tokenizer import (
+    warm_up_tokenizer,
+    PhraseToken,
+    ReminderPreamble,
+    TOKENIZER_RULE_SETS,
+    DEFAULT_TOKENIZER_RULES,
+)
+from tg_dobby.parsing_service import ParsingService, ParsingServiceOverloaded
+from tg_dobby.reminders import ReminderDispatcher
 from tg_dobby.tg_bot_base import (
     BotCommand,
     TgBotBase,
-    InlineKeyboardMarkupData,
-    InlineKeyboardButtonData,
+    InlineKeyboard,
+    InlineKeyboardEditor,
     CallbackQueryData,
     MessageData,
 )
 
 log = logging.getLogger(__name__)
 
+CANCEL_KEYBOARD = InlineKeyboard([[("Отмена", "submit")]])
+NO_KEYBOARD = InlineKeyboard([[]])
+
 
 class EchoCommand(BotCommand):
     async def run(self, initial_message: Chat):
@@ -39,12 +56,12 @@ class EchoCommand(BotCommand):
 
 
 class ParseDateCommand(BotCommand):
-    async def run(self, initial_message: Chat):
-        cancel_submit_markup = InlineKeyboardMarkupData(inline_keyboard=[
-            [InlineKeyboardButtonData(text="Отмена", callback_data="submit")]
-        ])
+    def __init__(self, loop: asyncio.AbstractEventLoop, initial_chat_obj: Chat, parsing_service: ParsingService):
+        super().__init__(loop, initial_chat_obj)
+        self.parsing_service = parsing_service
 
-        await self.send_message("Что разобрать?", reply_markup=cancel_submit_markup)
+    async def run(self, initial_message: Chat):
+        await self.send_message("Что разобрать?", reply_markup=CANCEL_KEYBOARD)
 
         while True:
             upd = await self.next_update()
@@ -52,17 +69,21 @@ class ParseDateCommand(BotCommand):
             if isinstance(upd, MessageData):
                 txt = upd.text.lower()
 
-                f = extract_first_natural_date(txt)
+                try:
+                    f = await self.parsing_service.extract_first_natural_date(txt)
+                except ParsingServiceOverloaded:
+                    await self.send_message("Слишком много запросов, попробуй позже", reply_markup=CANCEL_KEYBOARD)
+                    continue
 
                 if f:
                     await self.send_message(
                         f"```\n"
-                        f"{yaml.dump(dict(f.as_json), default_flow_style=False, allow_unicode=True)}\n"
+                        f"{yaml.dump(dict(fact_as_json(f)), default_flow_style=False, allow_unicode=True)}\n"
                         f"```",
-                        reply_markup=cancel_submit_markup,
+                        reply_markup=CANCEL_KEYBOARD,
                     )
                 else:
-                    await self.send_message("Не понял 🙁", reply_markup=cancel_submit_markup)
+                    await self.send_message("Не понял 🙁", reply_markup=CANCEL_KEYBOARD)
 
             elif isinstance(upd, CallbackQueryData):
                 await self.answer_callback_query(upd)
@@ -70,64 +91,79 @@ class ParseDateCommand(BotCommand):
 
 
 class RemindCommand(BotCommand):
+    def __init__(self, loop: asyncio.AbstractEventLoop, initial_chat_obj: Chat,
+                 reminder_dispatcher: ReminderDispatcher):
+        super().__init__(loop, initial_chat_obj)
+        self.reminder_dispatcher = reminder_dispatcher
+
     async def request_date(self) -> Optional[datetime]:
         dt = datetime.now().replace(second=0, microsecond=0)
 
         msg_id = (await self.send_message(f"Когда?"))["result"]["message_id"]
 
         def date_edit_markup():
-            return InlineKeyboardMarkupData(inline_keyboard=[
+            return InlineKeyboard([
                 [
-                    InlineKeyboardButtonData(text=dt.strftime("%d %b %Y %H:%M"), callback_data="submit")
+                    (dt.strftime("%d %b %Y %H:%M"), "submit"),
                 ],
                 [
-                    InlineKeyboardButtonData(text="-", callback_data="d_dec"),
-                    InlineKeyboardButtonData(text=f"{dt.day}", callback_data="d_click"),
-                    InlineKeyboardButtonData(text="+", callback_data="d_inc"),
+                    ("-", "d_dec"),
+                    (f"{dt.day}", "d_click"),
+                    ("+", "d_inc"),
                 ],
                 [
-                    InlineKeyboardButtonData(text="-", callback_data="m_dec"),
-                    InlineKeyboardButtonData(text=f"{dt.month}", callback_data="m_click"),
-                    InlineKeyboardButtonData(text="+", callback_data="m_inc"),
+                    ("-", "m_dec"),
+                    (f"{dt.month}", "m_click"),
+                    ("+", "m_inc"),
                 ],
             ])
 
+        editor = InlineKeyboardEditor(self, msg_id)
+        acks = []
+        decision = None  # type: Optional[str]
+
         while True:
-            await self.edit_message_reply_markup(msg_id, markup=date_edit_markup())
+            # Keyboard reflects all callbacks taken so far, acknowledgements are sent along with edit
+            await asyncio.gather(editor.edit(date_edit_markup()), *acks)
+            acks = []
 
-            upd = await self.next_update()
+            for upd in await self.next_updates():
+                if isinstance(upd, CallbackQueryData):
+                    acks.append(self.answer_callback_query(upd))
 
-            if isinstance(upd, MessageData):
-                # txt = intr.text.lower()
-                msg_id = (await self.send_message(f"Таки когда?"))["result"]["message_id"]
+                if decision:
+                    continue
 
-            elif isinstance(upd, CallbackQueryData):
-                if upd.data == "d_inc":
-                    dt += timedelta(days=1)
-                elif upd.data == "d_dec":
-                    dt -= timedelta(days=1)
+                if isinstance(upd, MessageData):
+                    # txt = intr.text.lower()
+                    msg_id = (await self.send_message(f"Таки когда?"))["result"]["message_id"]
+                    editor = InlineKeyboardEditor(self, msg_id)
 
-                elif upd.data == "m_inc":
-                    dt = add_months(dt, 1)
-                elif upd.data == "m_dec":
-                    dt = add_months(dt, -1)
+                elif isinstance(upd, CallbackQueryData):
+                    if upd.data == "d_inc":
+                        dt += timedelta(days=1)
+                    elif upd.data == "d_dec":
+                        dt -= timedelta(days=1)
 
-                elif upd.data == "submit":
-                    await self.answer_callback_query(upd)
-                    break
+                    elif upd.data == "m_inc":
+                        dt = add_months(dt, 1)
+                    elif upd.data == "m_dec":
+                        dt = add_months(dt, -1)
 
-                elif upd.data == "cancel":
-                    await self.answer_callback_query(upd)
-                    return None
+                    elif upd.data in ("submit", "cancel"):
+                        decision = upd.data
 
-                else:
-                    # Ignoring callback data
-                    await self.answer_callback_query(upd)
+                    # Other callback data is ignored
 
-                await self.answer_callback_query(upd)
+            if decision:
+                break
+
+        if decision == "cancel":
+            await asyncio.gather(*acks)
+            return None
 
         # Date received
-        await self.edit_message_reply_markup(msg_id, InlineKeyboardMarkupData(inline_keyboard=[[]]))
+        await asyncio.gather(editor.edit(NO_KEYBOARD), *acks)
 
         return dt
 
@@ -143,6 +179,7 @@ class RemindCommand(BotCommand):
         date = await self.request_date()
 
         if date:
+            await self.reminder_dispatcher.schedule(self.chat_id, reminder_text, date)
             await self.send_message(f"Напомню в {date}")
         else:
             await self.send_message(f"Отменено пользователем")
@@ -156,11 +193,14 @@ class NaturalReminderCommand(BotCommand):
         (Moment, type(None)),
     )
 
-    def __init__(self, loop: asyncio.AbstractEventLoop, initial_chat_obj: Chat, initial_tokens: Iterable[PhraseToken]):
+    def __init__(self, loop: asyncio.AbstractEventLoop, initial_chat_obj: Chat, initial_tokens: Iterable[PhraseToken],
+                 parsing_service: ParsingService, reminder_dispatcher: ReminderDispatcher):
         super().__init__(loop, initial_chat_obj)
+        self.parsing_service = parsing_service
+        self.reminder_dispatcher = reminder_dispatcher
 
         token_type_map = {
-            type(token.fact): token
+            definition_of(token.fact): token
             for token in initial_tokens
         }
 
@@ -173,7 +213,11 @@ class NaturalReminderCommand(BotCommand):
         while True:
             response = await self.next_message()
 
-            tokens = tokenize_phrase(response.text, rules=(RULE_DAY_TIME,))
+            try:
+                tokens = await self.parsing_service.tokenize_phrase(response.text, rule_set="day_time")
+            except ParsingServiceOverloaded:
+                await self.send_message("Слишком много запросов, попробуй позже")
+                continue
 
             if len(tokens) == 1:
                 fact = tokens[0].fact
@@ -182,20 +226,34 @@ class NaturalReminderCommand(BotCommand):
 
             await self.send_message("Во сколько, во сколько?")
 
+    async def ask_time_of_a_day_clarification(self, clarification: TimeOfADayClarification) -> TimeOfADayClarification:
+        await self.send_message("Утра или вечера?")
+
+        while True:
+            response = await self.next_message()
+            time_of_a_day = extract_time_of_a_day(response.text)
+
+            if time_of_a_day:
+                return clarification._replace(time_of_a_day=time_of_a_day)
+
+            await self.send_message("Утра, дня, вечера или ночи?")
+
     async def get_date(self, moment: Moment) -> datetime:
-        collected_clarification = []  # type: List[ALL_CLARIFICATIONS_CLASSES]
+        # Resolution is resumed after every answer, already resolved parts of moment are not processed again
+        state = ResolutionState(moment)
 
-        # Trying to parse date and collect clarifications if required
         while True:
             try:
-                return get_absolute_date(moment, clarifications=collected_clarification)
+                return state.resolve()
 
             except ClarificationRequired as e:
 
                 for required_clarification in e.required_clarifications:
                     if isinstance(required_clarification, DayTimeClarification):
-                        c = await self.ask_day_time_clarification()
-                        collected_clarification.append(c)
+                        state.clarify(await self.ask_day_time_clarification())
+
+                    elif isinstance(required_clarification, TimeOfADayClarification):
+                        state.clarify(await self.ask_time_of_a_day_clarification(required_clarification))
 
                     else:
                         raise ValueError(f"Unknown clarification type was requested:"
@@ -206,6 +264,8 @@ class NaturalReminderCommand(BotCommand):
         try:
             dt = await self.get_date(self.initial_moment)
 
+            await self.reminder_dispatcher.schedule(self.chat_id, self.reminder_text, dt)
+
             resp_yml = yaml.dump(dict(
                 what=self.reminder_text,
                 when=dt.strftime('%d %b %Y %H:%M'),
@@ -222,27 +282,63 @@ class NaturalReminderCommand(BotCommand):
         except InvalidRelativeDateException as e:
             await self.send_message(f"Invalid date: {e}")
 
+        except asyncio.CancelledError:
+            raise
+
         except Exception as e:
             log.exception("Exception during date parsing")
             await self.send_message(f"Unexpected error {type(e).__name__}: {e}")
 
 
 class TgBot(TgBotBase):
-    def _dispatch_initial_message(self, chat_obj) -> Optional[BotCommand]:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._trigger_index = None  # type: Optional[TriggerIndex]
+
+    @property
+    def trigger_index(self) -> TriggerIndex:
+        if self._trigger_index is None:
+            self._trigger_index = TriggerIndex.from_rules(DEFAULT_TOKENIZER_RULES, MORPH_CACHE)
+
+        return self._trigger_index
+
+    def warm_up(self):
+        for rule_set_name, rules in TOKENIZER_RULE_SETS.items():
+            warm_up_tokenizer(rules, label=f"tokenizer:{rule_set_name}")
+
+        warm_up_moment_parser()
+
+        PARSER_REGISTRY.log_stats()
+        INFLECTION_TABLES.log_stats()
+
+        all_rules = [r for rules in TOKENIZER_RULE_SETS.values() for r in rules]
+        preloaded = MORPH_CACHE.preload(collect_rule_inflections(all_rules, MORPH_CACHE))
+        log.info(f"Morph cache preloaded with {preloaded} grammar word forms")
+
+        log.info(f"Trigger index built with {len(self.trigger_index.words)} word forms")
+
+    async def _dispatch_initial_message(self, chat_obj) -> Optional[BotCommand]:
 
         msg = chat_obj.message["text"]  # type: str
 
         if msg == "/echo":
             return EchoCommand(self.app_wrapper.loop, chat_obj)
         elif msg == "/remind":
-            return RemindCommand(self.app_wrapper.loop, chat_obj)
+            return RemindCommand(self.app_wrapper.loop, chat_obj, self.app_wrapper.reminder_dispatcher)
         elif msg == "/parse_date":
-            return ParseDateCommand(self.app_wrapper.loop, chat_obj)
+            return ParseDateCommand(self.app_wrapper.loop, chat_obj, self.app_wrapper.parsing_service)
+
+        # Skipping parsing if phrase has nothing grammar can match
+        if not self.trigger_index.may_match(msg):
+            return None
 
         # Trying to analyze phrase:
-        tokens = tokenize_phrase(msg)
+        tokens = await self.app_wrapper.parsing_service.tokenize_phrase(msg)
 
-        token_fact_types = tuple(type(token.fact) for token in tokens)
+        token_fact_types = tuple(definition_of(token.fact) for token in tokens)
 
         if token_fact_types in NaturalReminderCommand.REMINDER_PATTERNS:
-            return NaturalReminderCommand(self.app_wrapper.loop, chat_obj, tokens)
+            return NaturalReminderCommand(
+                self.app_wrapper.loop, chat_obj, tokens,
+                self.app_wrapper.parsing_service, self.app_wrapper.reminder_dispatcher,
+            )
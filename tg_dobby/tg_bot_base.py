@@ -1,13 +1,20 @@
 from abc import ABC, abstractmethod, ABCMeta
-from typing import TYPE_CHECKING, Dict, Optional, Union, List, Set
+from json.encoder import encode_basestring_ascii
+from typing import TYPE_CHECKING, Any, Dict, Optional, Sequence, Tuple, Union, List, Set
 
 import logging
 
+import aiohttp
 from aiotg import Bot, Chat, asyncio
+from aiotg.bot import API_URL, RETRY_CODES, RETRY_TIMEOUT, BotApiError
 import aiotg
 
 import pydantic
 
+from tg_dobby.http_client import HttpClientMetrics, create_client_session
+from tg_dobby.parsing_errors import ParsingServiceOverloaded
+from tg_dobby.send_queue import Priority, RetryAfter, TransientApiError
+from tg_dobby.timing_wheel import TimerHandle
 from tg_dobby.user_registry import TgUser
 
 if TYPE_CHECKING:
@@ -42,6 +49,47 @@ class InlineKeyboardMarkupData(TgModel):
     inline_keyboard: List[List[InlineKeyboardButtonData]]
 
 
+def _json_str(value: Optional[str]) -> str:
+    # Same as json.dumps, which pydantic uses
+    return "null" if value is None else encode_basestring_ascii(value)
+
+
+class InlineKeyboard:
+    """
+    Inline keyboard markup serialized without pydantic models, to the same JSON as InlineKeyboardMarkupData.
+    JSON is built once on creation: static keyboards are created once and cost nothing to send,
+    dynamic ones skip model validation and generic serialization.
+    Buttons are (text, callback_data) pairs
+    """
+    __slots__ = ("rows", "_json")
+
+    def __init__(self, rows: Sequence[Sequence[Tuple[str, Optional[str]]]]):
+        self.rows = tuple(tuple(row) for row in rows)
+
+        self._json = '{"inline_keyboard": [%s], "type": "InlineKeyboardMarkup"}' % ", ".join(
+            "[%s]" % ", ".join(
+                '{"text": %s, "callback_data": %s, "type": "InlineKeyboardButton"}' % (
+                    _json_str(text), _json_str(callback_data)
+                )
+                for text, callback_data in row
+            )
+            for row in rows
+        )
+
+    @classmethod
+    def from_model(cls, markup: InlineKeyboardMarkupData) -> "InlineKeyboard":
+        return cls([
+            [(button.text, button.callback_data) for button in row]
+            for row in markup.inline_keyboard
+        ])
+
+    def json(self) -> str:
+        return self._json
+
+
+ReplyMarkup = Union[InlineKeyboard, InlineKeyboardMarkupData]
+
+
 class MessageData(TgModel):
     class Config:
         TG_TYPE = "Message"
@@ -67,7 +115,12 @@ class BotCommand(ABC):
         self.bot = initial_chat_obj.bot  # type: Bot
         self.chat_id = initial_chat_obj.id
 
-    async def edit_message_reply_markup(self, message: Union[MessageData, int], markup: InlineKeyboardMarkupData):
+        # Set by bot while command is running
+        self.task = None  # type: Optional[asyncio.Task]
+        self.timeout_handle = None  # type: Optional[TimerHandle]
+        self.timed_out = False
+
+    async def edit_message_reply_markup(self, message: Union[MessageData, int], markup: ReplyMarkup):
         message_id = message if isinstance(message, int) else message.message_id
 
         args = {
@@ -80,7 +133,7 @@ class BotCommand(ABC):
 
         return await self.bot.api_call("editMessageReplyMarkup", **args)
 
-    async def send_message(self, text, parse_mode="Markdown", reply_markup: InlineKeyboardMarkupData = None):
+    async def send_message(self, text, parse_mode="Markdown", reply_markup: ReplyMarkup = None):
         args = {
             "text": text,
             "chat_id": self.chat_id,
@@ -107,6 +160,21 @@ class BotCommand(ABC):
         log.info(f"Message received {msg}")
         return msg
 
+    async def next_updates(self) -> List[Union[MessageData, CallbackQueryData]]:
+        """
+        Waits for update and returns it together with all updates received meanwhile,
+        so fast user input is handled at once instead of one round trip per update
+        """
+        updates = [await self.next_update()]
+
+        while not self._q.empty():
+            updates.append(self._q.get_nowait())
+
+        if len(updates) > 1:
+            log.info(f"{len(updates)} updates taken at once")
+
+        return updates
+
     async def next_message(self) -> MessageData:
         while True:
             next_data = await self.next_update()
@@ -120,7 +188,32 @@ class BotCommand(ABC):
                 return next_data
 
 
+class InlineKeyboardEditor:
+    """
+    Edits reply markup of message. Edit is skipped if markup is the same as the one shown
+    """
+
+    def __init__(self, command: BotCommand, message_id: int, markup: ReplyMarkup = None):
+        self._command = command
+        self.message_id = message_id
+        self._shown = markup.json() if markup else None  # type: Optional[str]
+
+    async def edit(self, markup: ReplyMarkup):
+        markup_json = markup.json()
+
+        if markup_json == self._shown:
+            return None
+
+        result = await self._command.edit_message_reply_markup(self.message_id, markup)
+        self._shown = markup_json
+
+        return result
+
+
 class TgBotBase(Bot, metaclass=ABCMeta):
+    # Not rate limited by Bot API: long polling and webhook management bypass send queue
+    UNQUEUED_METHODS = frozenset({"getUpdates", "setWebhook", "deleteWebhook", "getWebhookInfo", "getMe"})
+
     def __init__(self, api_token, app_wrapper: "AppWrapper", *args, **kwargs):
         super().__init__(api_token=api_token, *args, **kwargs)
         self.app_wrapper = app_wrapper
@@ -129,6 +222,84 @@ class TgBotBase(Bot, metaclass=ABCMeta):
         self.add_callback(r".*", self.handle_inbound_message)
 
         self.map_chat_id_running_command = {}  # type: Dict[str, BotCommand]
+        # Set while initial message of chat is dispatched: other messages of chat wait for command to be registered
+        self._map_chat_id_dispatching = {}  # type: Dict[str, asyncio.Future]
+
+        # Set once bot is warmed up and may handle updates
+        self.ready = False
+
+        self.http_metrics = HttpClientMetrics()
+        self._request_timeout = aiohttp.ClientTimeout(
+            total=app_wrapper.settings.http_request_timeout,
+            connect=app_wrapper.settings.http_connect_timeout,
+        )
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """
+        Pooled session shared by all Bot API calls. Its default timeout is the one of long polling,
+        calls sent through send queue use regular timeout
+        """
+        if not self._session or self._session.closed:
+            settings = self.app_wrapper.settings
+
+            self._session = create_client_session(
+                self.http_metrics,
+                json_serialize=self.json_serialize,
+                limit=settings.http_pool_limit,
+                limit_per_host=settings.http_pool_limit_per_host,
+                keepalive_timeout=settings.http_keepalive_timeout,
+                dns_cache_ttl=settings.http_dns_cache_ttl,
+                connect_timeout=settings.http_connect_timeout,
+                timeout=settings.http_long_poll_timeout,
+            )
+
+        return self._session
+
+    async def close_session(self):
+        if self._session:
+            await self._session.close()
+
+    def api_call(self, method, priority: Priority = Priority.INTERACTIVE, **params):
+        """
+        Requests are sent through send queue once it is created, so rate limits are respected
+        """
+        send_queue = self.app_wrapper.send_queue
+
+        if send_queue is None or method in self.UNQUEUED_METHODS:
+            return super().api_call(method, **params)
+
+        return send_queue.submit(method, params, priority)
+
+    async def send_api_request(self, method: str, params: Dict[str, Any]):
+        """
+        Transport of send queue: single Bot API request, retries are left to the queue
+        """
+        url = f"{API_URL}/bot{self.api_token}/{method}"
+
+        try:
+            response = await self.session.post(url, data=params, proxy=self.proxy, timeout=self._request_timeout)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TransientApiError(f"{type(e).__name__}: {e}") from e
+
+        if response.status == 200:
+            return await response.json(loads=self.json_deserialize)
+
+        if response.content_type == "application/json":
+            json_resp = await response.json(loads=self.json_deserialize)
+            err_msg = json_resp["description"]
+        else:
+            json_resp = {}
+            err_msg = await response.read()
+
+        if response.status == 429:
+            raise RetryAfter(json_resp.get("parameters", {}).get("retry_after", RETRY_TIMEOUT))
+
+        if response.status in RETRY_CODES:
+            raise TransientApiError(f"{response.status}: {err_msg}")
+
+        log.error(err_msg)
+        raise BotApiError(err_msg, response=response)
 
     @staticmethod
     def tg_user_from_chat_obj(chat_obj: Chat):
@@ -148,22 +319,75 @@ class TgBotBase(Bot, metaclass=ABCMeta):
             if new_user != existing_user:
                 await self.app_wrapper.user_registry.save_user(new_user)
 
-    # TODO CONSIDER: restrict time of command execution
-    async def _run_command(self, command: BotCommand, chat: Chat):
+    def _on_command_timeout(self, command: BotCommand):
+        command.timed_out = True
+        command.task.cancel()
+
+    def _reset_command_timeout(self, command: BotCommand):
+        """
+        Command is cancelled if user does not respond for command_timeout seconds
+        """
+        if command.timeout_handle:
+            command.timeout_handle.cancel()
+
+        timeout = self.app_wrapper.settings.command_timeout
+
+        if timeout > 0:
+            command.timeout_handle = self.app_wrapper.timing_wheel.call_later(
+                timeout, self._on_command_timeout, command
+            )
+
+    def _start_command(self, command: BotCommand, chat: Chat) -> asyncio.Future:
+        # Registered right away, so next message of chat is routed to command
         self.map_chat_id_running_command[chat.id] = command
 
+        return asyncio.ensure_future(self._run_command(command, chat), loop=self.app_wrapper.loop)
+
+    async def _run_command(self, command: BotCommand, chat: Chat):
+        command.task = asyncio.ensure_future(command.run(chat), loop=self.app_wrapper.loop)
+        self._reset_command_timeout(command)
+
         # noinspection PyBroadException
         try:
             log.info(f"Running command '{type(command).__name__}'")
-            await command.run(chat)
+            await command.task
+        except asyncio.CancelledError:
+            if not command.timed_out:
+                raise
+
+            log.info(f"Command '{type(command).__name__}' timed out")
+
+            # noinspection PyBroadException
+            try:
+                await chat.send_text("Время ожидания истекло")
+            except Exception:
+                log.exception(f"Failed to notify about timeout of '{type(command).__name__}' command")
         except Exception:
             log.exception(f"Exception during executing '{type(command).__name__}' command {repr(command)}")
+        finally:
+            if command.timeout_handle:
+                command.timeout_handle.cancel()
+
+            log.info(f"Command '{type(command).__name__}' was finished. Removing from registry...")
+
+            # Chat may be in other command already
+            if self.map_chat_id_running_command.get(chat.id) is command:
+                del self.map_chat_id_running_command[chat.id]
 
-        log.info(f"Command '{type(command).__name__}' was finished. Removing from registry...")
-        self.map_chat_id_running_command.pop(chat.id)
+    def handle_update(self, update: Dict[str, Any]):
+        """
+        Routes update received by webhook. Handlers are scheduled, not awaited
+        """
+        self._process_update(update)
+
+    def warm_up(self):
+        """
+        Called once on application start-up before bot loop is started.
+        Implementation may prepare heavy resources (e.g. compile grammar parsers) here
+        """
 
     @abstractmethod
-    def _dispatch_initial_message(self, chat_obj) -> Optional[BotCommand]:
+    async def _dispatch_initial_message(self, chat_obj) -> Optional[BotCommand]:
         """
         Implementation should determine which command to run.
         If None was returned, user will be informed that command is unknown
@@ -171,12 +395,32 @@ class TgBotBase(Bot, metaclass=ABCMeta):
         :return: BotCommand to run
         """
 
+    async def _handle_initial_message(self, chat_obj: Chat):
+        try:
+            new_command = await self._dispatch_initial_message(chat_obj)
+        except ParsingServiceOverloaded:
+            log.warning(f"Parsing service is overloaded. Message was rejected {chat_obj}")
+            chat_obj.reply("Too many requests. Please try again later")
+            return
+
+        if new_command:
+            log.info(f"Command '{type(new_command).__name__}' was created")
+
+            # TODO FIX: save task reference to close correctly on exit
+            self._start_command(new_command, chat_obj)
+
+        else:
+            chat_obj.reply("Unknown command!")
+
     async def handle_inbound_message(self, chat_obj: Chat, *args, **kwargs):
         # noinspection PyBroadException
         try:
             log.debug(f"Handling inbound message {chat_obj}. args={args} kwargs={kwargs}")
             await self._pre_process_msg(chat_obj)
 
+            while chat_obj.id in self._map_chat_id_dispatching:
+                await asyncio.shield(self._map_chat_id_dispatching[chat_obj.id], loop=self.app_wrapper.loop)
+
             running_command = self.map_chat_id_running_command.get(chat_obj.id)
 
             if running_command:
@@ -185,20 +429,19 @@ class TgBotBase(Bot, metaclass=ABCMeta):
                 else:
                     data = MessageData(**chat_obj.message)
 
+                self._reset_command_timeout(running_command)
+
                 # noinspection PyProtectedMember
                 running_command._q.put_nowait(data)
 
             else:
-                new_command = self._dispatch_initial_message(chat_obj)
-
-                if new_command:
-                    log.info(f"Command '{type(new_command).__name__}' was created")
+                dispatching = self._map_chat_id_dispatching[chat_obj.id] = self.app_wrapper.loop.create_future()
 
-                    # TODO FIX: save task reference to close correctly on exit
-                    asyncio.ensure_future(self._run_command(new_command, chat_obj))
-
-                else:
-                    chat_obj.reply("Unknown command!")
+                try:
+                    await self._handle_initial_message(chat_obj)
+                finally:
+                    del self._map_chat_id_dispatching[chat_obj.id]
+                    dispatching.set_result(None)
 
         except Exception:
             log.exception(f"Exception during handling inbound message {chat_obj}")
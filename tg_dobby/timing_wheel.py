@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import math
+from typing import Any, Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+WHEEL_BITS = 6
+WHEEL_SIZE = 1 << WHEEL_BITS
+WHEEL_MASK = WHEEL_SIZE - 1
+WHEEL_LEVELS = 4
+
+# Timers further than this are parked in the last level and cascaded until they fit
+MAX_TICKS = (1 << (WHEEL_BITS * WHEEL_LEVELS)) - 1
+
+
+class TimerHandle:
+    __slots__ = ("expires", "callback", "args", "_bucket", "_cancelled")
+
+    def __init__(self, expires: int, callback: Callable, args: tuple):
+        self.expires = expires
+        self.callback = callback
+        self.args = args
+        self._bucket = None  # type: Optional[Dict[TimerHandle, None]]
+        self._cancelled = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    @property
+    def done(self) -> bool:
+        """
+        Timer has fired or was cancelled
+        """
+        return self.callback is None
+
+    def cancel(self):
+        """
+        Cancels pending timer, fired timer is kept as is
+        """
+        if self.callback is None:
+            return
+
+        if self._bucket is not None:
+            del self._bucket[self]
+            self._bucket = None
+
+        self._cancelled = True
+        self.callback = None
+        self.args = ()
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel: timers are kept in buckets of WHEEL_LEVELS wheels of WHEEL_SIZE slots,
+    slot of level N spans WHEEL_SIZE ** N ticks. Timers are moved to lower levels as time approaches.
+    Insert and cancel are O(1), all timers are driven by one periodic tick of event loop.
+    Timers fire on the first tick not earlier than their deadline.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, tick: float = 0.1):
+        if tick <= 0:
+            raise ValueError("Tick must be positive")
+
+        self._loop = loop
+        self._tick = tick
+
+        self._wheels = [
+            [{} for _ in range(WHEEL_SIZE)]
+            for _ in range(WHEEL_LEVELS)
+        ]  # type: List[List[Dict[TimerHandle, None]]]
+
+        self._current = self._to_ticks(loop.time())
+
+    def __len__(self):
+        return sum(len(bucket) for wheel in self._wheels for bucket in wheel)
+
+    @property
+    def tick(self) -> float:
+        return self._tick
+
+    def _to_ticks(self, when: float) -> int:
+        return int(math.floor(when / self._tick))
+
+    def _bucket(self, expires: int) -> Dict[TimerHandle, None]:
+        if expires - self._current > MAX_TICKS:
+            expires = self._current + MAX_TICKS
+
+        distance = expires - self._current
+
+        for level in range(WHEEL_LEVELS):
+            if distance < 1 << (WHEEL_BITS * (level + 1)):
+                return self._wheels[level][(expires >> (WHEEL_BITS * level)) & WHEEL_MASK]
+
+        raise AssertionError("Unreachable")
+
+    def _add(self, handle: TimerHandle):
+        bucket = self._bucket(handle.expires)
+        bucket[handle] = None
+        handle._bucket = bucket
+
+    def call_at(self, when: float, callback: Callable, *args: Any) -> TimerHandle:
+        """
+        Schedules callback at event loop time
+        """
+        # Slot of current tick has already fired: expired timers fire on the next tick
+        expires = max(int(math.ceil(when / self._tick)), self._current + 1)
+
+        handle = TimerHandle(expires, callback, args)
+        self._add(handle)
+
+        return handle
+
+    def call_later(self, delay: float, callback: Callable, *args: Any) -> TimerHandle:
+        return self.call_at(self._loop.time() + delay, callback, *args)
+
+    def _cascade(self, level: int):
+        """
+        Moves timers of current slot of level to lower levels
+        """
+        index = (self._current >> (WHEEL_BITS * level)) & WHEEL_MASK
+        bucket = self._wheels[level][index]
+
+        if bucket:
+            self._wheels[level][index] = {}
+
+            for handle in bucket:
+                self._add(handle)
+
+    def _run_tick(self) -> int:
+        self._current += 1
+
+        # Wheel of every level is cascaded when lower level wraps around
+        for level in range(1, WHEEL_LEVELS):
+            if (self._current >> (WHEEL_BITS * (level - 1))) & WHEEL_MASK:
+                break
+
+            self._cascade(level)
+
+        index = self._current & WHEEL_MASK
+        bucket = self._wheels[0][index]
+
+        if not bucket:
+            return 0
+
+        self._wheels[0][index] = {}
+
+        # Bucket is detached first: callbacks may cancel other timers of the same bucket
+        for handle in bucket:
+            handle._bucket = None
+
+        fired = 0
+
+        for handle in bucket:
+            callback, args = handle.callback, handle.args
+
+            if callback is None:
+                continue
+
+            handle.callback = None
+            handle.args = ()
+            fired += 1
+
+            # noinspection PyBroadException
+            try:
+                callback(*args)
+            except Exception:
+                log.exception(f"Exception in timer callback {callback!r}")
+
+        return fired
+
+    def advance(self, now: float = None) -> int:
+        """
+        Runs all ticks up to event loop time. Returns number of fired timers
+        """
+        target = self._to_ticks(self._loop.time() if now is None else now)
+        fired = 0
+
+        while self._current < target:
+            fired += self._run_tick()
+
+        return fired
+
+    async def run(self):
+        while True:
+            self.advance()
+            await asyncio.sleep(self._tick, loop=self._loop)
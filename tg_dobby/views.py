@@ -1,6 +1,16 @@
+import hmac
+import logging
+
 from aiohttp import web
 
 from tg_dobby.appw import AppWrapper
+from tg_dobby.grammar.morph_cache import MORPH_CACHE
+from tg_dobby.grammar.parser_registry import PARSER_REGISTRY
+from tg_dobby.grammar.result_cache import GRAMMAR_RESULT_CACHE
+from tg_dobby.grammar.vocabulary import INFLECTION_TABLES
+from tg_dobby.send_queue import Priority
+
+log = logging.getLogger(__name__)
 
 
 class BaseView(web.View):
@@ -23,11 +33,46 @@ class NotifyView(BaseView):
                 "description": f"No user '{target}' found in internal database"
             }, status=404)
 
-        await self.app_w.bot.private(tg_user.private_chat_id).send_text(message)
+        # Bulk notifications must not delay replies to users
+        await self.app_w.bot.api_call(
+            "sendMessage", chat_id=tg_user.private_chat_id, text=message, priority=Priority.BULK
+        )
 
         return web.Response(status=204)
 
 
+class HttpClientStatsView(BaseView):
+    async def get(self):
+        return web.json_response(data=self.app_w.bot.http_metrics.stats()._asdict())
+
+
+class WebhookView(BaseView):
+    async def post(self):
+        secret = self.app_w.settings.webhook_secret
+
+        # Path of other secret is indistinguishable from missing route
+        if not hmac.compare_digest(self.request.match_info["secret"], secret):
+            raise web.HTTPNotFound()
+
+        # Telegram repeats update later: update is not lost while bot is warming up
+        if not self.app_w.bot.ready:
+            raise web.HTTPServiceUnavailable()
+
+        try:
+            update = await self.request.json()
+        except ValueError:
+            # Malformed JSON or body which is not UTF-8
+            raise web.HTTPBadRequest()
+
+        if not isinstance(update, dict) or "update_id" not in update:
+            raise web.HTTPBadRequest()
+
+        # Response is sent right away, update is handled in background
+        self.app_w.bot.handle_update(update)
+
+        return web.Response()
+
+
 class ListUserView(BaseView):
     async def get(self):
         all_users = await self.app_w.user_registry.list_users()
@@ -36,3 +81,27 @@ class ListUserView(BaseView):
             user.dict()
             for user in all_users
         ])
+
+
+class GrammarStatsView(BaseView):
+    async def get(self):
+        return web.json_response(data={
+            "parsers": [
+                s._asdict()
+                for s in PARSER_REGISTRY.stats()
+            ],
+            "result_cache": GRAMMAR_RESULT_CACHE.stats()._asdict(),
+            "morph_cache": MORPH_CACHE.stats()._asdict(),
+            "inflection_tables": INFLECTION_TABLES.stats()._asdict(),
+            "parsing_service": self.app_w.parsing_service.stats()._asdict(),
+        })
+
+
+class SendQueueStatsView(BaseView):
+    async def get(self):
+        send_queue = self.app_w.send_queue
+
+        if not send_queue:
+            return web.json_response(data={"description": "Send queue is not started"}, status=503)
+
+        return web.json_response(data=send_queue.stats()._asdict())